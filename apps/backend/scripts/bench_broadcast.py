@@ -0,0 +1,96 @@
+"""Benchmark room broadcasts against one stalled client.
+
+Every room holds one client that takes 500 ms per send and N instant ones.
+For each size it reports how long the instant clients wait for a
+``round_started`` frame, first with the old loop (``json.dumps`` and an
+awaited ``send_text`` per socket) and then with ``RoomManager.broadcast``::
+
+    cd apps/backend && python scripts/bench_broadcast.py --sizes 10 100 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+sys.path.insert(0, os.path.abspath(SRC))
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench")
+
+from app.services.cluster import InProcessBackend  # noqa: E402
+from app.services.room_manager import RoomManager  # noqa: E402
+from app.services.room_snapshots import RoomSnapshotStore  # noqa: E402
+
+ROOM = "BENCH1"
+MESSAGE = {
+    "type": "round_started",
+    "payload": {"songData": {"url": "https://cdn.example/" + "x" * 180, "title": "t", "artist": "a"}, "duration": 30},
+}
+
+
+class FakeSocket:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.received_at: Optional[float] = None
+        self.received = asyncio.Event()
+
+    async def send_text(self, data: str) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received_at = time.perf_counter()
+        self.received.set()
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+async def _sequential(sockets: List[FakeSocket]) -> None:
+    for ws in sockets:
+        await ws.send_text(json.dumps(MESSAGE))
+
+
+async def run(size: int, snapshot_path: str) -> None:
+    manager = RoomManager(backend=InProcessBackend(), snapshots=RoomSnapshotStore(snapshot_path))
+    stalled = FakeSocket(0.5)
+    fast = [FakeSocket() for _ in range(size)]
+    manager.add_player(ROOM, "stalled", "stalled", stalled)  # type: ignore[arg-type]
+    for index, ws in enumerate(fast):
+        manager.add_player(ROOM, f"p{index}", f"p{index}", ws)  # type: ignore[arg-type]
+
+    start = time.perf_counter()
+    await _sequential([stalled, *fast])
+    before = max(ws.received_at for ws in fast) - start
+
+    for ws in fast:
+        ws.received.clear()
+    start = time.perf_counter()
+    await manager.broadcast(ROOM, MESSAGE)
+    enqueued = time.perf_counter() - start
+    await asyncio.gather(*(ws.received.wait() for ws in fast))
+    after = max(ws.received_at for ws in fast) - start
+
+    print(
+        f"{size:>5} sockets: last instant client served after {before * 1e3:7.1f} ms before,"
+        f" {after * 1e3:6.1f} ms after (broadcast call {enqueued * 1e3:.2f} ms)"
+    )
+    await manager.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            asyncio.run(run(size, os.path.join(tmp, f"rooms-{size}.sqlite3")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark wire sizes and encode cost of the negotiable codecs.
+
+Typical messages for a 12-player room are encoded with every codec
+available in ``app.services.framing``. It reports their sizes, raw and
+after per-message deflate without context takeover (what
+permessage-deflate sends when it keeps no window between messages). It
+also reports encode/decode time per message. Finally it compares a
+broadcast to a room of sockets: ``json.dumps`` per recipient as before,
+against one :class:`OutboundFrame` encoded once per codec in use::
+
+    cd apps/backend && python scripts/bench_framing.py --sockets 100
+
+msgpack and CBOR are optional (``src/app/requirements-optional.txt``);
+codecs whose library is not installed are skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from typing import Any, Callable, Dict
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+sys.path.insert(0, os.path.abspath(SRC))
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench")
+
+from app.services.framing import CODECS  # noqa: E402
+from app.services.outbound import OutboundFrame  # noqa: E402
+
+PLAYERS = [{"id": f"{i:08x}", "name": f"player{i}", "isHost": i == 0} for i in range(12)]
+PREVIEW = (
+    "https://cdnt-preview.dzcdn.net/api/1/1/a/b/c/0/abc123def456.mp3?hdnea=exp=1700000000"
+    "~acl=/api/1/1/a/b/c/0/abc123def456.mp3*~data=user_id=0,application_id=42~hmac=" + "0123456789abcdef" * 4
+)
+MESSAGES: Dict[str, Dict[str, Any]] = {
+    "room_state": {
+        "type": "room_state",
+        "payload": {"roomCode": "ABCDEF", "hostId": "00000000", "players": PLAYERS, "selectedMode": "Normal Mode"},
+        "seq": 12,
+    },
+    "round_started": {
+        "type": "round_started",
+        "payload": {"songData": {"url": PREVIEW, "title": "Bohemian Rhapsody", "artist": "Queen"}, "duration": 30},
+        "seq": 40,
+    },
+    "round_ended": {
+        "type": "round_ended",
+        "payload": {
+            "leaderboard": [{"name": p["name"], "score": 1000 * i} for i, p in enumerate(PLAYERS)],
+            "currentRound": 3,
+            "totalRounds": 10,
+        },
+        "seq": 41,
+    },
+    "player_joined": {"type": "player_joined", "payload": {"player": PLAYERS[3]}, "seq": 5},
+}
+
+
+def _deflated_size(data: bytes) -> int:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # permessage-deflate drops the trailing empty block of a sync flush
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+
+def _as_bytes(encoded: Any) -> bytes:
+    return encoded.encode("utf-8") if isinstance(encoded, str) else encoded
+
+
+def _per_call(fn: Callable[[], Any], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--sockets", type=int, default=100)
+    args = parser.parse_args()
+    codecs = list(CODECS.values())
+
+    print("Bytes per message (raw / deflated)")
+    print(f"  {'message':14}" + "".join(f"{codec.name:>18}" for codec in codecs))
+    for name, message in MESSAGES.items():
+        cells = []
+        for codec in codecs:
+            data = _as_bytes(codec.encode(message))
+            cells.append(f"{len(data):>10} / {_deflated_size(data):>4}")
+        print(f"  {name:14}" + "".join(f"{cell:>18}" for cell in cells))
+
+    print("Encode / decode per message")
+    for codec in codecs:
+        blobs = [codec.encode(message) for message in MESSAGES.values()]
+        encode = sum(_per_call(lambda m=m: codec.encode(m), args.rounds) for m in MESSAGES.values()) / len(MESSAGES)
+        decode = sum(_per_call(lambda b=b: codec.decode(b), args.rounds) for b in blobs) / len(blobs)
+        print(f"  {codec.name:8} encode {encode * 1e6:5.2f} us, decode {decode * 1e6:5.2f} us")
+
+    message = MESSAGES["round_started"]
+    rounds = max(1, args.rounds // args.sockets)
+    before = _per_call(lambda: [json.dumps(message) for _ in range(args.sockets)], rounds)
+    print(f"Encoding one round_started broadcast to {args.sockets} sockets")
+    print(f"  json.dumps per socket {before * 1e6:8.1f} us")
+    for codec in codecs:
+        def broadcast(codec=codec) -> None:
+            frame = OutboundFrame(message)
+            for _ in range(args.sockets):
+                frame.encode(codec)
+
+        print(f"  OutboundFrame, {codec.name:7} {_per_call(broadcast, rounds) * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
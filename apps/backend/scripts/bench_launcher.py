@@ -0,0 +1,198 @@
+"""Load test the launcher's front router at several worker counts.
+
+For each worker count it starts ``python -m app.launcher``, opens
+``--rooms`` rooms of ``--players`` sockets through the front, starts a game
+in each and has every player submit answers in a closed loop. It reports
+``submit_answer`` -> ``answer_received`` round trips per second and the CPU
+time each worker process used during the measured window::
+
+    cd apps/backend && python scripts/bench_launcher.py --workers 1 2 4 --rooms 20 --players 5
+
+Workers read songs from a seeded catalog replica, and outbound HTTP goes
+to an unreachable proxy, so the run needs neither Supabase nor Deezer.
+Throughput can only grow with the worker count when the host has a core
+for each worker plus the front and this client; on fewer cores, check that
+the per-worker CPU is split evenly instead.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import websockets
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+SRC = os.path.join(BACKEND, "src")
+sys.path.insert(0, SRC)
+# Nothing listens here, so Supabase syncs and preview lookups fail fast and stay local
+UNREACHABLE = "http://127.0.0.1:9"
+os.environ.setdefault("SUPABASE_URL", UNREACHABLE)
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench")
+
+from app.catalog_replica import CatalogReplica  # noqa: E402
+from app.launcher import WorkerPool  # noqa: E402
+
+PLAYLIST = {"id": 1, "name": "Normal Mode", "description": "Load test", "is_default": True}
+SONGS = [
+    {"id": i, "title": f"Song {i}", "artist": f"Artist {i}", "deezer_track_id": str(100 + i), "preview_url": ""}
+    for i in range(1, 201)
+]
+
+
+def seed_catalog(path: str) -> None:
+    if os.path.exists(path):
+        return
+    replica = CatalogReplica(path=path)
+    links = [(str(PLAYLIST["id"]), str(song["id"])) for song in SONGS]
+    replica._apply([PLAYLIST], links, SONGS, full=True, state={"synced_at": str(time.time()), "full_synced_at": str(time.time())})
+    replica._close()
+
+
+def _children(pid: int) -> List[int]:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def _wait_for_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Front router on port {port} did not start")
+            await asyncio.sleep(0.2)
+
+
+async def _player(url: str, room_code: str, host: bool, stats: Dict[str, int], stop: asyncio.Event) -> None:
+    async with websockets.connect(url, compression=None, max_queue=None, ping_interval=None) as ws:
+        nickname = "p" + "".join(random.choices(string.ascii_lowercase, k=6))
+        await ws.send(json.dumps({"type": "join", "payload": {"roomCode": room_code, "nickname": nickname}}))
+        if host:
+            await ws.send(json.dumps({"type": "select_game_mode", "payload": {"mode": PLAYLIST["name"]}}))
+            await ws.send(json.dumps({"type": "start_game", "payload": {}}))
+        while json.loads(await ws.recv())["type"] != "round_started":
+            pass
+        answer = json.dumps({"type": "submit_answer", "payload": {"artist": "Artist 3", "title": "Song x"}})
+        while not stop.is_set():
+            await ws.send(answer)
+            while json.loads(await ws.recv())["type"] != "answer_received":
+                pass
+            stats["round_trips"] += 1
+
+
+async def measure(port: int, workers: List[int], args: argparse.Namespace) -> None:
+    await _wait_for_port(port)
+    url = f"ws://127.0.0.1:{port}/ws"
+    stats = {"round_trips": 0}
+    stop = asyncio.Event()
+    codes = ["".join(random.choices(string.ascii_uppercase, k=6)) for _ in range(args.rooms)]
+    tasks = [
+        asyncio.create_task(_player(url, code, index == 0, stats, stop))
+        for code in codes
+        for index in range(args.players)
+    ]
+    await asyncio.sleep(args.warmup)
+    start_count, start_time = stats["round_trips"], time.perf_counter()
+    start_cpu = [_cpu_seconds(pid) for pid in workers]
+    await asyncio.sleep(args.duration)
+    end_count, end_time = stats["round_trips"], time.perf_counter()
+    cpu = [_cpu_seconds(pid) - before for pid, before in zip(workers, start_cpu)]
+    stop.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    errors = len(failures)
+    if failures:
+        print(f"  first error: {failures[0]!r}")
+    print(
+        f"{len(workers)} worker(s): {(end_count - start_count) / (end_time - start_time):7.0f} round trips/s,"
+        f" {errors} errors, worker CPU {' '.join(f'{seconds:.1f}s' for seconds in cpu)}"
+    )
+
+
+def run(count: int, args: argparse.Namespace, tmp: str, catalog: str) -> None:
+    # Each worker derives its own replica path from this one, so seed all of them
+    os.environ["CATALOG_REPLICA_PATH"] = catalog
+    pool = WorkerPool(count)
+    for worker_id in pool.worker_ids:
+        seed_catalog(pool.worker_env(worker_id)["CATALOG_REPLICA_PATH"])
+    env = {
+        **os.environ,
+        "PYTHONPATH": SRC,
+        "CATALOG_SYNC_INTERVAL": "3600",
+        "ROOM_SNAPSHOT_PATH": os.path.join(tmp, f"rooms-{count}.sqlite3"),
+        "INGEST_STATE_PATH": os.path.join(tmp, "ingest.sqlite3"),
+        "ARTIST_IMAGE_CACHE_PATH": os.path.join(tmp, "artist-images.sqlite3"),
+        "HTTP_PROXY": UNREACHABLE,
+        "HTTPS_PROXY": UNREACHABLE,
+        # The front's relays to the workers must still go direct
+        "NO_PROXY": "127.0.0.1,localhost",
+    }
+    command = [
+        sys.executable, "-m", "app.launcher",
+        "--workers", str(count),
+        "--host", "127.0.0.1",
+        "--port", str(args.port),
+        "--worker-base-port", str(args.worker_base_port),
+    ]
+    launcher = subprocess.Popen(command, env=env, cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(_wait_for_port(args.port))
+        asyncio.run(measure(args.port, _children(launcher.pid), args))
+    finally:
+        launcher.send_signal(signal.SIGINT)
+        try:
+            launcher.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            launcher.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--players", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=8.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker-base-port", type=int, default=8100)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s), {args.rooms} rooms x {args.players} players, {args.duration:.0f}s per run")
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = os.path.join(tmp, "catalog.sqlite3")
+        for count in args.workers:
+            run(count, args, tmp, catalog)
+
+
+if __name__ == "__main__":
+    main()
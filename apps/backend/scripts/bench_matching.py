@@ -0,0 +1,146 @@
+"""Benchmark answer matching against the matcher it replaced.
+
+Mutated guesses for a few awkward songs are checked three ways: the old
+``GameService._check_answer`` (reproduced below), a :class:`SongMatcher`
+holding only the canonical artist and title, and one holding the derived
+alias sets. It prints per-guess times and how many guesses each matcher
+accepts that the old one did not, and the reverse::
+
+    cd apps/backend && python scripts/bench_matching.py --guesses 18000 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+sys.path.insert(0, os.path.abspath(SRC))
+
+from app.scoring import SongMatcher, artist_aliases, build_aliases, fold, normalize  # noqa: E402
+
+SONGS = [
+    ("The Beatles", "Hey Jude - Remastered 2015", ["The Beatles"]),
+    ("Beyoncé", "Crazy In Love (feat. Jay-Z)", ["Beyoncé", "JAY-Z"]),
+    ("AC/DC", "Back In Black", ["AC/DC"]),
+    ("Florence + The Machine", "Dog Days Are Over [Live]", ["Florence + The Machine"]),
+    ("Simon & Garfunkel", "The Sound of Silence - Acoustic", ["Simon & Garfunkel"]),
+    ("Calvin Harris", "This Is What You Came For - feat. Rihanna", ["Calvin Harris", "Rihanna"]),
+]
+
+Guess = Tuple[int, str, str]
+Result = Dict[str, bool]
+
+
+def original_check(artist_guess: str, title_guess: str, artist: str, title: str) -> Result:
+    """``GameService._check_answer`` before the matcher existed."""
+
+    from difflib import SequenceMatcher
+    import re
+
+    def normalize(text: str) -> str:
+        text = text.lower()
+        text = re.sub(r"\([^)]*\)", "", text)
+        text = re.sub(r"\[[^\]]*\]", "", text)
+        text = re.sub(r"\s*-\s*remaster(ed)?.*", "", text, flags=re.IGNORECASE)
+        text = re.sub(r"\s*-\s*\d{4}.*", "", text)
+        text = re.sub(r"[^\w\s]", "", text)
+        text = " ".join(text.split())
+        return text.strip()
+
+    def similarity(guess: str, answer: str) -> float:
+        return SequenceMatcher(None, guess, answer).ratio()
+
+    artist_correct = similarity(normalize(artist_guess), normalize(artist)) >= 0.80
+    title_correct = similarity(normalize(title_guess), normalize(title)) >= 0.80
+    return {
+        "artist_correct": artist_correct,
+        "title_correct": title_correct,
+        "both_correct": artist_correct and title_correct,
+    }
+
+
+def _mutate(rng: random.Random, text: str) -> str:
+    chars = list(text)
+    for _ in range(rng.randint(0, 4)):
+        op = rng.random()
+        index = rng.randrange(len(chars) + 1)
+        if op < 0.4 and chars:
+            chars.pop(min(index, len(chars) - 1))
+        elif op < 0.8:
+            chars.insert(index, rng.choice(string.ascii_letters + " "))
+        elif chars:
+            chars[min(index, len(chars) - 1)] = rng.choice(string.ascii_letters)
+    return "".join(chars)
+
+
+def make_guesses(count: int, seed: int) -> List[Guess]:
+    rng = random.Random(seed)
+    guesses: List[Guess] = []
+    for _ in range(count):
+        song = rng.randrange(len(SONGS))
+        artist, title, credits = SONGS[song]
+        # Guess either the canonical answer or one of its accepted forms
+        artist_base = rng.choice(artist_aliases(credits) + [artist])
+        title_base = rng.choice(build_aliases(title, credits)["title"] + [title])
+        guesses.append((
+            song,
+            _mutate(rng, artist_base) if rng.random() < 0.8 else "",
+            _mutate(rng, title_base) if rng.random() < 0.8 else "x",
+        ))
+    return guesses
+
+
+def _timed(
+    guesses: List[Guess],
+    check: Callable[[int, str, str], Result],
+    repeat: int,
+) -> Tuple[float, List[Result]]:
+    """Best per-guess time over ``repeat`` passes, each with cold normalize caches."""
+
+    best = float("inf")
+    results: List[Result] = []
+    for _ in range(repeat):
+        normalize.cache_clear()
+        fold.cache_clear()
+        start = time.perf_counter()
+        results = [check(song, artist, title) for song, artist, title in guesses]
+        best = min(best, (time.perf_counter() - start) / len(guesses))
+    return best, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guesses", type=int, default=18000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    guesses = make_guesses(args.guesses, args.seed)
+    # Only the canonical forms, which is what the matcher held before aliases
+    canonical = [SongMatcher(a, t, {"artist": [normalize(a)], "title": [normalize(t)]}) for a, t, _ in SONGS]
+    aliased = [SongMatcher(a, t, build_aliases(t, credits)) for a, t, credits in SONGS]
+
+    runs = {
+        "original": _timed(guesses, lambda s, a, t: original_check(a, t, SONGS[s][0], SONGS[s][1]), args.repeat),
+        "matcher": _timed(guesses, lambda s, a, t: canonical[s].check(a, t), args.repeat),
+        "aliases": _timed(guesses, lambda s, a, t: aliased[s].check(a, t), args.repeat),
+    }
+    baseline = runs["original"][1]
+    print(f"{len(guesses)} guesses over {len(SONGS)} songs")
+    for name, (per_guess, results) in runs.items():
+        lost = gained = 0
+        for old, new in zip(baseline, results):
+            for field in ("artist_correct", "title_correct"):
+                lost += old[field] and not new[field]
+                gained += new[field] and not old[field]
+        print(f"  {name:9} {per_guess * 1e6:6.1f} us/guess  lost {lost:4}  gained {gained:4}")
+
+
+if __name__ == "__main__":
+    main()
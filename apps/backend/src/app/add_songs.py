@@ -1,14 +1,29 @@
-from typing import Iterable, Optional, Tuple
+from typing import Callable, Iterable, List, Optional, Tuple
 from sentry_sdk import get_client
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
 from dotenv import load_dotenv
 from itertools import islice
+from .artist_images import artist_image_cache
 from .database import Database
-from dataclasses import dataclass
+from .ingest_state import (
+    MISSING,
+    IngestCheckpoints,
+    RateSlots,
+    ResolutionCache,
+    ingest_checkpoints,
+    rate_slots,
+    resolution_cache,
+)
+from .scoring import build_aliases
+from dataclasses import dataclass, field
+from concurrent.futures import Future, ThreadPoolExecutor
 import deezer
 import json
 import os
+import queue
+import threading
+import time
 load_dotenv()
 
 SPOTIFY_SCOPES = os.getenv(
@@ -18,10 +33,19 @@ SPOTIFY_SCOPES = os.getenv(
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIPY_REDIRECT_URI", "http://127.0.0.1:8888/callback")
 DEFAULT_PLAYLIST_NAME = os.getenv("DEFAULT_INGEST_PLAYLIST", "Normal Mode")
 
+# Ingestion pipeline tuning. Deezer allows 50 requests per 5 seconds per
+# client; Spotify's quota is a rolling 30-second window, so stay well under.
+# Both limits hold across every process sharing INGEST_STATE_PATH.
+INGEST_RESOLVE_WORKERS = int(os.getenv("INGEST_RESOLVE_WORKERS", "8"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+DEEZER_RATE_LIMIT = float(os.getenv("DEEZER_RATE_LIMIT", "9"))  # requests per second
+SPOTIFY_RATE_LIMIT = float(os.getenv("SPOTIFY_RATE_LIMIT", "5"))  # requests per second
+
 @dataclass
 class TrackIn:
     title:str
     artists: list[str]
+    artist_ids: list[str] = field(default_factory=list)
     
 @dataclass
 class TrackOut:
@@ -29,6 +53,56 @@ class TrackOut:
     artist:str
     deezer_track_id: str
     preview_url: str
+    aliases: dict = field(default_factory=dict)
+
+@dataclass
+class IngestProgress:
+    """Running counts for one playlist import, handed to the progress callback."""
+    total_seen: int = 0
+    resolved: int = 0
+    unmatched: int = 0
+    stored: int = 0
+    added: int = 0
+    linked: int = 0
+    done: bool = False
+
+
+class RateLimiter:
+    """Spaces calls evenly so at most ``rate`` happen per second, across threads.
+
+    With ``slots`` the spacing is shared through the ingest state file, so
+    every process importing through it stays within the same quota.
+    """
+
+    def __init__(self, rate: float, *, name: str = "", slots: Optional[RateSlots] = None) -> None:
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._name = name
+        self._slots = slots
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if not self._interval:
+            return
+        if self._slots is not None:
+            delay = self._slots.reserve(self._name, self._interval) - time.time()
+        else:
+            with self._lock:
+                now = time.monotonic()
+                slot = max(now, self._next)
+                self._next = slot + self._interval
+            delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+deezer_limiter = RateLimiter(DEEZER_RATE_LIMIT, name="deezer", slots=rate_slots)
+spotify_limiter = RateLimiter(SPOTIFY_RATE_LIMIT, name="spotify", slots=rate_slots)
+
+
+class IngestCancelled(Exception):
+    """Raised by an import stopped through its cancel event; its checkpoint is kept."""
+
 
 def get_spotify_client() -> spotipy.Spotify:
     auth = SpotifyOAuth(
@@ -42,24 +116,6 @@ def get_spotify_client() -> spotipy.Spotify:
     )
     return spotipy.Spotify(auth_manager=auth)
 
-def get_artist_id_by_name(sp: spotipy.Spotify, name: str) -> Optional[str]:
-    q = f'artist:"{name}"'
-    res = sp.search(q=q, type="artist", limit=5)
-    items = res.get("artists", {}).get("items", [])
-    if not items:
-        return None
-    exact = next((a for a in items if a["name"].lower() == name.lower()), None)
-    artist = exact or max(items, key=lambda a: a.get("popularity", 0))
-    return artist["id"]
-
-def get_artist_image_url(sp: spotipy.Spotify, artist_name: str) -> Optional[str]:
-    artist_id = get_artist_id_by_name(sp, artist_name)
-    if not artist_id:
-        return None  # artist not found
-    artist_obj = sp.artist(artist_id)  # <-- fetch the full artist object
-    images = artist_obj.get("images", [])
-    return images[0]["url"] if images else None
-    
 def get_user_playlists(sp: spotipy.Spotify) -> list[dict]:
     """Fetch all playlists for the authenticated user."""
     playlists = []
@@ -80,31 +136,40 @@ def get_user_playlists(sp: spotipy.Spotify) -> list[dict]:
     return playlists
 
 
-def _iter_playlist_tracks(sp: spotipy.Spotify, playlist_id:str) -> Iterable[TrackIn]:
-    offset = 0
+def _iter_playlist_pages(
+    sp: spotipy.Spotify, playlist_id: str, start: int = 0
+) -> Iterable[Tuple[int, List[TrackIn]]]:
+    """Yield ``(next_offset, tracks)`` for each page of the playlist from ``start``."""
+    offset = start
     while True:
+        spotify_limiter.wait()
         page = sp.playlist_items(
             playlist_id,
             limit=100,
             offset=offset,
             additional_types=("track",),
-            fields="items(track(name,artists(name),type)),next",
+            fields="items(track(name,artists(name,id),type)),next",
         )
+        tracks = []
         for it in page.get("items", []):
             t = it.get("track")
             if not t or t.get("type") != "track":
                 continue
             title = (t.get("name") or "").strip()
-            artists = [a.get("name", "") for a in (t.get("artists") or []) if a.get("name")]
+            named = [a for a in (t.get("artists") or []) if a.get("name")]
+            artists = [a["name"] for a in named]
+            artist_ids = [a.get("id") or "" for a in named]
             if title and artists:
-                yield TrackIn(title=title, artists=artists)
+                tracks.append(TrackIn(title=title, artists=artists, artist_ids=artist_ids))
+        offset += 100
+        yield offset, tracks
         if not page.get("next"):
             break
-        offset += 100
 
 
 def _resolve_deezer(dz: deezer.Client, title: str, artist: str) -> Optional[TrackOut]:
     q = f"{title} {artist}"
+    deezer_limiter.wait()
     results = dz.search(q) or []
     if not results:
         return None
@@ -117,64 +182,350 @@ def _resolve_deezer(dz: deezer.Client, title: str, artist: str) -> Optional[Trac
     )
 
 
+def _cache_artist_images(sp: spotipy.Spotify, pending: dict[str, set[str]]) -> None:
+    """Store images for Spotify artist ids, under every name they were seen as."""
+    ids = list(pending)
+    for start in range(0, len(ids), 50):
+        chunk = ids[start:start + 50]
+        spotify_limiter.wait()
+        res = sp.artists(chunk)
+        entries = []
+        for artist_id, artist in zip(chunk, res.get("artists") or []):
+            images = (artist or {}).get("images") or []
+            url = images[0]["url"] if images else None
+            entries.extend((name, url) for name in pending[artist_id])
+        artist_image_cache.put_many(entries)
+    pending.clear()
+
+
 def _get_or_create_db_playlist(name: str) -> dict:
     existing = Database.get_all_playlists()
     found = next((p for p in existing if p.get("name") == name), None)
     if found:
         return found
-    created = Database.create_playlist(name=name, is_default=True, description="Imported from Spotify")[0]
-    return created
-
-def _upsert_and_link(track: TrackOut, playlist_id: int) -> Tuple[bool, bool]:
-    existing = Database.search_songs(track.title)
-    match = next((s for s in existing if s["artist"].lower() == track.artist.lower()), None)
-    if match:
-        song_id = match["id"]
-        added = False
-    else:
-        song = Database.create_song(
-            title=track.title,
-            artist=track.artist,
-            preview_url=track.preview_url or "",
-            deezer_track_id=track.deezer_track_id,
-        )[0]
-        song_id = song["id"]
-        added = True
-    try:
-        Database.add_song_to_playlist(playlist_id=playlist_id, song_id=song_id)
-        linked = True
-    except Exception as e:
-        msg = str(e).lower()
-        if "duplicate" in msg or "unique" in msg:
-            linked = False
-        else:
-            raise
-    return added, linked
+    # The game server learns about it from its next catalog replica sync
+    return Database.create_playlist(name=name, is_default=True, description="Imported from Spotify")[0]
 
-def ingest_spotify_playlist(spotify_playlist_id: str, target_playlist_name: str = DEFAULT_PLAYLIST_NAME) -> dict:
-    sp = get_spotify_client()
-    dz = deezer.Client()
+def _upsert_and_link(tracks: List[TrackOut], playlist_id: int) -> Tuple[int, int]:
+    """Store a batch of tracks and link them to the playlist in bulk.
+
+    Songs are matched on deezer_track_id, then on title and artist so rows
+    stored before that column was filled in are reused rather than copied.
+    Returns how many songs were created and how many new playlist links
+    were made.
+    """
+    by_deezer_id: dict[str, TrackOut] = {}
+    for track in tracks:
+        by_deezer_id.setdefault(track.deezer_track_id, track)
+    song_ids = {
+        str(song["deezer_track_id"]): song["id"]
+        for song in Database.get_songs_by_deezer_ids(list(by_deezer_id))
+    }
+    missing = [track for deezer_id, track in by_deezer_id.items() if deezer_id not in song_ids]
+    if missing:
+        legacy = {
+            (song["title"], song["artist"].lower()): song["id"]
+            for song in Database.get_songs_by_titles({track.title for track in missing})
+        }
+        for track in missing:
+            song_id = legacy.get((track.title, track.artist.lower()))
+            if song_id is not None:
+                song_ids[track.deezer_track_id] = song_id
+    rows = [
+        {
+            "title": track.title,
+            "artist": track.artist,
+            "preview_url": track.preview_url or "",
+            "deezer_track_id": track.deezer_track_id,
+            "aliases": track.aliases or None,
+        }
+        for deezer_id, track in by_deezer_id.items()
+        if deezer_id not in song_ids
+    ]
+    created = Database.upsert_songs(rows) if rows else []
+    for song in created:
+        song_ids[str(song["deezer_track_id"])] = song["id"]
+    # Rows another import stored since the lookup above are skipped by the upsert
+    raced = [row["deezer_track_id"] for row in rows if row["deezer_track_id"] not in song_ids]
+    if raced:
+        for song in Database.get_songs_by_deezer_ids(raced):
+            song_ids[str(song["deezer_track_id"])] = song["id"]
+    links = Database.add_songs_to_playlist(playlist_id, list(song_ids.values()))
+    return len(created), len(links)
+
+def _store_batch(
+    sp: spotipy.Spotify,
+    batch: List[Tuple[TrackIn, TrackOut]],
+    playlist_id: int,
+    progress: IngestProgress,
+    pending_images: dict[str, set[str]],
+) -> None:
+    for tr, resolved in batch:
+        resolved.aliases = build_aliases(
+            resolved.title,
+            [resolved.artist, *tr.artists],
+            extra_titles=[tr.title],
+        )
+    added, linked = _upsert_and_link([resolved for _, resolved in batch], playlist_id)
+    progress.added += added
+    progress.linked += linked
+    for tr, resolved in batch:
+        artist_id = tr.artist_ids[0] if tr.artist_ids else ""
+        if artist_id and not artist_image_cache.contains(resolved.artist):
+            pending_images.setdefault(artist_id, set()).update({tr.artists[0], resolved.artist})
+            if len(pending_images) >= 50:
+                _cache_artist_images(sp, pending_images)
+    progress.stored += len(batch)
+
+
+def _print_progress(progress: IngestProgress) -> None:
+    print(
+        f"Seen {progress.total_seen}, resolved {progress.resolved}, "
+        f"unmatched {progress.unmatched}, stored {progress.stored}"
+    )
+
+
+_END = object()
+
+
+@dataclass
+class _Page:
+    """Bookkeeping for one Spotify page while its tracks move through the pipeline."""
+    end: int
+    pending: int = 0
+    seen: int = 0
+    unmatched: int = 0
+    sealed: bool = False
+
+
+class _PlaylistImport:
+    """One run of :func:`ingest_spotify_playlist`.
+
+    The calling thread pages through Spotify, a pool of ``workers`` threads
+    resolves tracks on Deezer (or from the local resolution cache), and a
+    writer thread stores them in batches of ``batch_size``. Bounded queues
+    between the stages keep memory flat and the shared rate limiters keep
+    both APIs within quota.
+
+    Once every track of a page is stored or known to be unmatched, and all
+    earlier pages are too, the page end becomes the checkpoint offset.
+    """
+
+    def __init__(
+        self,
+        spotify_playlist_id: str,
+        playlist_id: int,
+        *,
+        on_progress: Optional[Callable[[IngestProgress], None]],
+        workers: int,
+        batch_size: int,
+        cache: ResolutionCache,
+        checkpoints: IngestCheckpoints,
+        spotify: Optional[spotipy.Spotify] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> None:
+        self.spotify_playlist_id = spotify_playlist_id
+        self.playlist_id = playlist_id
+        self._on_progress = on_progress
+        self._workers = workers
+        self._batch_size = batch_size
+        self._cache = cache
+        self._checkpoints = checkpoints
+        self._sp = spotify or get_spotify_client()
+        self._cancel = cancel or threading.Event()
+        self._dz = deezer.Client()
+
+        self.offset, counts = checkpoints.load(spotify_playlist_id, playlist_id)
+        self.progress = IngestProgress(
+            total_seen=counts.get("total_seen", 0),
+            unmatched=counts.get("unmatched", 0),
+            added=counts.get("added", 0),
+            linked=counts.get("linked", 0),
+        )
+        self._committed = {"total_seen": self.progress.total_seen, "unmatched": self.progress.unmatched}
+        self._pages: List[_Page] = []
+        self._lock = threading.Lock()
+        self._resolved_q: "queue.Queue[object]" = queue.Queue(maxsize=batch_size * 2)
+        self._in_flight = threading.BoundedSemaphore(workers * 2)
+        self._errors: List[BaseException] = []
+        self._pending_images: dict[str, set[str]] = {}
+
+    def run(self) -> IngestProgress:
+        if self.offset:
+            print(f"Resuming import of {self.spotify_playlist_id} at offset {self.offset}")
+        writer = threading.Thread(target=self._write, name="ingest-writer", daemon=True)
+        writer.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="ingest-resolve") as pool:
+                for end, tracks in _iter_playlist_pages(self._sp, self.spotify_playlist_id, self.offset):
+                    if self._errors or self._cancel.is_set():
+                        break
+                    page = _Page(end=end)
+                    with self._lock:
+                        self._pages.append(page)
+                    for tr in tracks:
+                        if self._cancel.is_set():
+                            break
+                        with self._lock:
+                            page.pending += 1
+                            page.seen += 1
+                            self.progress.total_seen += 1
+                        self._in_flight.acquire()
+                        future = pool.submit(self._resolve, tr)
+                        future.add_done_callback(lambda f, tr=tr, page=page: self._resolved(page, tr, f))
+                    if self._cancel.is_set():
+                        # Leave the page unsealed so the checkpoint stays before it
+                        break
+                    with self._lock:
+                        page.sealed = True
+                        if self._advance():
+                            self._save()
+        finally:
+            self._resolved_q.put(_END)
+            writer.join()
+        if self._errors:
+            raise self._errors[0]
+        if self._cancel.is_set():
+            raise IngestCancelled(f"Import of {self.spotify_playlist_id} cancelled at offset {self.offset}")
+        if self._pending_images:
+            _cache_artist_images(self._sp, self._pending_images)
+        self._checkpoints.clear(self.spotify_playlist_id, self.playlist_id)
+        self.progress.done = True
+        self._report()
+        return self.progress
+
+    def _report(self) -> None:
+        if self._on_progress:
+            self._on_progress(self.progress)
+
+    def _resolve(self, tr: TrackIn) -> Optional[TrackOut]:
+        try:
+            artist = tr.artists[0]
+            cached = self._cache.get(tr.title, artist)
+            if cached is not MISSING:
+                return TrackOut(**cached) if cached else None
+            resolved = _resolve_deezer(self._dz, tr.title, artist)
+            self._cache.put(tr.title, artist, _resolution_entry(resolved))
+            return resolved
+        finally:
+            self._in_flight.release()
+
+    def _resolved(self, page: _Page, tr: TrackIn, future: "Future[Optional[TrackOut]]") -> None:
+        if future.exception() is not None:
+            self._errors.append(future.exception())
+            return
+        result = future.result()
+        with self._lock:
+            if result is None:
+                self.progress.unmatched += 1
+                page.unmatched += 1
+                page.pending -= 1
+                if self._advance():
+                    self._save()
+                return
+            self.progress.resolved += 1
+        self._resolved_q.put((page, tr, result))
+
+    def _write(self) -> None:
+        batch: List[Tuple[_Page, TrackIn, TrackOut]] = []
+        while True:
+            item = self._resolved_q.get()
+            if item is not _END:
+                batch.append(item)  # type: ignore[arg-type]
+            if batch and (len(batch) >= self._batch_size or item is _END):
+                # After a failure keep draining, so resolvers never block on a full queue
+                if not self._errors:
+                    try:
+                        self._store(batch)
+                    except BaseException as exc:
+                        self._errors.append(exc)
+                batch = []
+            if item is _END:
+                return
+
+    def _store(self, batch: List[Tuple[_Page, TrackIn, TrackOut]]) -> None:
+        _store_batch(
+            self._sp,
+            [(tr, resolved) for _, tr, resolved in batch],
+            self.playlist_id,
+            self.progress,
+            self._pending_images,
+        )
+        with self._lock:
+            for page, _, _ in batch:
+                page.pending -= 1
+            self._advance()
+            # Save even if the offset stayed put, to keep the stored counts
+            self._save()
+        self._report()
+
+    def _advance(self) -> bool:
+        """Move the offset past every leading page that is fully done. Holds ``_lock``."""
+        moved = False
+        while self._pages and self._pages[0].sealed and self._pages[0].pending == 0:
+            page = self._pages.pop(0)
+            self.offset = page.end
+            self._committed["total_seen"] += page.seen
+            self._committed["unmatched"] += page.unmatched
+            moved = True
+        return moved
+
+    def _save(self) -> None:
+        """Write the checkpoint. Holds ``_lock``."""
+        # added/linked may include tracks past the offset; storing those
+        # again on a rerun creates nothing, so they are not counted twice
+        counts = {**self._committed, "added": self.progress.added, "linked": self.progress.linked}
+        self._checkpoints.save(self.spotify_playlist_id, self.playlist_id, self.offset, counts)
+
+
+def _resolution_entry(track: Optional[TrackOut]) -> Optional[dict]:
+    if track is None:
+        return None
+    return {
+        "title": track.title,
+        "artist": track.artist,
+        "deezer_track_id": track.deezer_track_id,
+        "preview_url": track.preview_url,
+    }
+
+
+def ingest_spotify_playlist(
+    spotify_playlist_id: str,
+    target_playlist_name: str = DEFAULT_PLAYLIST_NAME,
+    *,
+    on_progress: Optional[Callable[[IngestProgress], None]] = None,
+    workers: int = INGEST_RESOLVE_WORKERS,
+    batch_size: int = INGEST_BATCH_SIZE,
+    spotify: Optional[spotipy.Spotify] = None,
+    cancel: Optional[threading.Event] = None,
+) -> dict:
+    """Import a Spotify playlist, continuing from its checkpoint if an earlier run failed.
+
+    ``spotify`` defaults to the interactive OAuth client. Setting ``cancel``
+    stops the import after the tracks already in flight are stored and raises
+    :class:`IngestCancelled`.
+    """
     target = _get_or_create_db_playlist(target_playlist_name)
     pid = target["id"]
-
-    added = linked = missing = total = 0
-    for tr in _iter_playlist_tracks(sp, spotify_playlist_id):
-        total += 1
-        resolved = _resolve_deezer(dz, tr.title, tr.artists[0])
-        if not resolved:
-            missing += 1
-            continue
-        a, l = _upsert_and_link(resolved, pid)
-        added += int(a)
-        linked += int(l)
+    progress = _PlaylistImport(
+        spotify_playlist_id,
+        pid,
+        on_progress=on_progress,
+        workers=workers,
+        batch_size=batch_size,
+        cache=resolution_cache,
+        checkpoints=ingest_checkpoints,
+        spotify=spotify,
+        cancel=cancel,
+    ).run()
 
     return {
         "target_playlist_id": pid,
         "spotify_playlist_id": spotify_playlist_id,
-        "total_seen": total,
-        "added_new_songs": added,
-        "linked_to_playlist": linked,
-        "unmatched_on_deezer": missing,
+        "total_seen": progress.total_seen,
+        "added_new_songs": progress.added,
+        "linked_to_playlist": progress.linked,
+        "unmatched_on_deezer": progress.unmatched,
     }
     
     
@@ -255,7 +606,7 @@ def pg_flow(sp:spotipy.Spotify):
     
     
     playlist_name = input("Enter a name for the playlist: ")
-    summary = ingest_spotify_playlist(pl_id, playlist_name)
+    summary = ingest_spotify_playlist(pl_id, playlist_name, on_progress=_print_progress)
     print("\n" + "="*50)
     print("IMPORT SUMMARY")
     print("="*50)
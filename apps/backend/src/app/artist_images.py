@@ -0,0 +1,197 @@
+"""Artist image lookups backed by an in-memory LRU and a local SQLite file."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+import spotipy
+from dotenv import load_dotenv
+from spotipy.oauth2 import SpotifyClientCredentials
+
+load_dotenv()
+
+ARTIST_IMAGE_CACHE_PATH = os.getenv("ARTIST_IMAGE_CACHE_PATH", ".cache-artist-images.sqlite3")
+
+_server_client: Optional[spotipy.Spotify] = None
+_server_client_lock = threading.Lock()
+
+
+def get_server_spotify_client() -> spotipy.Spotify:
+    """Return the process-wide Spotify client used by the game server.
+
+    Uses client-credentials auth, so it needs no user token file and refreshes
+    its own access token in memory.
+    """
+
+    global _server_client
+    with _server_client_lock:
+        if _server_client is None:
+            auth = SpotifyClientCredentials(
+                client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+                client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
+            )
+            _server_client = spotipy.Spotify(auth_manager=auth, requests_timeout=5, retries=1)
+        return _server_client
+
+
+def _pick_artist(items: list, name: str) -> Optional[dict]:
+    if not items:
+        return None
+    exact = next((a for a in items if a["name"].lower() == name.lower()), None)
+    return exact or max(items, key=lambda a: a.get("popularity", 0))
+
+
+def get_artist_image_url(sp: spotipy.Spotify, artist_name: str) -> Optional[str]:
+    q = f'artist:"{artist_name}"'
+    res = sp.search(q=q, type="artist", limit=5)
+    artist = _pick_artist(res.get("artists", {}).get("items", []), artist_name)
+    if not artist:
+        return None  # artist not found
+    images = artist.get("images")
+    if images is None:
+        # Simplified artist objects omit images; fetch the full one
+        images = sp.artist(artist["id"]).get("images", [])
+    return images[0]["url"] if images else None
+
+
+def normalize_artist_name(name: str) -> str:
+    return " ".join(name.casefold().split())
+
+
+_MISSING = object()
+
+
+class ArtistImageCache:
+    """Artist name -> image URL cache, LRU in memory and persisted to SQLite.
+
+    ``None`` is stored for artists Spotify had no image for; those negative
+    entries expire after ``negative_ttl`` seconds so they are retried.
+    """
+
+    def __init__(
+        self,
+        path: str = ARTIST_IMAGE_CACHE_PATH,
+        *,
+        max_entries: int = 4096,
+        negative_ttl: float = 86400.0,
+    ) -> None:
+        self._path = path
+        self._max_entries = max_entries
+        self._negative_ttl = negative_ttl
+        self._memory: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS artist_images ("
+                " name TEXT PRIMARY KEY,"
+                " image_url TEXT,"
+                " fetched_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _is_live(self, url: Optional[str], fetched_at: float) -> bool:
+        return url is not None or time.time() - fetched_at < self._negative_ttl
+
+    def _remember(self, key: str, url: Optional[str], fetched_at: float) -> None:
+        self._memory[key] = (url, fetched_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    def get_cached(self, name: str) -> object:
+        """Memory-only lookup; returns ``_MISSING`` when the LRU has no entry."""
+
+        key = normalize_artist_name(name)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None or not self._is_live(*entry):
+                return _MISSING
+            self._memory.move_to_end(key)
+            return entry[0]
+
+    def lookup(self, name: str) -> object:
+        """Memory then SQLite lookup; returns ``_MISSING`` when neither has it."""
+
+        cached = self.get_cached(name)
+        if cached is not _MISSING:
+            return cached
+
+        key = normalize_artist_name(name)
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT image_url, fetched_at FROM artist_images WHERE name = ?", (key,)
+            ).fetchone()
+            if row is None or not self._is_live(row[0], row[1]):
+                return _MISSING
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def contains(self, name: str) -> bool:
+        return self.lookup(name) is not _MISSING
+
+    def put_many(self, items: Iterable[Tuple[str, Optional[str]]]) -> None:
+        now = time.time()
+        rows = [(normalize_artist_name(name), url, now) for name, url in items if name]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO artist_images (name, image_url, fetched_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            for key, url, fetched_at in rows:
+                self._remember(key, url, fetched_at)
+
+    def put(self, name: str, url: Optional[str]) -> None:
+        self.put_many([(name, url)])
+
+
+class ArtistImageResolver:
+    """Answers reveal-time artist image lookups, usually without any network call."""
+
+    def __init__(self, cache: Optional[ArtistImageCache] = None) -> None:
+        self._cache = cache or artist_image_cache
+
+    async def resolve(self, artist_name: str) -> Optional[str]:
+        if not artist_name:
+            return None
+        cached = self._cache.get_cached(artist_name)
+        if cached is not _MISSING:
+            return cached  # type: ignore[return-value]
+        return await asyncio.to_thread(self._resolve_blocking, artist_name)
+
+    def _resolve_blocking(self, artist_name: str) -> Optional[str]:
+        cached = self._cache.lookup(artist_name)
+        if cached is not _MISSING:
+            return cached  # type: ignore[return-value]
+        url = get_artist_image_url(get_server_spotify_client(), artist_name)
+        self._cache.put(artist_name, url)
+        return url
+
+
+artist_image_cache = ArtistImageCache()
+artist_image_resolver = ArtistImageResolver(artist_image_cache)
+
+
+__all__ = [
+    "ArtistImageCache",
+    "ArtistImageResolver",
+    "artist_image_cache",
+    "artist_image_resolver",
+    "get_artist_image_url",
+    "get_server_spotify_client",
+    "normalize_artist_name",
+]
@@ -0,0 +1,87 @@
+"""Process-wide cache of the playlist catalog."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .catalog_replica import CatalogReplica, catalog_replica
+from .database import AsyncDatabase
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One consistent read of the ``playlists`` table."""
+
+    playlists: Tuple[Dict[str, Any], ...]
+    ids_by_name: Dict[str, Any]
+    etag: str
+    loaded_at: float
+
+
+class PlaylistCatalog:
+    """Caches playlist rows and name lookups with TTL and explicit invalidation."""
+
+    DEFAULT_TTL = 300.0
+
+    def __init__(
+        self, database: Optional[Union[AsyncDatabase, CatalogReplica]] = None, *, ttl: float = DEFAULT_TTL
+    ) -> None:
+        self._db = database or catalog_replica
+        self._ttl = ttl
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _is_fresh(self, snapshot: Optional[CatalogSnapshot]) -> bool:
+        return snapshot is not None and time.monotonic() - snapshot.loaded_at < self._ttl
+
+    async def snapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._is_fresh(self._snapshot):
+                return self._snapshot
+            rows = await self._db.get_all_playlists() or []
+            self._snapshot = self._build(rows)
+            return self._snapshot
+
+    @staticmethod
+    def _build(rows: List[Dict[str, Any]]) -> CatalogSnapshot:
+        playlists = tuple(row for row in rows if isinstance(row, dict))
+        ids_by_name: Dict[str, Any] = {}
+        for row in playlists:
+            ids_by_name.setdefault(row.get("name", ""), row.get("id"))
+        digest = hashlib.sha1(
+            json.dumps(playlists, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        return CatalogSnapshot(
+            playlists=playlists,
+            ids_by_name=ids_by_name,
+            etag=f'"{digest[:20]}"',
+            loaded_at=time.monotonic(),
+        )
+
+    async def get_all_playlists(self) -> List[Dict[str, Any]]:
+        return list((await self.snapshot()).playlists)
+
+    async def get_playlist_id(self, playlist_name: str) -> Optional[Any]:
+        return (await self.snapshot()).ids_by_name.get(playlist_name)
+
+    def invalidate(self) -> None:
+        """Drop the cached catalog so the next read goes back to the database."""
+
+        self._snapshot = None
+
+
+playlist_catalog = PlaylistCatalog()
+
+
+__all__ = ["CatalogSnapshot", "PlaylistCatalog", "playlist_catalog"]
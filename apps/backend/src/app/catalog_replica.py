@@ -0,0 +1,291 @@
+"""Local SQLite replica of the tables gameplay reads.
+
+Games only need ``playlists``, ``playlist_songs`` and ``songs``. A background
+sync copies them into a local SQLite file, so catalog and song pool loads
+never wait on Supabase and games keep running while it is unreachable.
+
+Each sync re-reads the small ``playlists`` table, pulls only the
+``playlist_songs`` rows created since the last sync, and fetches just the
+songs those links reference that are not stored yet. A periodic full sync
+also picks up deleted links and edited songs. Rows are stored as JSON, so
+the replica has the same columns as the remote tables.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .database import AsyncDatabase, DatabaseError, async_database
+
+CATALOG_REPLICA_PATH = os.getenv("CATALOG_REPLICA_PATH", ".cache-catalog.sqlite3")
+CATALOG_SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", "30"))
+CATALOG_FULL_SYNC_INTERVAL = float(os.getenv("CATALOG_FULL_SYNC_INTERVAL", "3600"))
+# Timestamp column of playlist_songs for "changed since" pulls; empty means full pulls
+CATALOG_CHANGE_COLUMN = os.getenv("CATALOG_CHANGE_COLUMN", "created_at")
+# Re-read this far behind the cursor, since rows may commit out of timestamp order
+CATALOG_CHANGE_OVERLAP = float(os.getenv("CATALOG_CHANGE_OVERLAP", "120"))
+
+# Ids per ``IN (...)`` lookup against the local tables
+_LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (id TEXT PRIMARY KEY, position INTEGER NOT NULL, row TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS songs (id TEXT PRIMARY KEY, row TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS playlist_songs (
+    playlist_id TEXT NOT NULL,
+    song_id TEXT NOT NULL,
+    PRIMARY KEY (playlist_id, song_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+@dataclass(frozen=True)
+class CatalogChanges:
+    """What one sync changed, so in-memory caches can drop just that."""
+
+    playlists: bool = False
+    playlist_ids: FrozenSet[Any] = frozenset()
+    full: bool = False
+
+    def __bool__(self) -> bool:
+        return self.playlists or self.full or bool(self.playlist_ids)
+
+
+def _rewind(cursor: str, seconds: float) -> str:
+    try:
+        return (datetime.fromisoformat(cursor) - timedelta(seconds=seconds)).isoformat()
+    except ValueError:
+        return cursor
+
+
+class CatalogReplica:
+    """Serves catalog reads from the local replica and keeps it in sync.
+
+    Implements the ``get_all_playlists``/``get_playlist_songs`` reads of
+    :class:`AsyncDatabase`. Until the first sync has completed, reads go to the
+    remote database instead.
+    """
+
+    def __init__(
+        self,
+        database: Optional[AsyncDatabase] = None,
+        path: str = CATALOG_REPLICA_PATH,
+        *,
+        interval: float = CATALOG_SYNC_INTERVAL,
+        full_interval: float = CATALOG_FULL_SYNC_INTERVAL,
+        change_column: str = CATALOG_CHANGE_COLUMN,
+    ) -> None:
+        self._db = database or async_database
+        self._path = path
+        self._interval = interval
+        self._full_interval = full_interval
+        self._change_column = change_column
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_lock = threading.Lock()
+        self._ready = False
+        self._sync_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._on_change: Optional[Callable[[CatalogChanges], None]] = None
+
+    # ------------------------------------------------------------------
+    # SQLite access (runs in worker threads)
+    # ------------------------------------------------------------------
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _load_state(self) -> Dict[str, str]:
+        with self._conn_lock:
+            return dict(self._connection().execute("SELECT key, value FROM sync_state").fetchall())
+
+    def _load_playlists(self) -> List[Dict[str, Any]]:
+        with self._conn_lock:
+            rows = self._connection().execute("SELECT row FROM playlists ORDER BY position").fetchall()
+        return [json.loads(row) for (row,) in rows]
+
+    def _load_playlist_songs(self, playlist_id: Any) -> List[Dict[str, Any]]:
+        with self._conn_lock:
+            rows = self._connection().execute(
+                "SELECT s.row FROM playlist_songs ps JOIN songs s ON s.id = ps.song_id WHERE ps.playlist_id = ?",
+                (str(playlist_id),),
+            ).fetchall()
+        return [json.loads(row) for (row,) in rows]
+
+    def _missing_song_ids(self, song_ids: Set[str]) -> List[str]:
+        candidates = sorted(song_ids)
+        known: Set[str] = set()
+        with self._conn_lock:
+            conn = self._connection()
+            # Primary key lookups for just these ids, in chunks under SQLite's variable limit
+            for start in range(0, len(candidates), _LOOKUP_CHUNK):
+                chunk = candidates[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                known.update(row[0] for row in conn.execute(f"SELECT id FROM songs WHERE id IN ({placeholders})", chunk))
+        return [song_id for song_id in candidates if song_id not in known]
+
+    def _apply(
+        self,
+        playlists: List[Dict[str, Any]],
+        links: List[Tuple[str, str]],
+        songs: List[Dict[str, Any]],
+        *,
+        full: bool,
+        state: Dict[str, str],
+    ) -> CatalogChanges:
+        with self._conn_lock:
+            conn = self._connection()
+            with conn:
+                before = [row for (row,) in conn.execute("SELECT row FROM playlists ORDER BY position")]
+                after = [json.dumps(row, sort_keys=True) for row in playlists]
+                conn.execute("DELETE FROM playlists")
+                conn.executemany(
+                    "INSERT INTO playlists (id, position, row) VALUES (?, ?, ?)",
+                    [(str(row.get("id")), position, text) for position, (row, text) in enumerate(zip(playlists, after))],
+                )
+                if full:
+                    conn.execute("DELETE FROM playlist_songs")
+                    conn.execute("DELETE FROM songs")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO songs (id, row) VALUES (?, ?)",
+                    [(str(song["id"]), json.dumps(song)) for song in songs],
+                )
+                # Report ids as the remote rows type them, which is how the caches key them
+                ids = {str(row.get("id")): row.get("id") for row in playlists}
+                changed: Set[Any] = set()
+                for playlist_id, song_id in links:
+                    inserted = conn.execute(
+                        "INSERT OR IGNORE INTO playlist_songs (playlist_id, song_id) VALUES (?, ?)",
+                        (playlist_id, song_id),
+                    ).rowcount
+                    if inserted:
+                        changed.add(ids.get(playlist_id, playlist_id))
+                conn.executemany("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", state.items())
+        return CatalogChanges(playlists=before != after, playlist_ids=frozenset(changed), full=full)
+
+    def _close(self) -> None:
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    async def is_ready(self) -> bool:
+        if not self._ready:
+            self._ready = "synced_at" in await asyncio.to_thread(self._load_state)
+        return self._ready
+
+    async def get_all_playlists(self) -> List[Dict[str, Any]]:
+        if await self.is_ready():
+            return await asyncio.to_thread(self._load_playlists)
+        return await self._db.get_all_playlists()
+
+    async def get_playlist_songs(self, playlist_id: Any) -> List[Dict[str, Any]]:
+        if await self.is_ready():
+            return await asyncio.to_thread(self._load_playlist_songs, playlist_id)
+        return await self._db.get_playlist_songs(playlist_id)
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+    async def sync(self, *, full: bool = False) -> CatalogChanges:
+        """Pull remote changes into the replica; a full sync rebuilds it."""
+
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            return await self._sync(full)
+
+    async def _sync(self, full: bool) -> CatalogChanges:
+        state = await asyncio.to_thread(self._load_state)
+        now = time.time()
+        column = self._change_column
+        cursor = state.get("cursor")
+        full = full or not column or not cursor or now - float(state.get("full_synced_at", 0)) >= self._full_interval
+
+        playlists = await self._db.select_all("playlists", {"select": "*", "order": "id.asc"})
+        params = {"select": "playlist_id,song_id", "order": "playlist_id.asc,song_id.asc"}
+        if column:
+            params["select"] += f",{column}"
+        if not full:
+            params[column] = f"gt.{_rewind(cursor, CATALOG_CHANGE_OVERLAP)}"
+        try:
+            rows = await self._db.select_all("playlist_songs", params)
+        except DatabaseError as exc:
+            if not column or exc.status_code != 400:
+                raise
+            print(f"Catalog sync cannot use playlist_songs.{column}, pulling all links instead: {exc.detail}")
+            self._change_column = ""
+            return await self._sync(True)
+
+        links = [(str(row["playlist_id"]), str(row["song_id"])) for row in rows]
+        if full:
+            songs = await self._db.select_all("songs", {"select": "*", "order": "id.asc"})
+        else:
+            missing = await asyncio.to_thread(self._missing_song_ids, {song_id for _, song_id in links})
+            songs = await self._db.select_in("songs", "id", missing) if missing else []
+
+        new_state = {"synced_at": str(now)}
+        if full:
+            new_state["full_synced_at"] = str(now)
+        stamps = [str(row[column]) for row in rows if column and row.get(column)]
+        if stamps:
+            new_state["cursor"] = max(stamps + ([cursor] if cursor and not full else []))
+        changes = await asyncio.to_thread(self._apply, playlists, links, songs, full=full, state=new_state)
+        self._ready = True
+        if changes:
+            print(
+                f"Catalog sync ({'full' if full else 'incremental'}): {len(playlists)} playlists,"
+                f" {len(links)} links, {len(songs)} songs pulled"
+            )
+        return changes
+
+    async def start(self, on_change: Optional[Callable[[CatalogChanges], None]] = None) -> None:
+        """Start the background sync loop; ``on_change`` runs after each sync that changed data."""
+
+        self._on_change = on_change
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                changes = await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Keep serving the local replica until the remote is back
+                print(f"Catalog sync failed: {exc}")
+            else:
+                if changes and self._on_change:
+                    self._on_change(changes)
+            await asyncio.sleep(self._interval)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self._close)
+
+
+catalog_replica = CatalogReplica()
+
+
+__all__ = ["CATALOG_REPLICA_PATH", "CatalogChanges", "CatalogReplica", "catalog_replica"]
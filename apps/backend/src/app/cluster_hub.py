@@ -0,0 +1,79 @@
+"""Minimal relay and key-value hub for :class:`HubBackend` nodes.
+
+Speaks newline-delimited JSON over TCP. It stands in for a Redis-style
+server in local multi-node setups::
+
+    python -m app.cluster_hub --port 7800
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+
+class ClusterHub:
+    """Routes envelopes between registered nodes and stores room state."""
+
+    def __init__(self) -> None:
+        self._nodes: Dict[str, asyncio.StreamWriter] = {}
+        self._store: Dict[str, Any] = {}
+
+    async def serve(self, host: str, port: int) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._on_connection, host, port, limit=2**24)
+
+    async def _on_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        node_id: Optional[str] = None
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                op = message.get("op")
+                if op == "hello":
+                    node_id = message["node"]
+                    self._nodes[node_id] = writer
+                elif op == "send":
+                    await self._forward(message["to"], {"op": "msg", "body": message["body"]})
+                elif op == "set":
+                    self._store[message["key"]] = message["value"]
+                elif op == "get":
+                    await self._write(writer, {"op": "reply", "id": message["id"], "value": self._store.get(message["key"])})
+                elif op == "del":
+                    self._store.pop(message["key"], None)
+        except (OSError, ValueError) as exc:
+            print(f"Hub connection for {node_id or 'unknown node'} failed: {exc}")
+        finally:
+            if node_id is not None and self._nodes.get(node_id) is writer:
+                del self._nodes[node_id]
+            writer.close()
+
+    async def _forward(self, node_id: str, message: Dict[str, Any]) -> None:
+        target = self._nodes.get(node_id)
+        if target is None:
+            print(f"Dropping message for unknown node {node_id}")
+            return
+        await self._write(target, message)
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+
+
+async def _main(host: str, port: int) -> None:
+    server = await ClusterHub().serve(host, port)
+    print(f"Cluster hub listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the TempoTrivia cluster hub.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7800)
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.port))
+
+
+__all__ = ["ClusterHub"]
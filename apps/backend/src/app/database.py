@@ -1,5 +1,7 @@
 import os
 from sqlite3 import Cursor 
+from typing import Any, Dict, Iterable, List, Optional
+import httpx
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from urllib.parse import quote
@@ -8,6 +10,10 @@ load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
+# Rows per request for the bulk helpers
+BULK_CHUNK_SIZE = int(os.getenv("DB_BULK_CHUNK_SIZE", "500"))
+# Rows per page when reading whole tables; must not exceed PostgREST's max-rows
+SELECT_PAGE_SIZE = int(os.getenv("DB_SELECT_PAGE_SIZE", "1000"))
 
 supabase: Client  = create_client(SUPABASE_URL, SUPABASE_KEY)
 
@@ -56,7 +62,7 @@ class Database:
         ).execute()
         return response.data
     @staticmethod
-    def create_song(title, artist, preview_url, deezer_track_id):
+    def create_song(title, artist, preview_url, deezer_track_id, aliases=None):
         """Create a new song"""
         data = {
             "title": title,
@@ -64,9 +70,54 @@ class Database:
             "preview_url": preview_url,
             "deezer_track_id": deezer_track_id,
         }
+        if aliases is not None:
+            data["aliases"] = aliases
         response = supabase.table("songs").insert(data).execute()
         return response.data
     
+    @staticmethod
+    def upsert_songs(songs, chunk_size=BULK_CHUNK_SIZE):
+        """Insert songs not stored yet, keyed by deezer_track_id.
+
+        Rows whose deezer_track_id already exists are left untouched, so only
+        the newly created rows are returned. Relies on a unique constraint on
+        songs.deezer_track_id; see docs/database-migrations.md.
+        """
+        created = []
+        for start in range(0, len(songs), chunk_size):
+            response = supabase.table("songs").upsert(
+                songs[start:start + chunk_size],
+                on_conflict="deezer_track_id",
+                ignore_duplicates=True,
+                default_to_null=False,
+            ).execute()
+            created.extend(response.data)
+        return created
+
+    @staticmethod
+    def get_songs_by_deezer_ids(deezer_track_ids, chunk_size=BULK_CHUNK_SIZE):
+        """Get songs by Deezer track id"""
+        ids = list(deezer_track_ids)
+        rows = []
+        for start in range(0, len(ids), chunk_size):
+            response = supabase.table("songs").select("*").in_(
+                "deezer_track_id", ids[start:start + chunk_size]
+            ).execute()
+            rows.extend(response.data)
+        return rows
+
+    @staticmethod
+    def get_songs_by_titles(titles, chunk_size=BULK_CHUNK_SIZE):
+        """Get songs whose title exactly matches one of ``titles``"""
+        titles = list(titles)
+        rows = []
+        for start in range(0, len(titles), chunk_size):
+            response = supabase.table("songs").select("*").in_(
+                "title", titles[start:start + chunk_size]
+            ).execute()
+            rows.extend(response.data)
+        return rows
+
     @staticmethod
     def get_song(song_id):
         """Get song by ID"""
@@ -106,6 +157,24 @@ class Database:
         response = supabase.table("playlist_songs").insert(data).execute()
         return response.data
     @staticmethod
+    def add_songs_to_playlist(playlist_id, song_ids, chunk_size=BULK_CHUNK_SIZE):
+        """Link many songs to a playlist, skipping links that already exist.
+
+        Returns only the links created by this call. Relies on a unique
+        constraint on playlist_songs (playlist_id, song_id).
+        """
+        rows = [{"playlist_id": playlist_id, "song_id": song_id} for song_id in song_ids]
+        created = []
+        for start in range(0, len(rows), chunk_size):
+            response = supabase.table("playlist_songs").upsert(
+                rows[start:start + chunk_size],
+                on_conflict="playlist_id,song_id",
+                ignore_duplicates=True,
+            ).execute()
+            created.extend(response.data)
+        return created
+
+    @staticmethod
     def get_playlist_songs(playlist_id):
         """Get all songs in a playlist"""
         response = supabase.table("playlist_songs").select(
@@ -124,4 +193,210 @@ class Database:
             .execute()
         )
         return res.data[0]["id"] if res.data else None
-    
+
+
+class DatabaseError(RuntimeError):
+    """Raised when PostgREST rejects a request made by :class:`AsyncDatabase`."""
+
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(f"PostgREST error {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class AsyncDatabase:
+    """Non-blocking counterpart of :class:`Database` for the game server.
+
+    Talks to the Supabase PostgREST endpoint directly over a pooled
+    ``httpx.AsyncClient`` so lookups made from WebSocket handlers never block
+    the event loop. The client is created lazily and closed by the app lifespan.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str],
+        api_key: Optional[str],
+        *,
+        max_connections: int = 20,
+        timeout: float = 5.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self._base_url = f"{(base_url or '').rstrip('/')}/rest/v1"
+        self._api_key = api_key or ""
+        self._max_connections = max_connections
+        self._timeout = timeout
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    # ------------------------------------------------------------------
+    # Client lifecycle
+    # ------------------------------------------------------------------
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                headers={
+                    "apikey": self._api_key,
+                    "Authorization": f"Bearer {self._api_key}",
+                },
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                ),
+                timeout=httpx.Timeout(self._timeout),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _select(self, table: str, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        response = await self._get_http().get(f"/{table}", params=params)
+        if response.is_error:
+            raise DatabaseError(response.status_code, response.text)
+        return response.json()
+
+    async def _insert(self, table: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = await self._get_http().post(
+            f"/{table}",
+            json=data,
+            headers={"Prefer": "return=representation"},
+        )
+        if response.is_error:
+            raise DatabaseError(response.status_code, response.text)
+        return response.json()
+
+    async def select_all(
+        self, table: str, params: Dict[str, str], *, page_size: int = SELECT_PAGE_SIZE
+    ) -> List[Dict[str, Any]]:
+        """Every row matching ``params``, read page by page. ``params`` needs an ``order``."""
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            page = await self._select(table, {**params, "limit": str(page_size), "offset": str(offset)})
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            offset += page_size
+
+    async def select_in(
+        self, table: str, column: str, values: Iterable[Any], *, chunk_size: int = BULK_CHUNK_SIZE // 2
+    ) -> List[Dict[str, Any]]:
+        """Rows whose ``column`` is one of ``values``, in chunks that keep URLs short."""
+        values = list(values)
+        rows: List[Dict[str, Any]] = []
+        for start in range(0, len(values), chunk_size):
+            chunk = ",".join(str(value) for value in values[start:start + chunk_size])
+            rows.extend(await self._select(table, {"select": "*", column: f"in.({chunk})"}))
+        return rows
+
+    @staticmethod
+    def _quote(value: str) -> str:
+        """Quote a value for use inside a PostgREST logical filter."""
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
+
+    # ------------------------------------------------------------------
+    # Users
+    # ------------------------------------------------------------------
+    async def create_user(self, username: str, spotify_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await self._insert("users", {"username": username, "spotify_id": spotify_id})
+
+    async def get_user(self, user_id: Any) -> Optional[Dict[str, Any]]:
+        rows = await self._select("users", {"select": "*", "id": f"eq.{user_id}"})
+        return rows[0] if rows else None
+
+    # ------------------------------------------------------------------
+    # Playlists
+    # ------------------------------------------------------------------
+    async def create_playlist(
+        self,
+        name: str,
+        creator_id: Optional[Any] = None,
+        is_default: bool = False,
+        description: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        data = {
+            "name": name,
+            "creator_id": creator_id,
+            "is_default": is_default,
+            "description": description,
+        }
+        return await self._insert("playlists", data)
+
+    async def get_all_playlists(self) -> List[Dict[str, Any]]:
+        """Get all playlists"""
+        return await self._select("playlists", {"select": "*"})
+
+    async def get_playlist_id(self, playlist_name: str) -> Optional[Any]:
+        """Return playlist id from name (exact match)."""
+        rows = await self._select(
+            "playlists",
+            {"select": "id", "name": f"eq.{playlist_name}", "limit": "1"},
+        )
+        return rows[0]["id"] if rows else None
+
+    async def get_playlist_songs(self, playlist_id: Any) -> List[Dict[str, Any]]:
+        """Get all songs in a playlist"""
+        rows = await self._select(
+            "playlist_songs",
+            {"select": "songs(*)", "playlist_id": f"eq.{playlist_id}"},
+        )
+        return [item["songs"] for item in rows]
+
+    async def add_song_to_playlist(self, playlist_id: Any, song_id: Any) -> List[Dict[str, Any]]:
+        """Add a song to a playlist"""
+        return await self._insert("playlist_songs", {"playlist_id": playlist_id, "song_id": song_id})
+
+    # ------------------------------------------------------------------
+    # Songs
+    # ------------------------------------------------------------------
+    async def search_songs(self, query: str) -> List[Dict[str, Any]]:
+        """Search songs by title or artist"""
+        pattern = self._quote(f"*{query}*")
+        return await self._select(
+            "songs",
+            {"select": "*", "or": f"(title.ilike.{pattern},artist.ilike.{pattern})"},
+        )
+
+    async def create_song(
+        self,
+        title: str,
+        artist: str,
+        preview_url: str,
+        deezer_track_id: str,
+        aliases: Optional[Dict[str, List[str]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Create a new song"""
+        data = {
+            "title": title,
+            "artist": artist,
+            "preview_url": preview_url,
+            "deezer_track_id": deezer_track_id,
+        }
+        if aliases is not None:
+            data["aliases"] = aliases
+        return await self._insert("songs", data)
+
+    async def get_song(self, song_id: Any) -> Optional[Dict[str, Any]]:
+        """Get song by ID"""
+        rows = await self._select("songs", {"select": "*", "id": f"eq.{song_id}"})
+        return rows[0] if rows else None
+
+    async def get_random_song_exclude_ids(self, playlist_id: Any, excluded_ids: Iterable[int]) -> Optional[Dict[str, Any]]:
+        """Get a random song from a specific playlist, excluding certain songs."""
+        params = {"select": "songs(*)", "playlist_id": f"eq.{playlist_id}"}
+        excluded = ",".join(str(int(song_id)) for song_id in excluded_ids)
+        if excluded:
+            params["song_id"] = f"not.in.({excluded})"
+
+        rows = await self._select("playlist_songs", params)
+        if not rows:
+            return None
+        return random.choice([item["songs"] for item in rows])
+
+
+async_database = AsyncDatabase(SUPABASE_URL, SUPABASE_KEY)
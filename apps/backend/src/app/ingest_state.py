@@ -0,0 +1,367 @@
+"""Local state for playlist imports, shared by the API and the ingest worker.
+
+All stores live in one SQLite file:
+
+* :class:`ResolutionCache` remembers which Deezer track a Spotify
+  (title, artist) pair resolved to, including misses, so overlapping
+  playlists never repeat a search.
+* :class:`IngestCheckpoints` records how far each import got, so a rerun
+  after a failure continues from the last fully stored page.
+* :class:`IngestJobs` is the queue of imports that ``app.ingest_worker``
+  processes and the REST API submits to.
+* :class:`RateSlots` hands out API call slots, so every process importing
+  through the same file shares one quota per API.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+INGEST_STATE_PATH = os.getenv("INGEST_STATE_PATH", ".cache-ingest.sqlite3")
+
+MISSING = object()
+
+
+def _normalize(value: str) -> str:
+    return " ".join(value.casefold().split())
+
+
+class _Store:
+    """Shared SQLite connection handling for the stores below."""
+
+    _SCHEMA = ""
+
+    def __init__(self, path: str = INGEST_STATE_PATH) -> None:
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(self._SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+
+class ResolutionCache(_Store):
+    """(title, artist) -> resolved Deezer track, persisted to SQLite.
+
+    ``None`` is stored when Deezer had no match; those negative entries
+    expire after ``negative_ttl`` seconds so the search is eventually retried.
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS track_resolutions ("
+        " title TEXT NOT NULL,"
+        " artist TEXT NOT NULL,"
+        " track TEXT,"
+        " resolved_at REAL NOT NULL,"
+        " PRIMARY KEY (title, artist))"
+    )
+
+    def __init__(self, path: str = INGEST_STATE_PATH, *, negative_ttl: float = 7 * 86400.0) -> None:
+        super().__init__(path)
+        self._negative_ttl = negative_ttl
+
+    def get(self, title: str, artist: str) -> Any:
+        """The cached track dict, ``None`` for a known miss, or ``MISSING``."""
+
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT track, resolved_at FROM track_resolutions WHERE title = ? AND artist = ?",
+                (_normalize(title), _normalize(artist)),
+            ).fetchone()
+        if row is None:
+            return MISSING
+        track, resolved_at = row
+        if track is None:
+            return None if time.time() - resolved_at < self._negative_ttl else MISSING
+        return json.loads(track)
+
+    def put_many(self, items: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        now = time.time()
+        rows = [
+            (_normalize(title), _normalize(artist), json.dumps(track) if track is not None else None, now)
+            for title, artist, track in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO track_resolutions (title, artist, track, resolved_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+
+    def put(self, title: str, artist: str, track: Optional[Dict[str, Any]]) -> None:
+        self.put_many([(title, artist, track)])
+
+
+class IngestCheckpoints(_Store):
+    """How far each (Spotify playlist, target playlist) import has got.
+
+    ``offset`` is the Spotify item offset before which every track is stored;
+    ``counts`` carries the summary counters accumulated up to that point.
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS ingest_checkpoints ("
+        " spotify_playlist_id TEXT NOT NULL,"
+        " target_playlist_id TEXT NOT NULL,"
+        " item_offset INTEGER NOT NULL,"
+        " counts TEXT NOT NULL,"
+        " updated_at REAL NOT NULL,"
+        " PRIMARY KEY (spotify_playlist_id, target_playlist_id))"
+    )
+
+    def load(self, spotify_playlist_id: str, target_playlist_id: Any) -> Tuple[int, Dict[str, int]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT item_offset, counts FROM ingest_checkpoints"
+                " WHERE spotify_playlist_id = ? AND target_playlist_id = ?",
+                (spotify_playlist_id, str(target_playlist_id)),
+            ).fetchone()
+        if row is None:
+            return 0, {}
+        return int(row[0]), json.loads(row[1])
+
+    def save(self, spotify_playlist_id: str, target_playlist_id: Any, offset: int, counts: Dict[str, int]) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO ingest_checkpoints"
+                " (spotify_playlist_id, target_playlist_id, item_offset, counts, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (spotify_playlist_id, str(target_playlist_id), offset, json.dumps(counts), time.time()),
+            )
+            conn.commit()
+
+    def clear(self, spotify_playlist_id: str, target_playlist_id: Any) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM ingest_checkpoints WHERE spotify_playlist_id = ? AND target_playlist_id = ?",
+                (spotify_playlist_id, str(target_playlist_id)),
+            )
+            conn.commit()
+
+
+# Job lifecycle: queued -> running -> done | failed | cancelled
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class IngestJobs(_Store):
+    """Queue of playlist imports, safe to share between processes."""
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+        " id TEXT PRIMARY KEY,"
+        " spotify_playlist_id TEXT NOT NULL,"
+        " target_playlist TEXT NOT NULL,"
+        " status TEXT NOT NULL,"
+        " cancel_requested INTEGER NOT NULL DEFAULT 0,"
+        " progress TEXT,"
+        " summary TEXT,"
+        " error TEXT,"
+        " created_at REAL NOT NULL,"
+        " updated_at REAL NOT NULL)"
+    )
+
+    @staticmethod
+    def _row(cursor: sqlite3.Cursor, row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(zip((column[0] for column in cursor.description), row))
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        for key in ("progress", "summary"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def _fetch_one(self, sql: str, params: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(sql, params)
+            row = cursor.fetchone()
+            conn.commit()
+            return self._row(cursor, row)
+
+    def submit(self, spotify_playlist_id: str, target_playlist: str) -> Dict[str, Any]:
+        """Queue an import; an identical import that is still active is returned instead."""
+
+        existing = self._fetch_one(
+            "SELECT * FROM ingest_jobs WHERE spotify_playlist_id = ? AND target_playlist = ?"
+            " AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+            (spotify_playlist_id, target_playlist, *ACTIVE_STATUSES),
+        )
+        if existing is not None:
+            return existing
+        now = time.time()
+        return self._fetch_one(
+            "INSERT INTO ingest_jobs (id, spotify_playlist_id, target_playlist, status, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?) RETURNING *",
+            (uuid.uuid4().hex, spotify_playlist_id, target_playlist, QUEUED, now, now),
+        )  # type: ignore[return-value]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._fetch_one("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,))
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._connection().execute(
+                "SELECT * FROM ingest_jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            )
+            return [self._row(cursor, row) for row in cursor.fetchall()]  # type: ignore[misc]
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued job, even with several workers polling."""
+
+        return self._fetch_one(
+            "UPDATE ingest_jobs SET status = ?, updated_at = ? WHERE id = ("
+            " SELECT id FROM ingest_jobs WHERE status = ? ORDER BY created_at LIMIT 1"
+            ") RETURNING *",
+            (RUNNING, time.time(), QUEUED),
+        )
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        self._fetch_one(
+            "UPDATE ingest_jobs SET progress = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(progress), time.time(), job_id),
+        )
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        *,
+        summary: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        self._fetch_one(
+            "UPDATE ingest_jobs SET status = ?, summary = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, json.dumps(summary) if summary is not None else None, error, time.time(), job_id),
+        )
+
+    def requeue(self, job_id: str) -> None:
+        """Put a running job back, e.g. when its worker shuts down; it resumes from its checkpoint."""
+
+        self._fetch_one(
+            "UPDATE ingest_jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (QUEUED, time.time(), job_id, RUNNING),
+        )
+
+    def requeue_stale(self, older_than: float) -> int:
+        """Requeue running jobs not updated for ``older_than`` seconds, left by a crashed worker."""
+
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "UPDATE ingest_jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, time.time(), RUNNING, time.time() - older_than),
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job outright, or ask the worker running it to stop."""
+
+        now = time.time()
+        job = self._fetch_one(
+            "UPDATE ingest_jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ? RETURNING *",
+            (CANCELLED, now, job_id, QUEUED),
+        )
+        if job is not None:
+            return job
+        self._fetch_one(
+            "UPDATE ingest_jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = ?",
+            (now, job_id, RUNNING),
+        )
+        return self.get(job_id)
+
+    def heartbeat(self, job_ids: Iterable[str]) -> None:
+        ids = list(job_ids)
+        if not ids:
+            return
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"UPDATE ingest_jobs SET updated_at = ? WHERE status = ? AND id IN ({placeholders})",
+                (time.time(), RUNNING, *ids),
+            )
+            conn.commit()
+
+    def cancel_requested(self, job_ids: Iterable[str]) -> List[str]:
+        ids = list(job_ids)
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT id FROM ingest_jobs WHERE cancel_requested = 1 AND id IN ({placeholders})", ids
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+class RateSlots(_Store):
+    """Next free call slot per rate limit, shared between processes.
+
+    Each reservation is one atomic upsert, so processes that poll the same
+    file never hand out the same slot.
+    """
+
+    _SCHEMA = "CREATE TABLE IF NOT EXISTS rate_slots (name TEXT PRIMARY KEY, next_slot REAL NOT NULL)"
+
+    def reserve(self, name: str, interval: float) -> float:
+        """The wall-clock time at which the caller may make its call."""
+
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            (next_slot,) = conn.execute(
+                "INSERT INTO rate_slots (name, next_slot) VALUES (?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET next_slot = max(next_slot, ?) + ?"
+                " RETURNING next_slot",
+                (name, now + interval, now, interval),
+            ).fetchone()
+            conn.commit()
+        return next_slot - interval
+
+
+resolution_cache = ResolutionCache()
+ingest_checkpoints = IngestCheckpoints()
+ingest_jobs = IngestJobs()
+rate_slots = RateSlots()
+
+
+__all__ = [
+    "ACTIVE_STATUSES",
+    "CANCELLED",
+    "DONE",
+    "FAILED",
+    "INGEST_STATE_PATH",
+    "IngestCheckpoints",
+    "IngestJobs",
+    "MISSING",
+    "QUEUED",
+    "RUNNING",
+    "RateSlots",
+    "ResolutionCache",
+    "ingest_checkpoints",
+    "ingest_jobs",
+    "rate_slots",
+    "resolution_cache",
+]
@@ -0,0 +1,146 @@
+"""Worker process that runs queued playlist imports.
+
+Jobs are submitted through ``POST /ingest/jobs`` (or :func:`IngestJobs.submit`)
+and picked up here, so long imports never run inside the game server::
+
+    python -m app.ingest_worker --concurrency 2
+
+Every import shares the Deezer and Spotify rate limiters from ``add_songs``,
+which reserve their call slots in ``INGEST_STATE_PATH``. Raising
+``--concurrency`` overlaps the waiting, and several worker processes may
+poll the same file, without exceeding either quota. Each job is claimed by
+exactly one worker.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Any, Dict, Optional
+
+from .add_songs import IngestCancelled, IngestProgress, ingest_spotify_playlist
+from .artist_images import get_server_spotify_client
+from .ingest_state import CANCELLED, DONE, FAILED, IngestJobs, ingest_jobs
+
+INGEST_WORKER_CONCURRENCY = int(os.getenv("INGEST_WORKER_CONCURRENCY", "2"))
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "2.0"))
+# A running job whose row has not changed for this long belongs to a dead worker
+INGEST_STALE_AFTER = float(os.getenv("INGEST_STALE_AFTER", "600"))
+
+
+class IngestWorker:
+    """Claims jobs from the queue and runs up to ``concurrency`` of them at once."""
+
+    def __init__(
+        self,
+        jobs: IngestJobs = ingest_jobs,
+        *,
+        concurrency: int = INGEST_WORKER_CONCURRENCY,
+        poll_interval: float = INGEST_POLL_INTERVAL,
+        stale_after: float = INGEST_STALE_AFTER,
+    ) -> None:
+        self._jobs = jobs
+        self._concurrency = max(1, concurrency)
+        self._poll_interval = poll_interval
+        self._stale_after = stale_after
+        self._running: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        """Stop claiming and interrupt running jobs; they go back to the queue."""
+
+        self._stopping.set()
+        with self._lock:
+            for cancel in self._running.values():
+                cancel.set()
+
+    def run(self) -> None:
+        print(f"Ingest worker started with concurrency {self._concurrency}")
+        with ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix="ingest-job") as pool:
+            while not self._stopping.is_set():
+                requeued = self._jobs.requeue_stale(self._stale_after)
+                if requeued:
+                    print(f"Requeued {requeued} stale ingest job(s)")
+                self._relay_cancellations()
+                while self._has_slot() and not self._stopping.is_set():
+                    job = self._jobs.claim()
+                    if job is None:
+                        break
+                    cancel = threading.Event()
+                    with self._lock:
+                        self._running[job["id"]] = cancel
+                    pool.submit(self._run_job, job, cancel)
+                self._stopping.wait(self._poll_interval)
+        print("Ingest worker stopped")
+
+    def _has_slot(self) -> bool:
+        with self._lock:
+            return len(self._running) < self._concurrency
+
+    def _relay_cancellations(self) -> None:
+        with self._lock:
+            running = dict(self._running)
+        # Also keeps quiet jobs from looking stale to other workers
+        self._jobs.heartbeat(running)
+        for job_id in self._jobs.cancel_requested(running):
+            running[job_id].set()
+
+    def _run_job(self, job: Dict[str, Any], cancel: threading.Event) -> None:
+        job_id = job["id"]
+        print(f"Ingest job {job_id}: {job['spotify_playlist_id']} -> {job['target_playlist']!r}")
+
+        def on_progress(progress: IngestProgress) -> None:
+            self._jobs.update_progress(job_id, asdict(progress))
+
+        try:
+            summary = ingest_spotify_playlist(
+                job["spotify_playlist_id"],
+                job["target_playlist"],
+                on_progress=on_progress,
+                spotify=get_server_spotify_client(),
+                cancel=cancel,
+            )
+        except IngestCancelled:
+            if self._stopping.is_set() and not self._cancel_requested(job_id):
+                self._jobs.requeue(job_id)
+                print(f"Ingest job {job_id} interrupted by shutdown, requeued")
+            else:
+                self._jobs.finish(job_id, CANCELLED)
+                print(f"Ingest job {job_id} cancelled")
+        except Exception as exc:
+            traceback.print_exc()
+            self._jobs.finish(job_id, FAILED, error=f"{type(exc).__name__}: {exc}")
+        else:
+            self._jobs.finish(job_id, DONE, summary=summary)
+            print(f"Ingest job {job_id} done: {summary}")
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        return bool(self._jobs.cancel_requested([job_id]))
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run queued TempoTrivia playlist imports.")
+    parser.add_argument("--concurrency", type=int, default=INGEST_WORKER_CONCURRENCY)
+    parser.add_argument("--poll-interval", type=float, default=INGEST_POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    worker = IngestWorker(concurrency=args.concurrency, poll_interval=args.poll_interval)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: worker.stop())
+    worker.run()
+
+
+__all__ = ["IngestWorker", "main"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Front router that spreads rooms across single-process workers.
+
+Each worker is an ordinary ``app.main:app`` process with its own
+``RoomManager``. The front router reads the first ``join`` frame of every
+socket, hashes its room code and relays the connection to the worker that
+owns the room, so all players of a room meet in one process::
+
+    python -m app.launcher --workers 4 --port 8000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+import uvicorn
+import websockets
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+
+from .sharding import room_code_from_join, shard_for
+
+# Hop-by-hop headers that must not be copied onto a proxied response
+_HOP_HEADERS = frozenset({"connection", "keep-alive", "transfer-encoding", "content-length", "content-encoding"})
+
+
+def _worker_path(name: str, default: str, worker_id: str) -> str:
+    root, ext = os.path.splitext(os.getenv(name, default))
+    return f"{root}.{worker_id}{ext}"
+
+
+class WorkerPool:
+    """Starts and addresses the worker processes behind the front router."""
+
+    def __init__(
+        self,
+        count: int,
+        *,
+        host: str = "127.0.0.1",
+        base_port: int = 8100,
+        app_path: str = "app.main:app",
+    ) -> None:
+        self.host = host
+        self._app_path = app_path
+        self.worker_ids: List[str] = [f"worker-{index}" for index in range(count)]
+        self._ports: Dict[str, int] = {
+            worker_id: base_port + index for index, worker_id in enumerate(self.worker_ids)
+        }
+        self._processes: List[subprocess.Popen[bytes]] = []
+        self._round_robin = itertools.cycle(self.worker_ids)
+
+    def worker_env(self, worker_id: str) -> Dict[str, str]:
+        """Environment for one worker process.
+
+        Workers share the launcher's cwd, but each keeps local state that
+        must not be shared: every room in its snapshot file is restored, and
+        its catalog replica only reports the changes its own sync pulled.
+        So each worker gets files of its own.
+        """
+
+        return {
+            **os.environ,
+            "CLUSTER_BACKEND": "inprocess",
+            "CLUSTER_NODE_ID": worker_id,
+            "ROOM_SNAPSHOT_PATH": _worker_path("ROOM_SNAPSHOT_PATH", ".room-snapshots.sqlite3", worker_id),
+            "CATALOG_REPLICA_PATH": _worker_path("CATALOG_REPLICA_PATH", ".cache-catalog.sqlite3", worker_id),
+        }
+
+    def start(self) -> None:
+        for worker_id, port in self._ports.items():
+            env = self.worker_env(worker_id)
+            command = [
+                sys.executable, "-m", "uvicorn", self._app_path,
+                "--host", self.host, "--port", str(port), "--log-level", "warning",
+            ]
+            self._processes.append(subprocess.Popen(command, env=env))
+
+    async def wait_ready(self, timeout: float = 30.0) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        for port in self._ports.values():
+            while True:
+                try:
+                    _, writer = await asyncio.open_connection(self.host, port)
+                    writer.close()
+                    break
+                except OSError:
+                    if loop.time() > deadline:
+                        raise RuntimeError(f"Worker on port {port} did not start")
+                    await asyncio.sleep(0.2)
+
+    def stop(self) -> None:
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._processes.clear()
+
+    def worker_for(self, room_code: str) -> str:
+        if not room_code:
+            return self.worker_ids[0]
+        return shard_for(room_code, self.worker_ids)
+
+    def next_worker(self) -> str:
+        return next(self._round_robin)
+
+    def ws_url(self, worker_id: str) -> str:
+        return f"ws://{self.host}:{self._ports[worker_id]}/ws"
+
+    def http_url(self, worker_id: str, path: str) -> str:
+        return f"http://{self.host}:{self._ports[worker_id]}/{path}"
+
+
+def create_front_app(pool: WorkerPool, *, manage_workers: bool = True) -> FastAPI:
+    """ASGI app that relays sockets by room code and other requests round-robin."""
+
+    http: Optional[httpx.AsyncClient] = None
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        nonlocal http
+        if manage_workers:
+            pool.start()
+        try:
+            await pool.wait_ready()
+            http = httpx.AsyncClient(timeout=10.0)
+            yield
+        finally:
+            if http is not None:
+                await http.aclose()
+            if manage_workers:
+                pool.stop()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.websocket("/ws")
+    async def relay_socket(ws: WebSocket) -> None:
+        await ws.accept()
+        try:
+            first_frame = await ws.receive_text()
+        except WebSocketDisconnect:
+            return
+
+        worker_id = pool.worker_for(room_code_from_join(first_frame))
+        try:
+            upstream = await websockets.connect(pool.ws_url(worker_id), compression=None)
+        except OSError as exc:
+            print(f"Worker {worker_id} unreachable: {exc}")
+            await ws.close(code=1013)
+            return
+
+        async def client_to_worker() -> None:
+            await upstream.send(first_frame)
+            while True:
+                message = await ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                # Binary frames carry a negotiated codec; relay them untouched
+                data = message.get("bytes")
+                await upstream.send(data if data is not None else message["text"])
+
+        async def worker_to_client() -> None:
+            async for message in upstream:
+                if isinstance(message, bytes):
+                    await ws.send_bytes(message)
+                else:
+                    await ws.send_text(message)
+
+        tasks = [asyncio.create_task(client_to_worker()), asyncio.create_task(worker_to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await upstream.close()
+            # Pass the worker's close code through, e.g. 1008 for a rejected join
+            code = upstream.close_code or 1000
+            try:
+                await ws.close(code=code)
+            except RuntimeError:
+                pass
+
+    @app.api_route("/rooms/{room_code}/{rest:path}", methods=["GET"])
+    async def relay_room_request(room_code: str, rest: str, request: Request) -> Response:
+        worker_id = pool.worker_for(room_code)
+        return await _relay(worker_id, f"rooms/{room_code}/{rest}", request)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    async def relay_request(path: str, request: Request) -> Response:
+        return await _relay(pool.next_worker(), path, request)
+
+    async def _relay(worker_id: str, path: str, request: Request) -> Response:
+        upstream = await http.request(
+            request.method,
+            pool.http_url(worker_id, path),
+            params=request.query_params,
+            headers={k: v for k, v in request.headers.items() if k.lower() != "host"},
+            content=await request.body(),
+        )
+        headers = {k: v for k, v in upstream.headers.items() if k.lower() not in _HOP_HEADERS}
+        return Response(upstream.content, status_code=upstream.status_code, headers=headers)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run TempoTrivia across several worker processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker-base-port", type=int, default=8100)
+    parser.add_argument("--app", default="app.main:app", help="ASGI app each worker serves")
+    parser.add_argument(
+        "--no-ws-deflate",
+        action="store_true",
+        help="Turn off permessage-deflate for client sockets (relays to workers never compress)",
+    )
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.workers, base_port=args.worker_base_port, app_path=args.app)
+    uvicorn.run(
+        create_front_app(pool),
+        host=args.host,
+        port=args.port,
+        log_level="info",
+        ws_per_message_deflate=not args.no_ws_deflate,
+    )
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = ["WorkerPool", "create_front_app"]
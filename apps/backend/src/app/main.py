@@ -1,10 +1,47 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Union
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import Database
-from .routers.game_ws import router as game_ws_router
+from .catalog import playlist_catalog
+from .catalog_replica import CatalogChanges, catalog_replica
+from .database import async_database
+from .routers.game_ws import router as game_ws_router, start_game_server, stop_game_server
+from .routers.ingest_jobs import router as ingest_jobs_router
+from .services.preview_resolver import preview_resolver
+from .services.scheduler import round_scheduler
+from .services.song_pool import song_pool_cache
+
+
+def _on_catalog_change(changes: CatalogChanges) -> None:
+    """Drop in-memory catalog caches the replica sync just made stale."""
+
+    if changes.full or changes.playlists:
+        playlist_catalog.invalidate()
+    if changes.full:
+        song_pool_cache.invalidate()
+    for playlist_id in changes.playlist_ids:
+        song_pool_cache.invalidate(playlist_id)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Own the pooled clients shared by every request and socket."""
 
-app = FastAPI()
+    await catalog_replica.start(on_change=_on_catalog_change)
+    await start_game_server()
+    try:
+        yield
+    finally:
+        await stop_game_server()
+        await catalog_replica.close()
+        await async_database.aclose()
+        await preview_resolver.aclose()
+        await round_scheduler.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,19 +52,27 @@ app.add_middleware(
 )
 
 
-@app.get("/playlists")
-async def list_playlists() -> dict:
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+@app.get("/playlists", response_model=None)
+async def list_playlists(request: Request, response: Response) -> Union[Dict[str, Any], Response]:
     """Return the available playlists/game modes."""
 
     try:
-        data = Database.get_all_playlists() or []
+        snapshot = await playlist_catalog.snapshot()
     except Exception as exc:  # pragma: no cover - defensive guard for Supabase failures
         raise HTTPException(status_code=500, detail="Failed to load playlists") from exc
 
+    cache_headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match", ""), snapshot.etag):
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+
     playlists = []
-    for raw in data:
-        if not isinstance(raw, dict):
-            continue
+    for raw in snapshot.playlists:
         playlists.append(
             {
                 "id": raw.get("id"),
@@ -41,3 +86,4 @@ async def list_playlists() -> dict:
 
 
 app.include_router(game_ws_router)
+app.include_router(ingest_jobs_router)
@@ -3,23 +3,49 @@
 from __future__ import annotations
 
 import json
+import os
+import time
 import uuid
 from typing import Any, Dict, List, Tuple
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 
-from ..database import Database
+from ..catalog import playlist_catalog
+from ..sharding import room_code_from_join
 from ..services import GameService, RoomManager
-from ..services.message_handlers import HANDLERS, MessageContext
+from ..services.cluster import cluster_backend
+from ..services.framing import Codec, negotiate
+from ..services.message_handlers import HANDLERS, MessageContext, handle_resume
 
 router = APIRouter()
 
-_room_manager = RoomManager()
+_room_manager = RoomManager(backend=cluster_backend)
 _game_service = GameService(_room_manager)
 
+# Snapshots older than this are from games nobody is coming back to
+ROOM_SNAPSHOT_MAX_AGE = float(os.getenv("ROOM_SNAPSHOT_MAX_AGE", "3600"))
+# Close code uvicorn sends to every socket when the server shuts down
+_SERVICE_RESTART = 1012
 
-def _get_mode_options() -> Tuple[List[str], List[str]]:
-    options = Database.get_all_playlists()
+
+async def start_game_server() -> None:
+    """Join the cluster so tunnelled sockets from other nodes reach this one."""
+
+    cluster_backend.set_session_handler(_run_session)
+    await cluster_backend.start()
+    restored = await _room_manager.restore_rooms(ROOM_SNAPSHOT_MAX_AGE)
+    _game_service.resume_rooms(restored)
+    if restored:
+        print(f"Restored {len(restored)} rooms from snapshot")
+
+
+async def stop_game_server() -> None:
+    await _room_manager.close()
+    await cluster_backend.close()
+
+
+async def _get_mode_options() -> Tuple[List[str], List[str]]:
+    options = await playlist_catalog.get_all_playlists()
     names = [item.get("name", "") for item in options]
     descriptions = [item.get("description", "") for item in options]
     return names, descriptions
@@ -34,55 +60,173 @@ async def _handle_join(ws: WebSocket, payload: Dict[str, Any]) -> Tuple[str, str
         await ws.close(code=1008)
         raise ValueError("Invalid join payload")
 
-    _room_manager.ensure_room(room_code)
-    player_id = uuid.uuid4().hex[:8]
-    _room_manager.add_player(room_code, player_id, nickname, ws)
-
-    names, descriptions = _get_mode_options()
-    await ws.send_json(
+    room = await _room_manager.load_room(room_code)
+    codec = _negotiate(ws, payload)
+    # A known player with its session token rejoins with its score, e.g. after a restart
+    requested_id = str(payload.get("playerId") or "")
+    player = _room_manager.authenticate(room_code, requested_id, str(payload.get("sessionToken") or ""))
+    rejoined = player is not None
+    if player is not None:
+        player_id = player.id
+        nickname = player.name
+        _reattach(room_code, player_id, ws, codec)
+    else:
+        player_id = uuid.uuid4().hex[:8]
+        player = _room_manager.add_player(room_code, player_id, nickname, ws, codec)
+
+    names, descriptions = await _get_mode_options()
+    await _room_manager.send_to_socket(
+        ws,
         {
             "type": "game_modes",
             "payload": {"name": names, "description": descriptions},
-        }
+        },
     )
 
-    room = _room_manager.get_room(room_code)
-    await ws.send_json(
+    await _room_manager.send_to_socket(
+        ws,
         {
             "type": "joined",
             "payload": {
                 "playerId": player_id,
-                "hostId": room.host_id if room else None,
+                "hostId": room.host_id,
                 "roomCode": room_code,
                 "nickname": nickname,
+                "sessionToken": player.token,
+                "seq": room.seq,
+                "codec": codec.name,
             },
-        }
+        },
     )
 
-    await _room_manager.broadcast(room_code, _room_manager.build_room_state_payload(room_code))
+    # The joining client gets the full snapshot; everyone else only the delta
+    await _room_manager.send_to_socket(ws, _room_manager.build_room_state_payload(room_code))
+    if rejoined:
+        await _game_service.send_game_state(room_code, player_id)
+    else:
+        await _room_manager.announce_join(room_code, player_id)
 
     return room_code, player_id
 
 
+async def _handle_resume(ws: WebSocket, payload: Dict[str, Any]) -> Tuple[str, str]:
+    room_code = str(payload.get("roomCode", "")).upper()
+    player_id = str(payload.get("playerId") or "")
+
+    if len(room_code) == 6 and room_code.isalnum():
+        await _room_manager.load_room(room_code)
+    player = _room_manager.authenticate(room_code, player_id, str(payload.get("sessionToken") or ""))
+    if player is None:
+        _room_manager.remove_room_if_empty(room_code)
+        await ws.send_json({"type": "error", "payload": {"code": "RESUME_FAILED"}})
+        await ws.close(code=1008)
+        raise ValueError("Invalid resume payload")
+
+    _reattach(room_code, player_id, ws, _negotiate(ws, payload))
+    await handle_resume(_context(ws, room_code, player_id, time.time()), payload)
+    return room_code, player_id
+
+
+def _reattach(room_code: str, player_id: str, ws: WebSocket, codec: Codec) -> None:
+    _room_manager.reattach_player(room_code, player_id, ws, codec)
+    _game_service.cancel_departure(room_code, player_id)
+
+
+def _negotiate(ws: WebSocket, payload: Dict[str, Any]) -> Codec:
+    # Tunnels between nodes carry JSON text, so proxied sockets stay on JSON
+    return negotiate(payload.get("codec"), binary_ok=not hasattr(ws, "send_frame"))
+
+
+async def _receive(ws: WebSocket, codec: Codec) -> Any:
+    """Next inbound message: binary frames use the socket's codec, text frames are JSON."""
+
+    if not codec.binary:
+        return json.loads(await ws.receive_text())
+    message = await ws.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return codec.decode(message["bytes"])
+    return json.loads(message["text"])
+
+
+def _context(ws: WebSocket, room_code: str, player_id: str, received_at: float) -> MessageContext:
+    return MessageContext(
+        ws=ws,
+        player_id=player_id,
+        room_code=room_code,
+        room_manager=_room_manager,
+        game_service=_game_service,
+        received_at=received_at,
+    )
+
+
+@router.get("/stats")
+async def server_stats() -> Dict[str, Any]:
+    """Process-level gauges for the game server."""
+
+    return {
+        "node": cluster_backend.node_id,
+        "rooms": _room_manager.room_count,
+        "pendingDeadlines": _game_service.pending_deadlines,
+        "tunnels": cluster_backend.tunnels,
+    }
+
+
+@router.get("/rooms/{room_code}/outbound")
+async def room_outbound_stats(room_code: str) -> Dict[str, Any]:
+    """Expose per-player outbound queue depth and the room's total traffic."""
+
+    room_code = room_code.upper()
+    if not _room_manager.get_room(room_code):
+        raise HTTPException(status_code=404, detail="Room not found")
+    return {
+        "roomCode": room_code,
+        "players": _room_manager.queue_depths(room_code),
+        "traffic": _room_manager.traffic(room_code),
+    }
+
+
 @router.websocket("/ws")
 async def ws_endpoint(ws: WebSocket) -> None:
     await ws.accept()
 
+    try:
+        raw = await ws.receive_text()
+    except WebSocketDisconnect:
+        return
+
+    # Rooms live on the node that owns their code; relay everything else there
+    room_code = room_code_from_join(raw)
+    if room_code and not cluster_backend.owns(room_code):
+        await cluster_backend.tunnel(ws, raw, cluster_backend.owner_of(room_code))
+        return
+
+    await _run_session(ws, raw)
+
+
+async def _run_session(ws: WebSocket, raw: str) -> None:
+    """Drive one player's session from its join frame, for local and tunnelled sockets alike."""
+
     player_id: str | None = None
     room_code: str | None = None
+    server_restarting = False
 
     try:
-        raw = await ws.receive_text()
         message = json.loads(raw)
-        if not isinstance(message, dict) or message.get("type") != "join":
+        first_type = message.get("type") if isinstance(message, dict) else None
+        if first_type == "join":
+            room_code, player_id = await _handle_join(ws, message.get("payload") or {})
+        elif first_type == "resume":
+            room_code, player_id = await _handle_resume(ws, message.get("payload") or {})
+        else:
             await ws.close(code=1003)
             return
 
-        room_code, player_id = await _handle_join(ws, message.get("payload") or {})
-
+        codec = _room_manager.codec_for(ws)
         while True:
-            raw = await ws.receive_text()
-            msg = json.loads(raw)
+            msg = await _receive(ws, codec)
+            received_at = time.time()
             msg_type = msg.get("type")
             payload = msg.get("payload", {})
 
@@ -91,22 +235,18 @@ async def ws_endpoint(ws: WebSocket) -> None:
                 print(f"Unhandled message type: {msg_type}")
                 continue
 
-            context = MessageContext(
-                ws=ws,
-                player_id=player_id,
-                room_code=room_code,
-                room_manager=_room_manager,
-                game_service=_game_service,
-            )
-            await handler(context, payload)
+            await handler(_context(ws, room_code, player_id, received_at), payload)
     except ValueError:
-        # _handle_join already notified the client
+        # _handle_join or _handle_resume already notified the client
         return
-    except WebSocketDisconnect:
-        pass
+    except WebSocketDisconnect as exc:
+        server_restarting = exc.code == _SERVICE_RESTART
     finally:
-        meta = _room_manager.remove_connection(ws)
-        if meta:
-            rc = meta["roomCode"]
-            if _room_manager.get_room(rc):
-                await _room_manager.broadcast(rc, _room_manager.build_room_state_payload(rc))
+        # The socket may already have been evicted by its writer, so rely on
+        # the ids captured at join rather than the socket index
+        _room_manager.detach_connection(ws)
+        # On a restart the snapshot keeps the seat; otherwise hold it for the
+        # grace period unless a newer socket already took over
+        if room_code and player_id and not server_restarting:
+            if _room_manager.get_socket_for_player(room_code, player_id) is None:
+                _game_service.schedule_departure(room_code, player_id)
@@ -0,0 +1,80 @@
+"""REST endpoints to queue playlist imports for ``app.ingest_worker``.
+
+The router only touches the job table; the import itself runs in the worker
+process, never in the game server's event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Body, Header, HTTPException
+
+from ..ingest_state import ingest_jobs
+
+router = APIRouter(prefix="/ingest/jobs")
+
+# Every request must carry ``Authorization: Bearer <token>``; unset disables the API
+INGEST_API_TOKEN = os.getenv("INGEST_API_TOKEN", "")
+DEFAULT_PLAYLIST_NAME = os.getenv("DEFAULT_INGEST_PLAYLIST", "Normal Mode")
+
+
+def _authorize(authorization: Optional[str]) -> None:
+    if not INGEST_API_TOKEN:
+        # Imports write to Supabase, so never serve them from an open game server
+        raise HTTPException(status_code=503, detail="Ingest API is disabled")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), INGEST_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid ingest token")
+
+
+async def _job_or_404(job_id: str) -> Dict[str, Any]:
+    job = await asyncio.to_thread(ingest_jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("", status_code=202)
+async def submit_ingest_job(
+    payload: Dict[str, Any] = Body(...),
+    authorization: Optional[str] = Header(None),
+) -> Dict[str, Any]:
+    """Queue an import of a Spotify playlist into a TempoTrivia playlist."""
+
+    _authorize(authorization)
+    spotify_playlist_id = str(payload.get("spotify_playlist_id") or "").strip()
+    target_playlist = str(payload.get("target_playlist") or DEFAULT_PLAYLIST_NAME).strip()
+    if not spotify_playlist_id or not target_playlist:
+        raise HTTPException(status_code=422, detail="spotify_playlist_id is required")
+    return await asyncio.to_thread(ingest_jobs.submit, spotify_playlist_id, target_playlist)
+
+
+@router.get("")
+async def list_ingest_jobs(limit: int = 50, authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    _authorize(authorization)
+    jobs = await asyncio.to_thread(ingest_jobs.list, max(1, min(limit, 500)))
+    return {"jobs": jobs}
+
+
+@router.get("/{job_id}")
+async def get_ingest_job(job_id: str, authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    _authorize(authorization)
+    return await _job_or_404(job_id)
+
+
+@router.delete("/{job_id}")
+async def cancel_ingest_job(job_id: str, authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """Cancel a queued job, or ask the worker to stop a running one at its next track."""
+
+    _authorize(authorization)
+    job = await asyncio.to_thread(ingest_jobs.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+__all__ = ["router"]
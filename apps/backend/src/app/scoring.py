@@ -0,0 +1,219 @@
+"""Pure answer-matching rules for TempoTrivia rounds."""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+ACCEPT_THRESHOLD = 0.80
+
+_PARENTHESISED = re.compile(r"\([^)]*\)")
+_BRACKETED = re.compile(r"\[[^\]]*\]")
+_REMASTER_SUFFIX = re.compile(r"\s*-\s*remaster(ed)?.*", re.IGNORECASE)
+_YEAR_SUFFIX = re.compile(r"\s*-\s*\d{4}.*")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_FEATURING = re.compile(r"\s*[-(\[]?\s*\b(feat|ft|featuring)\b\.?\s.*$", re.IGNORECASE)
+_DASH_SUFFIX = re.compile(r"\s+[-\u2013\u2014]\s+.*$")
+_LEADING_THE = re.compile(r"^the\s+")
+_MIN_ALIAS_LENGTH = 2
+
+
+@lru_cache(maxsize=8192)
+def normalize(text: str) -> str:
+    text = text.lower()
+    text = _PARENTHESISED.sub("", text)
+    text = _BRACKETED.sub("", text)
+    text = _REMASTER_SUFFIX.sub("", text)
+    text = _YEAR_SUFFIX.sub("", text)
+    text = _PUNCTUATION.sub("", text)
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=8192)
+def fold(text: str) -> str:
+    """Strip accents so "beyoncé" and "beyonce" compare equal."""
+
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _add_alias(aliases: List[str], raw: str) -> None:
+    alias = normalize(raw)
+    if len(alias) >= _MIN_ALIAS_LENGTH and alias not in aliases:
+        aliases.append(alias)
+    stripped = _LEADING_THE.sub("", alias)
+    if len(stripped) >= _MIN_ALIAS_LENGTH and stripped not in aliases:
+        aliases.append(stripped)
+
+
+def title_aliases(titles: Sequence[str]) -> List[str]:
+    """Normalized accepted forms of a title, canonical form first."""
+
+    aliases: List[str] = []
+    for title in titles:
+        if not title:
+            continue
+        _add_alias(aliases, title)
+        _add_alias(aliases, _FEATURING.sub("", title))
+        _add_alias(aliases, _DASH_SUFFIX.sub("", title))
+        _add_alias(aliases, title.replace("&", " and "))
+    return aliases
+
+
+def artist_aliases(artists: Sequence[str]) -> List[str]:
+    """Normalized accepted forms of the credited artists, canonical form first."""
+
+    named = [artist for artist in artists if artist]
+    aliases: List[str] = []
+    for artist in named:
+        _add_alias(aliases, artist)
+        _add_alias(aliases, artist.replace("&", " and "))
+    distinct = list(dict.fromkeys(named))
+    if len(distinct) > 1:
+        _add_alias(aliases, " & ".join(distinct))
+        _add_alias(aliases, " and ".join(distinct))
+    return aliases
+
+
+def build_aliases(
+    title: str,
+    artists: Sequence[str],
+    *,
+    extra_titles: Sequence[str] = (),
+) -> Dict[str, List[str]]:
+    """Alias sets stored with a song at ingest time."""
+
+    return {
+        "title": title_aliases([title, *extra_titles]),
+        "artist": artist_aliases(artists),
+    }
+
+
+class _Target:
+    """A normalized answer with its ``SequenceMatcher`` side precomputed."""
+
+    __slots__ = ("text", "_matcher")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        # difflib caches its analysis of seq2, so build it once per answer
+        self._matcher = SequenceMatcher(None)
+        self._matcher.set_seq2(text)
+
+    def accepts(self, guess: str) -> bool:
+        if guess == self.text:
+            return True
+        matcher = self._matcher
+        matcher.set_seq1(guess)
+        # The cheap ratios are upper bounds on ratio(), so this only skips
+        # the full comparison when it could not reach the threshold anyway
+        return (
+            matcher.real_quick_ratio() >= ACCEPT_THRESHOLD
+            and matcher.quick_ratio() >= ACCEPT_THRESHOLD
+            and matcher.ratio() >= ACCEPT_THRESHOLD
+        )
+
+
+class _AliasIndex:
+    """Accepted forms of one answer field.
+
+    Exact hits, including accent-folded ones, are a set lookup. Otherwise
+    only aliases whose length lets ``ratio()`` reach the threshold get the
+    fuzzy comparison: with lengths ``g`` and ``a`` it is at most
+    ``2 * min(g, a) / (g + a)``, so ``a`` must lie in ``[2g/3, 3g/2]``.
+    """
+
+    __slots__ = ("_exact", "_targets", "_lengths")
+
+    def __init__(self, aliases: Iterable[str]) -> None:
+        unique = list(dict.fromkeys(alias for alias in aliases if alias))
+        self._exact = frozenset(unique) | frozenset(fold(alias) for alias in unique)
+        # Sorted by length so a guess finds its candidates with two bisects
+        self._targets = tuple(_Target(alias) for alias in sorted(unique, key=len)) or (_Target(""),)
+        self._lengths = [len(target.text) for target in self._targets]
+
+    def accepts(self, guess: str) -> bool:
+        if guess in self._exact or fold(guess) in self._exact:
+            return True
+        size = len(guess)
+        start = bisect_left(self._lengths, (2 * size + 2) // 3)
+        stop = bisect_right(self._lengths, 3 * size // 2)
+        targets = self._targets
+        return any(targets[index].accepts(guess) for index in range(start, stop))
+
+
+class SongMatcher:
+    """Checks guesses against one song, built once when the round starts."""
+
+    __slots__ = ("artist", "title")
+
+    def __init__(
+        self,
+        artist: str,
+        title: str,
+        aliases: Optional[Mapping[str, Sequence[str]]] = None,
+    ) -> None:
+        aliases = aliases or {}
+        # The canonical form always comes first so matching never accepts
+        # less than a plain title/artist comparison would
+        self.artist = _AliasIndex([normalize(artist), *(aliases.get("artist") or artist_aliases([artist]))])
+        self.title = _AliasIndex([normalize(title), *(aliases.get("title") or title_aliases([title]))])
+
+    def check(self, artist_guess: str, title_guess: str) -> Dict[str, bool]:
+        artist_correct = self.artist.accepts(normalize(artist_guess))
+        title_correct = self.title.accepts(normalize(title_guess))
+        return {
+            "artist_correct": artist_correct,
+            "title_correct": title_correct,
+            "both_correct": artist_correct and title_correct,
+        }
+
+    def check_many(self, guesses: Iterable[Tuple[str, str]]) -> List[Dict[str, bool]]:
+        """Check a batch of ``(artist, title)`` guesses, comparing each distinct one once."""
+
+        seen: Dict[Tuple[str, str], Dict[str, bool]] = {}
+        results: List[Dict[str, bool]] = []
+        for artist_guess, title_guess in guesses:
+            key = (normalize(artist_guess), normalize(title_guess))
+            result = seen.get(key)
+            if result is None:
+                artist_correct = self.artist.accepts(key[0])
+                title_correct = self.title.accepts(key[1])
+                result = seen[key] = {
+                    "artist_correct": artist_correct,
+                    "title_correct": title_correct,
+                    "both_correct": artist_correct and title_correct,
+                }
+            results.append(dict(result))
+        return results
+
+
+def calculate_score(result: Dict[str, bool], elapsed: float) -> int:
+    if result.get("both_correct"):
+        base_score = 1000
+        min_score = 100
+    elif result.get("title_correct") or result.get("artist_correct"):
+        base_score = 500
+        min_score = 50
+    else:
+        return 0
+
+    speed_penalty = elapsed * 10
+    score = max(base_score - speed_penalty, min_score)
+    return int(round(score, 0))
+
+
+__all__ = [
+    "ACCEPT_THRESHOLD",
+    "SongMatcher",
+    "artist_aliases",
+    "build_aliases",
+    "calculate_score",
+    "fold",
+    "normalize",
+    "title_aliases",
+]
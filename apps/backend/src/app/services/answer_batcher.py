@@ -0,0 +1,66 @@
+"""Groups answer submissions that arrive close together so they are scored at once."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List
+
+
+@dataclass(slots=True)
+class PendingAnswer:
+    """A submission waiting for its batch, stamped when the server received it."""
+
+    player_id: str
+    artist: str
+    title: str
+    received_at: float
+    round_number: int
+
+
+BatchFlush = Callable[[str, List[PendingAnswer]], Awaitable[None]]
+
+
+class AnswerBatcher:
+    """Collects submissions per room for ``window`` seconds, then flushes them together.
+
+    The window opens with the first submission in a room, so a lone answer
+    waits at most ``window`` seconds and a burst costs one flush.
+    """
+
+    def __init__(self, window: float, flush: BatchFlush) -> None:
+        self._window = window
+        self._flush = flush
+        self._pending: Dict[str, List[PendingAnswer]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._flushing: set[asyncio.Task[None]] = set()
+
+    def submit(self, room_code: str, answer: PendingAnswer) -> None:
+        self._pending.setdefault(room_code, []).append(answer)
+        if room_code not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[room_code] = loop.call_later(self._window, self._fire, room_code)
+
+    def discard(self, room_code: str) -> None:
+        timer = self._timers.pop(room_code, None)
+        if timer:
+            timer.cancel()
+        self._pending.pop(room_code, None)
+
+    def _fire(self, room_code: str) -> None:
+        self._timers.pop(room_code, None)
+        batch = self._pending.pop(room_code, None)
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(room_code, batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _run(self, room_code: str, batch: List[PendingAnswer]) -> None:
+        try:
+            await self._flush(room_code, batch)
+        except Exception as exc:  # pragma: no cover - best effort logging
+            print(f"Answer batch for {room_code} failed: {exc}")
+
+
+__all__ = ["AnswerBatcher", "PendingAnswer"]
@@ -0,0 +1,443 @@
+"""Room ownership, cross-node delivery and shared room state for multi-node deployments.
+
+Every room is owned by exactly one node, picked by hashing its code. The
+owner runs the room's game logic, timers and scoring. A client that connects
+to any other node is tunnelled: that node keeps the real socket and relays
+frames to the owner, which drives the session through a :class:`RemoteSocket`
+exactly as it would a local one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from ..sharding import shard_for
+from .outbound import ConnectionWriter, OutboundFrame
+
+Envelope = Dict[str, Any]
+# Runs one socket's session, starting from its first (join) frame
+SessionHandler = Callable[[WebSocket, str], Awaitable[None]]
+
+
+class RemoteSocket:
+    """Owner-side stand-in for a WebSocket accepted by another node.
+
+    Inbound frames are fed in by the backend; outbound frames are handed back
+    to it whole so the edge node can queue them under its own policy.
+    """
+
+    def __init__(self, backend: "ClusterBackend", node_id: str, conn_id: str) -> None:
+        self._backend = backend
+        self.node_id = node_id
+        self.conn_id = conn_id
+        self.closed = False
+        self._inbox: asyncio.Queue[Optional[str]] = asyncio.Queue()
+
+    async def accept(self) -> None:
+        return None
+
+    async def receive_text(self) -> str:
+        text = await self._inbox.get()
+        if text is None:
+            raise WebSocketDisconnect(code=1000)
+        return text
+
+    def send_frame(self, frame: OutboundFrame) -> None:
+        if self.closed:
+            raise RuntimeError("Remote socket is closed")
+        self._backend.deliver(self.node_id, self.conn_id, frame)
+
+    async def send_text(self, data: str) -> None:
+        self.send_frame(OutboundFrame(text=data))
+
+    async def send_json(self, data: Any) -> None:
+        self.send_frame(OutboundFrame(data))
+
+    async def close(self, code: int = 1000) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._backend.close_remote(self, code)
+        self.feed_close()
+
+    def feed(self, text: str) -> None:
+        self._inbox.put_nowait(text)
+
+    def feed_close(self) -> None:
+        self._inbox.put_nowait(None)
+
+
+class ClusterBackend(ABC):
+    """Transport and shared store behind :class:`RoomManager` when rooms span nodes.
+
+    Subclasses provide point-to-point delivery between nodes and a key-value
+    store for room state; routing, tunnelling and batching live here.
+    """
+
+    def __init__(self, node_id: str, nodes: Optional[Sequence[str]] = None) -> None:
+        self.node_id = node_id
+        self.nodes: List[str] = list(nodes or [node_id])
+        if node_id not in self.nodes:
+            raise ValueError(f"Node {node_id!r} is not in the cluster node list {self.nodes}")
+        self._session_handler: Optional[SessionHandler] = None
+        self._remote: Dict[str, RemoteSocket] = {}
+        self._edge: Dict[str, Tuple[WebSocket, ConnectionWriter]] = {}
+        self._outbox: Dict[str, List[Envelope]] = {}
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._tasks: set[asyncio.Task[Any]] = set()
+        self._queue_size = int(os.getenv("OUTBOUND_QUEUE_SIZE", "64"))
+        self._queue_policy = os.getenv("OUTBOUND_QUEUE_POLICY", "coalesce")
+        self._send_timeout = 2.0
+
+    # ------------------------------------------------------------------
+    # Ownership
+    # ------------------------------------------------------------------
+    def owner_of(self, room_code: str) -> str:
+        return shard_for(room_code, self.nodes)
+
+    def owns(self, room_code: str) -> bool:
+        return self.owner_of(room_code) == self.node_id
+
+    def set_session_handler(self, handler: SessionHandler) -> None:
+        self._session_handler = handler
+
+    @property
+    def tunnels(self) -> Dict[str, int]:
+        return {"edge": len(self._edge), "remote": len(self._remote)}
+
+    # ------------------------------------------------------------------
+    # Transport and store, provided by subclasses
+    # ------------------------------------------------------------------
+    async def start(self) -> None:
+        return None
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    @abstractmethod
+    async def send(self, node_id: str, envelope: Envelope) -> None:
+        """Deliver ``envelope`` to ``node_id``, whose backend passes it to :meth:`_handle`."""
+
+    @abstractmethod
+    async def save_room(self, room_code: str, state: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def load_room(self, room_code: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def delete_room(self, room_code: str) -> None: ...
+
+    # ------------------------------------------------------------------
+    # Edge side: this node holds the socket, another node owns the room
+    # ------------------------------------------------------------------
+    async def tunnel(self, ws: WebSocket, first_frame: str, owner: str) -> None:
+        """Relay ``ws`` to ``owner`` until either side disconnects."""
+
+        conn_id = uuid.uuid4().hex
+        writer = ConnectionWriter(
+            ws,
+            lambda _ws: self._drop_edge(conn_id, 1011),
+            max_size=self._queue_size,
+            policy=self._queue_policy,
+            send_timeout=self._send_timeout,
+        )
+        self._edge[conn_id] = (ws, writer)
+        writer.start()
+        try:
+            await self.send(owner, {"kind": "open", "conn": conn_id, "origin": self.node_id, "text": first_frame})
+            while True:
+                text = await ws.receive_text()
+                await self.send(owner, {"kind": "frame", "conn": conn_id, "text": text})
+        except (WebSocketDisconnect, RuntimeError):
+            # RuntimeError: the socket was closed locally after a failed write
+            pass
+        finally:
+            entry = self._edge.pop(conn_id, None)
+            if entry is not None:
+                entry[1].close()
+            # The owner ignores closes for connections it already dropped
+            try:
+                await self.send(owner, {"kind": "close", "conn": conn_id})
+            except Exception as exc:  # pragma: no cover - best effort logging
+                print(f"Failed to notify {owner} of closed tunnel {conn_id}: {exc}")
+
+    def _deliver_to_edge(self, items: List[Envelope]) -> None:
+        for item in items:
+            if "close" in item:
+                self._drop_edge(item["conn"], item["close"])
+                continue
+            frame = OutboundFrame(msg_type=item.get("type", ""), text=item["text"])
+            for conn_id in item["conns"]:
+                entry = self._edge.get(conn_id)
+                if entry is not None:
+                    entry[1].enqueue(frame)
+
+    def _drop_edge(self, conn_id: str, code: int) -> None:
+        entry = self._edge.pop(conn_id, None)
+        if entry is not None:
+            self._spawn(self._close_edge(*entry, code))
+
+    async def _close_edge(self, ws: WebSocket, writer: ConnectionWriter, code: int) -> None:
+        # Flush what the owner sent before closing, e.g. an error frame
+        try:
+            await asyncio.wait_for(writer.drain(), self._send_timeout)
+        except asyncio.TimeoutError:
+            pass
+        writer.close()
+        try:
+            await asyncio.wait_for(ws.close(code=code), self._send_timeout)
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # Owner side: the room lives here, the socket on another node
+    # ------------------------------------------------------------------
+    def deliver(self, node_id: str, conn_id: str, frame: OutboundFrame) -> None:
+        """Queue a frame for a tunnelled socket; frames are batched per node each loop tick."""
+
+        batch = self._outbox.setdefault(node_id, [])
+        last = batch[-1] if batch else None
+        # A broadcast arrives as the same frame for each socket in turn, so it
+        # crosses the wire once per node rather than once per player
+        if last is not None and last.get("text") == frame.data and conn_id not in last["conns"]:
+            last["conns"].append(conn_id)
+        else:
+            batch.append({"text": frame.data, "type": frame.msg_type, "conns": [conn_id]})
+        self._schedule_flush()
+
+    def close_remote(self, remote: RemoteSocket, code: int) -> None:
+        self._remote.pop(remote.conn_id, None)
+        self._outbox.setdefault(remote.node_id, []).append({"close": code, "conn": remote.conn_id})
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_soon(self._flush_outbox)
+
+    def _flush_outbox(self) -> None:
+        self._flush_handle = None
+        outbox, self._outbox = self._outbox, {}
+        for node_id, items in outbox.items():
+            self._spawn(self._send_quietly(node_id, {"kind": "deliver", "items": items}))
+
+    async def _send_quietly(self, node_id: str, envelope: Envelope) -> None:
+        try:
+            await self.send(node_id, envelope)
+        except Exception as exc:  # pragma: no cover - best effort logging
+            print(f"Cluster delivery to {node_id} failed: {exc}")
+
+    def _open_remote(self, envelope: Envelope) -> None:
+        if self._session_handler is None:
+            print("Dropping tunnelled connection: no session handler registered")
+            return
+        remote = RemoteSocket(self, envelope["origin"], envelope["conn"])
+        self._remote[remote.conn_id] = remote
+        self._spawn(self._run_remote(remote, envelope["text"]))
+
+    async def _run_remote(self, remote: RemoteSocket, first_frame: str) -> None:
+        try:
+            await self._session_handler(remote, first_frame)
+        finally:
+            self._remote.pop(remote.conn_id, None)
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+    def _handle(self, envelope: Envelope) -> None:
+        kind = envelope.get("kind")
+        if kind == "open":
+            self._open_remote(envelope)
+        elif kind == "frame":
+            remote = self._remote.get(envelope["conn"])
+            if remote is not None:
+                remote.feed(envelope["text"])
+        elif kind == "close":
+            remote = self._remote.pop(envelope["conn"], None)
+            if remote is not None:
+                remote.feed_close()
+        elif kind == "deliver":
+            self._deliver_to_edge(envelope["items"])
+        else:
+            print(f"Unknown cluster envelope: {kind}")
+
+    def _spawn(self, coro: Awaitable[Any]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class InProcessBackend(ClusterBackend):
+    """Single-node backend: every room is local and state lives in this process."""
+
+    def __init__(self, node_id: str = "local") -> None:
+        super().__init__(node_id)
+        self._store: Dict[str, str] = {}
+
+    async def send(self, node_id: str, envelope: Envelope) -> None:
+        self._handle(envelope)
+
+    async def save_room(self, room_code: str, state: Dict[str, Any]) -> None:
+        # Stored encoded so callers never share mutable state with the store
+        self._store[room_code] = json.dumps(state)
+
+    async def load_room(self, room_code: str) -> Optional[Dict[str, Any]]:
+        raw = self._store.get(room_code)
+        return json.loads(raw) if raw is not None else None
+
+    async def delete_room(self, room_code: str) -> None:
+        self._store.pop(room_code, None)
+
+
+class HubBackend(ClusterBackend):
+    """Backend that talks to an ``app.cluster_hub`` server over one TCP connection.
+
+    The hub relays envelopes between nodes and keeps room state, standing in
+    for a Redis-style pub/sub and key-value server in local deployments.
+    """
+
+    def __init__(
+        self,
+        node_id: str,
+        nodes: Sequence[str],
+        host: str = "127.0.0.1",
+        port: int = 7800,
+        *,
+        reconnect_delay: float = 1.0,
+        request_timeout: float = 5.0,
+    ) -> None:
+        super().__init__(node_id, nodes)
+        self._host = host
+        self._port = port
+        self._reconnect_delay = reconnect_delay
+        self._request_timeout = request_timeout
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._pending: Dict[int, asyncio.Future[Any]] = {}
+        self._request_ids = itertools.count()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        await asyncio.wait_for(self._connected.wait(), self._request_timeout)
+
+    async def close(self) -> None:
+        await super().close()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._connected.clear()
+
+    async def send(self, node_id: str, envelope: Envelope) -> None:
+        if node_id == self.node_id:
+            self._handle(envelope)
+            return
+        await self._write({"op": "send", "to": node_id, "body": envelope})
+
+    async def save_room(self, room_code: str, state: Dict[str, Any]) -> None:
+        await self._write({"op": "set", "key": f"room:{room_code}", "value": state})
+
+    async def load_room(self, room_code: str) -> Optional[Dict[str, Any]]:
+        return await self._request({"op": "get", "key": f"room:{room_code}"})
+
+    async def delete_room(self, room_code: str) -> None:
+        await self._write({"op": "del", "key": f"room:{room_code}"})
+
+    # ------------------------------------------------------------------
+    # Connection
+    # ------------------------------------------------------------------
+    async def _write(self, message: Envelope) -> None:
+        await asyncio.wait_for(self._connected.wait(), self._request_timeout)
+        line = json.dumps(message).encode() + b"\n"
+        async with self._write_lock:
+            self._writer.write(line)
+            await self._writer.drain()
+
+    async def _request(self, message: Envelope) -> Any:
+        request_id = next(self._request_ids)
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._write({**message, "id": request_id})
+            return await asyncio.wait_for(future, self._request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self._host, self._port, limit=2**24)
+            except OSError as exc:
+                print(f"Cluster hub {self._host}:{self._port} unreachable: {exc}")
+                await asyncio.sleep(self._reconnect_delay)
+                continue
+
+            writer.write(json.dumps({"op": "hello", "node": self.node_id}).encode() + b"\n")
+            self._writer = writer
+            self._connected.set()
+            try:
+                while line := await reader.readline():
+                    self._on_message(json.loads(line))
+            except (OSError, ValueError) as exc:
+                print(f"Cluster hub connection lost: {exc}")
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("Cluster hub connection lost"))
+            await asyncio.sleep(self._reconnect_delay)
+
+    def _on_message(self, message: Envelope) -> None:
+        op = message.get("op")
+        if op == "msg":
+            self._handle(message["body"])
+        elif op == "reply":
+            future = self._pending.get(message.get("id"))
+            if future is not None and not future.done():
+                future.set_result(message.get("value"))
+
+
+def create_backend() -> ClusterBackend:
+    """Build the backend described by ``CLUSTER_*`` environment variables."""
+
+    kind = os.getenv("CLUSTER_BACKEND", "inprocess")
+    node_id = os.getenv("CLUSTER_NODE_ID", "local")
+    if kind == "inprocess":
+        return InProcessBackend(node_id)
+    if kind == "hub":
+        nodes = [node.strip() for node in os.getenv("CLUSTER_NODES", node_id).split(",") if node.strip()]
+        host, _, port = os.getenv("CLUSTER_HUB", "127.0.0.1:7800").rpartition(":")
+        return HubBackend(node_id, nodes, host or "127.0.0.1", int(port))
+    raise ValueError(f"Unknown cluster backend: {kind}")
+
+
+cluster_backend = create_backend()
+
+
+__all__ = [
+    "ClusterBackend",
+    "HubBackend",
+    "InProcessBackend",
+    "RemoteSocket",
+    "cluster_backend",
+    "create_backend",
+    "shard_for",
+]
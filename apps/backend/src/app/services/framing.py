@@ -0,0 +1,60 @@
+"""Wire codecs a client can negotiate for its socket at join time.
+
+JSON text is always available. Binary codecs are offered only when their
+library is installed, so a missing package just means clients stay on JSON.
+Text frames are always JSON, binary frames use the negotiated codec.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Union
+
+Encoded = Union[str, bytes]
+
+
+@dataclass(frozen=True)
+class Codec:
+    """How messages are turned into frames for one socket."""
+
+    name: str
+    binary: bool
+    encode: Callable[[Any], Encoded]
+    decode: Callable[[Encoded], Any]
+
+
+JSON = Codec("json", False, json.dumps, json.loads)
+
+CODECS: Dict[str, Codec] = {JSON.name: JSON}
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+else:
+    CODECS["msgpack"] = Codec(
+        "msgpack",
+        True,
+        lambda message: msgpack.packb(message, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False),
+    )
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - optional dependency
+    cbor2 = None
+else:
+    CODECS["cbor"] = Codec("cbor", True, cbor2.dumps, cbor2.loads)
+
+
+def negotiate(requested: Optional[str], *, binary_ok: bool = True) -> Codec:
+    """The codec a client asked for if this server supports it, else JSON."""
+
+    codec = CODECS.get(str(requested or "").lower(), JSON)
+    if codec.binary and not binary_ok:
+        return JSON
+    return codec
+
+
+__all__ = ["CODECS", "Codec", "JSON", "negotiate"]
@@ -3,12 +3,29 @@
 from __future__ import annotations
 
 import asyncio
+import os
 import time
-from typing import Any, Dict, Optional
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from ..add_songs import get_artist_image_url, get_spotify_client
-from ..database import Database
-from .room_manager import RoomManager
+from ..artist_images import ArtistImageResolver, artist_image_resolver
+from ..catalog import PlaylistCatalog, playlist_catalog
+from ..scoring import SongMatcher, calculate_score
+from .answer_batcher import AnswerBatcher, PendingAnswer
+from .preview_resolver import PreviewResolver, preview_resolver
+from .room_manager import Room, RoomManager
+from .scheduler import RoundScheduler, round_scheduler
+from .song_pool import SongCursor, SongPoolCache, song_pool_cache
+
+
+@dataclass
+class PreparedRound:
+    """Song and preview URL resolved ahead of the round that will use them."""
+
+    mode: str
+    song: Dict[str, Any]
+    preview_url: Optional[str] = None
 
 
 class GameService:
@@ -16,9 +33,33 @@ class GameService:
 
     ROUND_DURATION = 30
     ANSWER_REVEAL_DELAY = 5
-
-    def __init__(self, room_manager: RoomManager) -> None:
+    # Seconds a disconnected player keeps their seat, score and host role
+    DISCONNECT_GRACE = float(os.getenv("DISCONNECT_GRACE_SECONDS", "30"))
+
+    def __init__(
+        self,
+        room_manager: RoomManager,
+        catalog: Optional[PlaylistCatalog] = None,
+        song_pools: Optional[SongPoolCache] = None,
+        previews: Optional[PreviewResolver] = None,
+        artist_images: Optional[ArtistImageResolver] = None,
+        answer_batch_window: Optional[float] = None,
+        scheduler: Optional[RoundScheduler] = None,
+    ) -> None:
         self._rooms = room_manager
+        self._catalog = catalog or playlist_catalog
+        self._song_pools = song_pools or song_pool_cache
+        self._previews = previews or preview_resolver
+        self._artist_images = artist_images or artist_image_resolver
+        self._scheduler = scheduler or round_scheduler
+        self._prefetches: Dict[str, asyncio.Task[Optional[PreparedRound]]] = {}
+        room_manager.set_restore_handler(lambda room: self.resume_rooms([room]))
+
+        if answer_batch_window is None:
+            answer_batch_window = float(os.getenv("ANSWER_BATCH_WINDOW_MS", "0")) / 1000
+        self._answer_batcher: Optional[AnswerBatcher] = (
+            AnswerBatcher(answer_batch_window, self._score_batch) if answer_batch_window > 0 else None
+        )
 
     # ------------------------------------------------------------------
     # Round lifecycle
@@ -28,22 +69,26 @@ class GameService:
         if not room or not room.selected_mode:
             return
 
-        playlist_id = Database.get_playlist_id(room.selected_mode)
-        exclude_ids = list({int(x) for x in room.played_song_ids if x is not None})
-        song = Database.get_random_song_exclude_ids(playlist_id, exclude_ids)
-        if not song:
+        prepared = await self._take_prefetched(room)
+        if prepared is None:
+            prepared = await self._prepare_round(room, resolve_preview=False)
+        if prepared is None:
             await self._rooms.broadcast(room_code, {"type": "no_more_songs", "payload": {}})
             return
 
+        song = prepared.song
+        preview_url = prepared.preview_url
+        if preview_url is None:
+            preview_url = await self._get_preview_url(song)
+
         room.current_song = song
-        if song["id"] not in room.played_song_ids:
-            room.played_song_ids.append(int(song["id"]))
+        room.current_matcher = SongMatcher(song["artist"], song["title"], song.get("aliases"))
 
         room.round_number += 1
         room.round_start_time = time.time()
         room.game_state = "playing"
+        self._rooms.mark_dirty(room.code)
 
-        preview_url = await self._get_preview_url(song)
         payload = {
             "type": "round_started",
             "payload": {
@@ -74,7 +119,15 @@ class GameService:
         else:
             await self._rooms.broadcast(room_code, payload)
 
-        asyncio.create_task(self._round_timer(room_code, self.ROUND_DURATION))
+        # Starting a round supersedes any deadline left from the previous one
+        self._scheduler.cancel((room.code, room.round_number - 1))
+        self._scheduler.schedule(
+            (room.code, room.round_number),
+            self.ROUND_DURATION,
+            partial(self._on_round_timeout, room.code, room.round_number),
+        )
+        if room.round_number < room.total_rounds:
+            self._schedule_prefetch(room_code)
 
     async def reveal_answer(self, room_code: str) -> None:
         room = self._rooms.get_room(room_code)
@@ -84,10 +137,7 @@ class GameService:
         song = room.current_song
         artist_image_url: Optional[str] = None
         try:
-            sp = get_spotify_client()
-            artist_image_url = await asyncio.to_thread(
-                get_artist_image_url, sp, song.get("artist", "")
-            )
+            artist_image_url = await self._artist_images.resolve(song.get("artist", ""))
         except Exception as exc:  # pragma: no cover - best effort logging
             print(f"Artist image lookup failed: {exc}")
 
@@ -109,16 +159,14 @@ class GameService:
             return
 
         room.game_state = "leaderboard"
-        leaderboard = sorted(room.players, key=lambda p: p.score, reverse=True)
+        self._rooms.mark_dirty(room.code)
+        leaderboard = self._leaderboard_entries(room)
         await self._rooms.broadcast(
             room_code,
             {
                 "type": "round_ended",
                 "payload": {
-                    "leaderboard": [
-                        {"name": player.name, "score": player.score}
-                        for player in leaderboard
-                    ],
+                    "leaderboard": leaderboard,
                     "currentRound": room.round_number,
                     "totalRounds": room.total_rounds,
                 },
@@ -131,19 +179,121 @@ class GameService:
                 room_code,
                 {
                     "type": "game_ended",
-                    "payload": {
-                        "finalLeaderboard": [
-                            {"name": player.name, "score": player.score}
-                            for player in leaderboard
-                        ]
-                    },
+                    "payload": {"finalLeaderboard": leaderboard},
                 },
             )
 
+    # ------------------------------------------------------------------
+    # Presence
+    # ------------------------------------------------------------------
+    def schedule_departure(self, room_code: str, player_id: str) -> None:
+        """Remove a disconnected player unless they resume within the grace period."""
+
+        self._scheduler.schedule(
+            (room_code.upper(), ("grace", player_id)),
+            self.DISCONNECT_GRACE,
+            partial(self._on_grace_expired, room_code.upper(), player_id),
+        )
+
+    def cancel_departure(self, room_code: str, player_id: str) -> None:
+        self._scheduler.cancel((room_code.upper(), ("grace", player_id)))
+
+    async def _on_grace_expired(self, room_code: str, player_id: str) -> None:
+        if self._rooms.get_socket_for_player(room_code, player_id) is not None:
+            return
+        departure = self._rooms.remove_player(room_code, player_id)
+        if departure is None:
+            return
+        if self._rooms.get_room(room_code):
+            await self._rooms.announce_departure(departure)
+        else:
+            self.discard_room(room_code)
+
+    # ------------------------------------------------------------------
+    # Restore
+    # ------------------------------------------------------------------
+    def resume_rooms(self, rooms: Iterable[Room]) -> None:
+        """Re-arm the round deadline of rooms restored mid-round from a snapshot."""
+
+        now = time.time()
+        for room in rooms:
+            # Nobody is connected yet; players who never come back are dropped as usual
+            for player_id in room.players:
+                self.schedule_departure(room.code, player_id)
+            if room.game_state != "playing" or room.round_start_time is None:
+                continue
+            remaining = max(self.ROUND_DURATION - (now - room.round_start_time), 0.0)
+            self._scheduler.schedule(
+                (room.code, room.round_number),
+                remaining,
+                partial(self._on_round_timeout, room.code, room.round_number),
+            )
+
+    async def send_game_state(self, room_code: str, player_id: str) -> None:
+        """Bring a rejoining player up to date with the round in progress.
+
+        These frames go straight to the player's socket rather than into the
+        room's event log, since they restate events already logged.
+        """
+
+        room = self._rooms.get_room(room_code)
+        if not room or room.game_state == "lobby":
+            return
+
+        if room.host_only_audio:
+            await self._send_direct(
+                room_code, player_id, {"type": "audio_mode_set", "payload": {"hostOnlyAudio": True}}
+            )
+
+        if room.game_state == "playing" and room.current_song and room.round_start_time:
+            song = room.current_song
+            is_host = player_id == room.host_id
+            preview_url = ""
+            if is_host or not room.host_only_audio:
+                preview_url = await self._get_preview_url(song)
+            remaining = self.ROUND_DURATION - (time.time() - room.round_start_time)
+            payload: Dict[str, Any] = {
+                "songData": {"url": preview_url, "title": song["title"], "artist": song["artist"]},
+                "duration": max(int(round(remaining)), 0),
+            }
+            if is_host and room.host_only_audio:
+                payload["isHost"] = True
+            await self._send_direct(room_code, player_id, {"type": "round_started", "payload": payload})
+            return
+
+        leaderboard = self._leaderboard_entries(room)
+        await self._send_direct(
+            room_code,
+            player_id,
+            {
+                "type": "round_ended",
+                "payload": {
+                    "leaderboard": leaderboard,
+                    "currentRound": room.round_number,
+                    "totalRounds": room.total_rounds,
+                },
+            },
+        )
+        if room.game_state == "ended":
+            await self._send_direct(
+                room_code, player_id, {"type": "game_ended", "payload": {"finalLeaderboard": leaderboard}}
+            )
+
     # ------------------------------------------------------------------
     # Message helpers
     # ------------------------------------------------------------------
-    async def process_answer(self, room_code: str, player_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    @property
+    def batches_answers(self) -> bool:
+        return self._answer_batcher is not None
+
+    async def process_answer(
+        self,
+        room_code: str,
+        player_id: str,
+        payload: Dict[str, Any],
+        *,
+        received_at: Optional[float] = None,
+    ) -> Dict[str, Any]:
         room = self._rooms.get_room(room_code)
         if not room or not room.current_song:
             return {
@@ -151,17 +301,135 @@ class GameService:
                 "payload": {"code": "NO_ACTIVE_ROUND"},
             }
 
-        round_start = room.round_start_time or time.time()
-        elapsed = time.time() - round_start
-        song = room.current_song
         artist = payload.get("artist", "").strip()
         title = payload.get("title", "").strip()
+        result = self._matcher_for(room).check(artist, title)
+        return self._apply_answer(room, player_id, artist, title, result, received_at or time.time())
+
+    def queue_answer(
+        self,
+        room_code: str,
+        player_id: str,
+        payload: Dict[str, Any],
+        *,
+        received_at: float,
+    ) -> Optional[Dict[str, Any]]:
+        """Hand a submission to the batch window; the reply is sent when it flushes.
+
+        Returns an error to send right away when there is no round to answer,
+        as :meth:`process_answer` does.
+        """
+
+        room = self._rooms.get_room(room_code)
+        if self._answer_batcher is None or not room or not room.current_song:
+            return {"type": "error", "payload": {"code": "NO_ACTIVE_ROUND"}}
+        self._answer_batcher.submit(
+            room.code,
+            PendingAnswer(
+                player_id=player_id,
+                artist=payload.get("artist", "").strip(),
+                title=payload.get("title", "").strip(),
+                received_at=received_at,
+                round_number=room.round_number,
+            ),
+        )
+        return None
+
+    async def _score_batch(self, room_code: str, answers: List[PendingAnswer]) -> None:
+        room = self._rooms.get_room(room_code)
+        if not room:
+            return
+
+        current: List[PendingAnswer] = []
+        replies: List[Tuple[str, Dict[str, Any]]] = []
+        for answer in answers:
+            if room.current_song and answer.round_number == room.round_number:
+                current.append(answer)
+            else:
+                replies.append((answer.player_id, {"type": "error", "payload": {"code": "NO_ACTIVE_ROUND"}}))
+
+        if current:
+            results = self._matcher_for(room).check_many((a.artist, a.title) for a in current)
+            for answer, result in zip(current, results):
+                reply = self._apply_answer(
+                    room, answer.player_id, answer.artist, answer.title, result, answer.received_at
+                )
+                replies.append((answer.player_id, reply))
+
+        for player_id, reply in replies:
+            await self._rooms.send_to_player(room.code, player_id, reply)
 
-        result = self._check_answer(artist, title, song["artist"], song["title"])
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+    @property
+    def pending_deadlines(self) -> int:
+        return self._scheduler.pending
 
+    def _is_current_round(self, room_code: str, round_number: int) -> bool:
+        room = self._rooms.get_room(room_code)
+        return room is not None and room.round_number == round_number
+
+    async def _on_round_timeout(self, room_code: str, round_number: int) -> None:
+        if not self._is_current_round(room_code, round_number):
+            return
+        await self.reveal_answer(room_code)
+        if not self._is_current_round(room_code, round_number):
+            return
+        self._scheduler.schedule(
+            (room_code, round_number),
+            self.ANSWER_REVEAL_DELAY,
+            partial(self._on_reveal_timeout, room_code, round_number),
+        )
+
+    async def _on_reveal_timeout(self, room_code: str, round_number: int) -> None:
+        if self._is_current_round(room_code, round_number):
+            await self.end_round(room_code)
+
+    def discard_room(self, room_code: str) -> None:
+        """Drop background work for a room that no longer exists."""
+
+        task = self._prefetches.pop(room_code.upper(), None)
+        if task:
+            task.cancel()
+        self._scheduler.cancel_room(room_code.upper())
+        if self._answer_batcher:
+            self._answer_batcher.discard(room_code.upper())
+
+    async def _send_direct(self, room_code: str, player_id: str, message: Dict[str, Any]) -> None:
+        ws = self._rooms.get_socket_for_player(room_code, player_id)
+        if ws is not None:
+            await self._rooms.send_to_socket(ws, message)
+
+    def _leaderboard_entries(self, room: Room) -> List[Dict[str, Any]]:
+        return [
+            {"name": room.players[player_id].name, "score": score}
+            for player_id, score in room.leaderboard.top()
+        ]
+
+    def _matcher_for(self, room: Room) -> SongMatcher:
+        matcher = room.current_matcher
+        if matcher is None:
+            song = room.current_song or {}
+            matcher = room.current_matcher = SongMatcher(
+                song.get("artist", ""), song.get("title", ""), song.get("aliases")
+            )
+        return matcher
+
+    def _apply_answer(
+        self,
+        room: Room,
+        player_id: str,
+        artist: str,
+        title: str,
+        result: Dict[str, bool],
+        received_at: float,
+    ) -> Dict[str, Any]:
+        # Speed is measured from when the server received the answer, not when it was scored
+        elapsed = received_at - (room.round_start_time or received_at)
         score_awarded = self._calculate_score(result, elapsed)
         if score_awarded:
-            self._update_player_score(room_code, player_id, score_awarded)
+            self._update_player_score(room.code, player_id, score_awarded)
 
         return {
             "type": "answer_received",
@@ -170,76 +438,84 @@ class GameService:
                 "title": title,
                 "result": result,
                 "scoreAwarded": score_awarded,
+                "rank": room.leaderboard.rank(player_id),
             },
         }
 
-    # ------------------------------------------------------------------
-    # Internal helpers
-    # ------------------------------------------------------------------
-    async def _round_timer(self, room_code: str, duration: int) -> None:
-        await asyncio.sleep(duration)
-        await self.reveal_answer(room_code)
-        await asyncio.sleep(self.ANSWER_REVEAL_DELAY)
-        await self.end_round(room_code)
-
-    async def _get_preview_url(self, song: Dict[str, Any]) -> str:
-        from aiohttp import ClientSession
+    async def _prepare_round(self, room: Room, *, resolve_preview: bool = True) -> Optional[PreparedRound]:
+        mode = room.selected_mode
+        playlist_id = await self._catalog.get_playlist_id(mode)
+        song = await self._draw_song(room, playlist_id)
+        if not song:
+            return None
 
-        async with ClientSession() as session:
-            async with session.get(
-                f"https://api.deezer.com/track/{song['deezer_track_id']}"
-            ) as resp:
-                data = await resp.json()
-                return data.get("preview", "")
+        prepared = PreparedRound(mode=mode, song=song)
+        if resolve_preview:
+            try:
+                prepared.preview_url = await self._get_preview_url(song)
+            except Exception as exc:  # pragma: no cover - best effort logging
+                print(f"Preview prefetch failed: {exc}")
+        return prepared
 
-    def _calculate_score(self, result: Dict[str, bool], elapsed: float) -> int:
-        if result.get("both_correct"):
-            base_score = 1000
-            min_score = 100
-        elif result.get("title_correct") or result.get("artist_correct"):
-            base_score = 500
-            min_score = 50
+    def _schedule_prefetch(self, room_code: str) -> None:
+        room = self._rooms.get_room(room_code)
+        if not room:
+            return
+        previous = self._prefetches.pop(room.code, None)
+        if previous:
+            previous.cancel()
+        self._prefetches[room.code] = asyncio.create_task(self._prepare_round(room))
+
+    async def _take_prefetched(self, room: Room) -> Optional[PreparedRound]:
+        task = self._prefetches.pop(room.code, None)
+        if task is None or task.cancelled():
+            return None
+        try:
+            prepared = await task
+        except Exception as exc:  # pragma: no cover - fall back to the inline path
+            print(f"Round prefetch failed: {exc}")
+            return None
+        if prepared is None or prepared.mode != room.selected_mode:
+            return None
+        return prepared
+
+    async def _draw_song(self, room: Room, playlist_id: Any) -> Optional[Dict[str, Any]]:
+        if playlist_id is None:
+            return None
+        pool = await self._song_pools.get(playlist_id)
+        if pool is None:
+            return None
+
+        cursor = room.song_cursor
+        if cursor is None or cursor.playlist_id != playlist_id:
+            cursor = room.song_cursor = SongCursor(pool)
         else:
-            return 0
-
-        speed_penalty = elapsed * 10
-        score = max(base_score - speed_penalty, min_score)
-        return int(round(score, 0))
-
-    def _check_answer(self, artist_guess: str, title_guess: str, artist: str, title: str) -> Dict[str, bool]:
-        from difflib import SequenceMatcher
-        import re
-
-        def normalize(text: str) -> str:
-            text = text.lower()
-            text = re.sub(r"\([^)]*\)", "", text)
-            text = re.sub(r"\[[^\]]*\]", "", text)
-            text = re.sub(r"\s*-\s*remaster(ed)?.*", "", text, flags=re.IGNORECASE)
-            text = re.sub(r"\s*-\s*\d{4}.*", "", text)
-            text = re.sub(r"[^\w\s]", "", text)
-            text = " ".join(text.split())
-            return text.strip()
-
-        def similarity(guess: str, actual: str) -> float:
-            return SequenceMatcher(None, guess, actual).ratio()
+            cursor.rebase(pool)
+        return cursor.draw()
 
-        artist_score = similarity(normalize(artist_guess), normalize(artist))
-        title_score = similarity(normalize(title_guess), normalize(title))
+    async def _get_preview_url(self, song: Dict[str, Any]) -> str:
+        try:
+            preview = await self._previews.get_preview_url(song["deezer_track_id"])
+        except Exception as exc:  # pragma: no cover - best effort logging
+            print(f"Preview lookup failed: {exc}")
+            preview = ""
+        # Fall back to the URL stored at ingest time if the live lookup had nothing
+        return preview or song.get("preview_url") or ""
 
-        artist_correct = artist_score >= 0.80
-        title_correct = title_score >= 0.80
+    def _calculate_score(self, result: Dict[str, bool], elapsed: float) -> int:
+        return calculate_score(result, elapsed)
 
-        return {
-            "artist_correct": artist_correct,
-            "title_correct": title_correct,
-            "both_correct": artist_correct and title_correct,
-        }
+    def _check_answer(self, artist_guess: str, title_guess: str, artist: str, title: str) -> Dict[str, bool]:
+        return SongMatcher(artist, title).check(artist_guess, title_guess)
 
     def _update_player_score(self, room_code: str, player_id: str, points: int) -> None:
-        player = self._rooms.get_player(room_code, player_id)
+        room = self._rooms.get_room(room_code)
+        player = room.players.get(player_id) if room else None
         if not player:
             return
         player.score += points
+        room.leaderboard.update(player_id, player.score)
+        self._rooms.mark_dirty(room.code)
 
 
 __all__ = ["GameService"]
@@ -0,0 +1,162 @@
+"""Incrementally maintained per-room leaderboard."""
+
+from __future__ import annotations
+
+import math
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Ranking key: (-score, join sequence) so ties keep join order, like a stable sort
+_Key = Tuple[int, int]
+_END: Tuple[float, float] = (math.inf, math.inf)
+
+
+class _Node:
+    __slots__ = ("key", "player_id", "next", "width")
+
+    def __init__(self, key: object, player_id: Optional[str], level: int) -> None:
+        self.key = key
+        self.player_id = player_id
+        self.next: List[Optional[_Node]] = [None] * level
+        self.width: List[int] = [1] * level
+
+
+class _IndexableSkipList:
+    """Skip list whose links carry widths, giving O(log n) insert, remove and rank."""
+
+    MAX_LEVELS = 24
+
+    def __init__(self, rng: Optional[random.Random] = None) -> None:
+        self._rng = rng or random.Random()
+        self._tail = _Node(_END, None, 0)
+        self._head = _Node(None, None, self.MAX_LEVELS)
+        self._head.next = [self._tail] * self.MAX_LEVELS
+        self.size = 0
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVELS and self._rng.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key: _Key, player_id: str) -> None:
+        chain: List[_Node] = [self._head] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = self._random_level()
+        new_node = _Node(key, player_id, height)
+        steps = 0
+        for level in range(height):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key: _Key) -> None:
+        chain: List[_Node] = [self._head] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key: _Key) -> int:
+        position = 0
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    def __iter__(self) -> Iterator[_Node]:
+        node = self._head.next[0]
+        while node is not self._tail:
+            yield node
+            node = node.next[0]
+
+
+class Leaderboard:
+    """Players ranked by score, updated in O(log n) per score change."""
+
+    def __init__(self, rng: Optional[random.Random] = None) -> None:
+        self._ranked = _IndexableSkipList(rng)
+        self._keys: Dict[str, _Key] = {}
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return self._ranked.size
+
+    def __contains__(self, player_id: object) -> bool:
+        return player_id in self._keys
+
+    def add(self, player_id: str, score: int = 0) -> None:
+        if player_id in self._keys:
+            self.update(player_id, score)
+            return
+        key = (-score, self._sequence)
+        self._sequence += 1
+        self._keys[player_id] = key
+        self._ranked.insert(key, player_id)
+
+    def update(self, player_id: str, score: int) -> None:
+        key = self._keys.get(player_id)
+        if key is None:
+            self.add(player_id, score)
+            return
+        if -key[0] == score:
+            return
+        self._ranked.remove(key)
+        new_key = (-score, key[1])
+        self._keys[player_id] = new_key
+        self._ranked.insert(new_key, player_id)
+
+    def remove(self, player_id: str) -> None:
+        key = self._keys.pop(player_id, None)
+        if key is not None:
+            self._ranked.remove(key)
+
+    def rank(self, player_id: str) -> Optional[int]:
+        """1-based position of a player, or ``None`` if they are not ranked."""
+
+        key = self._keys.get(player_id)
+        if key is None:
+            return None
+        return self._ranked.index(key) + 1
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[str, int]]:
+        """The ``k`` best ``(player_id, score)`` pairs, or everyone when ``k`` is None."""
+
+        entries: List[Tuple[str, int]] = []
+        for node in self._ranked:
+            if k is not None and len(entries) >= k:
+                break
+            entries.append((node.player_id, -node.key[0]))
+        return entries
+
+
+__all__ = ["Leaderboard"]
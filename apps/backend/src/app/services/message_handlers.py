@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from typing import Any, Awaitable, Callable, Dict
 
 from fastapi import WebSocket
@@ -18,6 +19,10 @@ class MessageContext:
     room_code: str
     room_manager: RoomManager
     game_service: GameService
+    received_at: float = field(default_factory=time.time)
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        await self.room_manager.send_to_socket(self.ws, message)
 
 
 MessageHandler = Callable[[MessageContext, Dict[str, Any]], Awaitable[None]]
@@ -33,6 +38,7 @@ async def handle_select_game_mode(ctx: MessageContext, payload: Dict[str, Any])
         return
 
     room.selected_mode = selected_mode
+    ctx.room_manager.mark_dirty(room.code)
     await ctx.room_manager.broadcast(
         ctx.room_code,
         {
@@ -45,7 +51,7 @@ async def handle_select_game_mode(ctx: MessageContext, payload: Dict[str, Any])
 async def handle_start_game(ctx: MessageContext, payload: Dict[str, Any]) -> None:  # noqa: ARG001
     room = ctx.room_manager.get_room(ctx.room_code)
     if not room or ctx.player_id != room.host_id:
-        await ctx.ws.send_json({"type": "error", "payload": {"code": "NOT_HOST"}})
+        await ctx.send({"type": "error", "payload": {"code": "NOT_HOST"}})
         return
 
     await ctx.room_manager.broadcast(
@@ -56,10 +62,18 @@ async def handle_start_game(ctx: MessageContext, payload: Dict[str, Any]) -> Non
 
 
 async def handle_submit_answer(ctx: MessageContext, payload: Dict[str, Any]) -> None:
+    if ctx.game_service.batches_answers:
+        error = ctx.game_service.queue_answer(
+            ctx.room_code, ctx.player_id, payload, received_at=ctx.received_at
+        )
+        if error:
+            await ctx.send(error)
+        return
+
     response = await ctx.game_service.process_answer(
-        ctx.room_code, ctx.player_id, payload
+        ctx.room_code, ctx.player_id, payload, received_at=ctx.received_at
     )
-    await ctx.ws.send_json(response)
+    await ctx.send(response)
 
 
 async def handle_next_round(ctx: MessageContext, payload: Dict[str, Any]) -> None:  # noqa: ARG001
@@ -78,19 +92,60 @@ async def handle_set_audio_mode(ctx: MessageContext, payload: Dict[str, Any]) ->
 
     host_only = bool(payload.get("hostOnly", False))
     room.host_only_audio = host_only
+    ctx.room_manager.mark_dirty(room.code)
     await ctx.room_manager.broadcast(
         ctx.room_code,
         {"type": "audio_mode_set", "payload": {"hostOnlyAudio": host_only}},
     )
 
 
+async def handle_resume(ctx: MessageContext, payload: Dict[str, Any]) -> None:
+    """Catch a player up on the room events they missed since ``lastSeq``.
+
+    Only the missed events are re-sent while the room's event log still
+    covers the gap; otherwise the player gets a full snapshot instead.
+    """
+
+    room = ctx.room_manager.get_room(ctx.room_code)
+    player = room.players.get(ctx.player_id) if room else None
+    if not room or not player:
+        return
+
+    try:
+        last_seq = int(payload.get("lastSeq", -1))
+    except (TypeError, ValueError):
+        last_seq = -1
+    full = not ctx.room_manager.covers(ctx.room_code, last_seq)
+
+    await ctx.send(
+        {
+            "type": "resumed",
+            "payload": {
+                "playerId": player.id,
+                "hostId": room.host_id,
+                "roomCode": room.code,
+                "nickname": player.name,
+                "seq": room.seq,
+                "full": full,
+                "codec": ctx.room_manager.codec_for(ctx.ws).name,
+            },
+        }
+    )
+    if full:
+        await ctx.send(ctx.room_manager.build_room_state_payload(ctx.room_code))
+        await ctx.game_service.send_game_state(ctx.room_code, ctx.player_id)
+    else:
+        ctx.room_manager.replay(ctx.room_code, ctx.player_id, ctx.ws, last_seq)
+
+
 HANDLERS: Dict[str, MessageHandler] = {
     "select_game_mode": handle_select_game_mode,
     "start_game": handle_start_game,
     "submit_answer": handle_submit_answer,
     "next_round": handle_next_round,
     "set_audio_mode": handle_set_audio_mode,
+    "resume": handle_resume,
 }
 
 
-__all__ = ["HANDLERS", "MessageContext"]
+__all__ = ["HANDLERS", "MessageContext", "handle_resume"]
@@ -0,0 +1,203 @@
+"""Per-connection outbound queues drained by a dedicated writer task."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, FrozenSet, Optional
+
+from fastapi import WebSocket
+
+from .framing import JSON, Codec, Encoded
+
+# Overflow policies for a full queue
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+POLICIES = frozenset({DROP_OLDEST, COALESCE, DISCONNECT})
+
+# Snapshot messages where only the newest copy matters
+COALESCE_TYPES = frozenset({"room_state"})
+# Messages a full queue may shed instead of disconnecting. There are none:
+# a client gets one room_state, at join or resume, and every later frame is
+# a delta it needs. So drop_oldest and coalesce disconnect a consumer whose
+# queue is full of them, and the client resumes from its last seq.
+NON_CRITICAL_TYPES: FrozenSet[str] = frozenset()
+
+
+class OutboundFrame:
+    """A message waiting to be written to one or more sockets.
+
+    Encodings are made on first use and cached per codec, so a broadcast
+    costs one encode per codec in use rather than one per recipient.
+    """
+
+    __slots__ = ("msg_type", "_message", "_encoded", "_sizes")
+
+    def __init__(self, message: Any = None, msg_type: str = "", *, text: Optional[str] = None) -> None:
+        if not msg_type and isinstance(message, dict):
+            msg_type = message.get("type", "")
+        self.msg_type = msg_type
+        self._message = message
+        self._encoded: Dict[str, Encoded] = {}
+        self._sizes: Dict[str, int] = {}
+        if text is not None:
+            self._encoded[JSON.name] = text
+
+    @property
+    def data(self) -> str:
+        """The JSON text of the message."""
+
+        return self.encode(JSON)  # type: ignore[return-value]
+
+    def encode(self, codec: Codec) -> Encoded:
+        encoded = self._encoded.get(codec.name)
+        if encoded is None:
+            message = self._message
+            if message is None:
+                message = JSON.decode(self._encoded[JSON.name])
+            encoded = self._encoded[codec.name] = codec.encode(message)
+        return encoded
+
+    def size(self, codec: Codec) -> int:
+        """Bytes on the wire for ``codec``; text frames are sent as UTF-8."""
+
+        size = self._sizes.get(codec.name)
+        if size is None:
+            encoded = self.encode(codec)
+            size = len(encoded.encode("utf-8")) if isinstance(encoded, str) else len(encoded)
+            self._sizes[codec.name] = size
+        return size
+
+    @property
+    def critical(self) -> bool:
+        return self.msg_type not in NON_CRITICAL_TYPES
+
+
+class ConnectionWriter:
+    """Owns every write to one WebSocket.
+
+    Senders call :meth:`enqueue`, which never blocks; the writer task drains
+    the queue with a per-send timeout. A stalled peer therefore only backs up
+    its own queue, and the configured policy decides what happens when that
+    queue is full.
+
+    Sockets that expose ``send_frame`` (proxies for connections held by
+    another node) are handed whole frames instead, so the node that owns the
+    real socket can apply the same policy.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        on_failure: Callable[[WebSocket], None],
+        *,
+        max_size: int = 64,
+        policy: str = COALESCE,
+        send_timeout: float = 5.0,
+        codec: Codec = JSON,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown outbound queue policy: {policy}")
+        self._ws = ws
+        self._on_failure = on_failure
+        self._max_size = max_size
+        self._policy = policy
+        self._send_timeout = send_timeout
+        self.codec = codec
+        self._queue: Deque[OutboundFrame] = deque()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._send_frame: Optional[Callable[[OutboundFrame], None]] = getattr(ws, "send_frame", None)
+        self._task: Optional[asyncio.Task[None]] = None
+        self.dropped = 0
+        self.closed = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def drain(self) -> None:
+        """Wait until every frame queued so far has been written."""
+
+        while not self._idle.is_set() and not self.closed:
+            await self._idle.wait()
+
+    def close(self) -> None:
+        self.closed = True
+        self._queue.clear()
+        self._idle.set()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    def enqueue(self, frame: OutboundFrame) -> None:
+        if self.closed:
+            return
+
+        if self._policy == COALESCE and frame.msg_type in COALESCE_TYPES:
+            stale = next((q for q in self._queue if q.msg_type == frame.msg_type), None)
+            if stale is not None:
+                self._queue.remove(stale)
+                self.dropped += 1
+
+        if len(self._queue) >= self._max_size:
+            if self._policy == DISCONNECT:
+                self._fail()
+                return
+            victim = next((q for q in self._queue if not q.critical), None)
+            if victim is not None:
+                self._queue.remove(victim)
+            elif not frame.critical:
+                self.dropped += 1
+                return
+            else:
+                # Backlog is all critical frames; this consumer can't keep up
+                self._fail()
+                return
+            self.dropped += 1
+
+        self._queue.append(frame)
+        self._idle.clear()
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                while not self._queue:
+                    self._idle.set()
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                frame = self._queue.popleft()
+                if self._send_frame is not None:
+                    self._send_frame(frame)
+                    continue
+                data = frame.encode(self.codec)
+                if isinstance(data, bytes):
+                    await asyncio.wait_for(self._ws.send_bytes(data), self._send_timeout)
+                else:
+                    await asyncio.wait_for(self._ws.send_text(data), self._send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._fail()
+
+    def _fail(self) -> None:
+        if self.closed:
+            return
+        self.close()
+        self._on_failure(self._ws)
+
+
+__all__ = [
+    "COALESCE",
+    "ConnectionWriter",
+    "DISCONNECT",
+    "DROP_OLDEST",
+    "OutboundFrame",
+    "POLICIES",
+]
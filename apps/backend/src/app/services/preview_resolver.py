@@ -0,0 +1,141 @@
+"""Deezer preview URL lookups over a shared, pooled HTTP client."""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+# Signed preview URLs carry their expiry as ``hdnea=exp=<unix time>~acl=...``
+_EXPIRY_PATTERN = re.compile(r"exp=(\d+)")
+
+
+class PreviewResolver:
+    """Resolves ``deezer_track_id`` values to preview URLs.
+
+    One ``httpx.AsyncClient`` is kept for the life of the app so lookups reuse
+    keep-alive connections, and resolved URLs are held in a bounded LRU cache
+    until shortly before the expiry Deezer signs into them.
+    """
+
+    API_BASE = "https://api.deezer.com"
+    DEFAULT_TTL = 3600.0
+    # Never hand out a URL that could expire before the round finishes playing
+    EXPIRY_MARGIN = 120.0
+
+    def __init__(
+        self,
+        *,
+        max_connections: int = 10,
+        max_concurrency: int = 8,
+        timeout: float = 4.0,
+        cache_size: int = 2048,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self._max_connections = max_connections
+        self._timeout = timeout
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # Fetches are owned by the resolver, so a cancelled caller never cancels another's wait
+        self._inflight: Dict[str, asyncio.Task[str]] = {}
+
+    # ------------------------------------------------------------------
+    # Client lifecycle
+    # ------------------------------------------------------------------
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.API_BASE,
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                    keepalive_expiry=60.0,
+                ),
+                timeout=httpx.Timeout(self._timeout),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    async def get_preview_url(self, deezer_track_id: str) -> str:
+        track_id = str(deezer_track_id)
+        cached = self._cache_get(track_id)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(track_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(track_id))
+            self._inflight[track_id] = task
+            task.add_done_callback(partial(self._fetch_done, track_id))
+        return await asyncio.shield(task)
+
+    def _fetch_done(self, track_id: str, task: "asyncio.Task[str]") -> None:
+        if self._inflight.get(track_id) is task:
+            del self._inflight[track_id]
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody waited for doesn't warn on GC
+            task.exception()
+
+    async def _fetch(self, track_id: str) -> str:
+        async with self._semaphore:
+            response = await self._get_http().get(f"/track/{track_id}")
+        response.raise_for_status()
+        data = response.json()
+        preview = data.get("preview", "") if isinstance(data, dict) else ""
+        if preview:
+            self._cache_put(track_id, preview)
+        return preview
+
+    # ------------------------------------------------------------------
+    # Cache helpers
+    # ------------------------------------------------------------------
+    @classmethod
+    def _expires_at(cls, url: str) -> float:
+        match = _EXPIRY_PATTERN.search(url)
+        if match:
+            return float(match.group(1)) - cls.EXPIRY_MARGIN
+        return time.time() + cls.DEFAULT_TTL
+
+    def _cache_get(self, track_id: str) -> Optional[str]:
+        entry = self._cache.get(track_id)
+        if entry is None:
+            return None
+        url, expires_at = entry
+        if time.time() >= expires_at:
+            del self._cache[track_id]
+            return None
+        self._cache.move_to_end(track_id)
+        return url
+
+    def _cache_put(self, track_id: str, url: str) -> None:
+        expires_at = self._expires_at(url)
+        if time.time() >= expires_at:
+            return
+        self._cache[track_id] = (url, expires_at)
+        self._cache.move_to_end(track_id)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+
+preview_resolver = PreviewResolver()
+
+
+__all__ = ["PreviewResolver", "preview_resolver"]
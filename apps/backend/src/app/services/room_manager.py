@@ -2,46 +2,163 @@
 
 from __future__ import annotations
 
-import json
+import asyncio
+import hmac
+import os
+import secrets
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterable, List, Optional
 
 from fastapi import WebSocket
 
+from ..scoring import SongMatcher
+from .cluster import ClusterBackend, cluster_backend
+from .framing import JSON, Codec
+from .leaderboard import Leaderboard
+from .outbound import ConnectionWriter, OutboundFrame
+from .room_snapshots import RoomSnapshotStore, room_snapshots
+from .song_pool import SongCursor
 
-@dataclass
+
+@dataclass(slots=True)
 class Player:
     """Simple representation of a player within a room."""
 
     id: str
     name: str
     score: int = 0
+    # Proves ownership of ``id`` when a client rejoins or resumes
+    token: str = field(default_factory=lambda: secrets.token_urlsafe(16))
+
+
+# Room events kept for resuming clients
+EVENT_LOG_SIZE = int(os.getenv("ROOM_EVENT_LOG_SIZE", "256"))
+
+
+@dataclass(slots=True)
+class RoomEvent:
+    """A sequenced message sent to (some of) a room, kept for replay."""
+
+    seq: int
+    frame: OutboundFrame
+    exclude: FrozenSet[str] = frozenset()
+    only: Optional[str] = None
 
+    def visible_to(self, player_id: str) -> bool:
+        return (self.only is None or self.only == player_id) and player_id not in self.exclude
 
-@dataclass
+
+@dataclass(slots=True)
 class Room:
-    """Mutable in-memory state for an active room."""
+    """Mutable in-memory state for an active room.
+
+    ``players`` and ``sockets`` are keyed by player id and keep join order.
+    """
 
     code: str
-    players: List[Player] = field(default_factory=list)
-    sockets: List[WebSocket] = field(default_factory=list)
+    players: Dict[str, Player] = field(default_factory=dict)
+    sockets: Dict[str, WebSocket] = field(default_factory=dict)
+    leaderboard: Leaderboard = field(default_factory=Leaderboard)
     host_id: Optional[str] = None
     selected_mode: str = ""
     current_song: Optional[Dict[str, Any]] = None
-    played_song_ids: List[int] = field(default_factory=list)
+    current_matcher: Optional[SongMatcher] = None
+    song_cursor: Optional[SongCursor] = None
     round_number: int = 0
     round_start_time: Optional[float] = None
     total_rounds: int = 10
     host_only_audio: bool = False
     game_state: str = "lobby"
+    seq: int = 0
+    events: Deque[RoomEvent] = field(default_factory=lambda: deque(maxlen=EVENT_LOG_SIZE))
+    # Outbound traffic over the room's lifetime, summed across recipients
+    frames_sent: int = 0
+    bytes_sent: int = 0
+
+    def to_state(self) -> Dict[str, Any]:
+        """Everything needed to rebuild the room elsewhere, minus live sockets."""
+
+        cursor = self.song_cursor
+        return {
+            "code": self.code,
+            "players": [
+                {"id": player.id, "name": player.name, "score": player.score, "token": player.token}
+                for player in self.players.values()
+            ],
+            "seq": self.seq,
+            "framesSent": self.frames_sent,
+            "bytesSent": self.bytes_sent,
+            "hostId": self.host_id,
+            "selectedMode": self.selected_mode,
+            "currentSong": self.current_song,
+            "playlistId": cursor.playlist_id if cursor else None,
+            "playedSongIds": sorted(cursor.played) if cursor else [],
+            "roundNumber": self.round_number,
+            "roundStartTime": self.round_start_time,
+            "totalRounds": self.total_rounds,
+            "hostOnlyAudio": self.host_only_audio,
+            "gameState": self.game_state,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Room":
+        """Rebuild a room from :meth:`to_state`; players come back without sockets."""
+
+        room = cls(code=state["code"])
+        for raw in state.get("players") or []:
+            player = Player(id=raw["id"], name=raw["name"], score=int(raw.get("score", 0)))
+            if raw.get("token"):
+                player.token = raw["token"]
+            room.players[player.id] = player
+            room.leaderboard.add(player.id, player.score)
+        room.seq = int(state.get("seq", 0))
+        room.frames_sent = int(state.get("framesSent", 0))
+        room.bytes_sent = int(state.get("bytesSent", 0))
+        room.host_id = state.get("hostId")
+        room.selected_mode = state.get("selectedMode", "")
+        room.current_song = state.get("currentSong")
+        if state.get("playlistId") is not None:
+            room.song_cursor = SongCursor.resume(state["playlistId"], state.get("playedSongIds") or [])
+        room.round_number = int(state.get("roundNumber", 0))
+        room.round_start_time = state.get("roundStartTime")
+        room.total_rounds = int(state.get("totalRounds", room.total_rounds))
+        room.host_only_audio = bool(state.get("hostOnlyAudio", False))
+        room.game_state = state.get("gameState", "lobby")
+        return room
 
 
 class RoomManager:
     """Encapsulates room, player, and socket lifecycle logic."""
 
-    def __init__(self) -> None:
+    # Seconds a single socket may take to accept a frame before it is evicted
+    SEND_TIMEOUT = 2.0
+
+    def __init__(
+        self,
+        *,
+        queue_size: Optional[int] = None,
+        queue_policy: Optional[str] = None,
+        backend: Optional[ClusterBackend] = None,
+        snapshots: Optional[RoomSnapshotStore] = None,
+        state_flush_interval: Optional[float] = None,
+    ) -> None:
         self._rooms: Dict[str, Room] = {}
+        # Rooms closed here whose delete may not have reached the backend yet
+        self._removed: set[str] = set()
+        self._restore_handler: Optional[Callable[[Room], None]] = None
+        self.backend = backend or cluster_backend
+        self._snapshots = snapshots or room_snapshots
+        self._dirty: set[str] = set()
+        self._flush_task: Optional[asyncio.Task[None]] = None
+        if state_flush_interval is None:
+            state_flush_interval = float(os.getenv("ROOM_STATE_FLUSH_MS", "1000")) / 1000
+        self._state_flush_interval = state_flush_interval
         self._socket_index: Dict[WebSocket, Dict[str, str]] = {}
+        self._writers: Dict[WebSocket, ConnectionWriter] = {}
+        self._queue_size = queue_size or int(os.getenv("OUTBOUND_QUEUE_SIZE", "64"))
+        self._queue_policy = queue_policy or os.getenv("OUTBOUND_QUEUE_POLICY", "coalesce")
+        self._closing: set[asyncio.Task[None]] = set()
 
     # ------------------------------------------------------------------
     # Room helpers
@@ -50,48 +167,201 @@ class RoomManager:
         room_code = room_code.upper()
         if room_code not in self._rooms:
             self._rooms[room_code] = Room(code=room_code)
+            self._removed.discard(room_code)
         return self._rooms[room_code]
 
+    @property
+    def room_count(self) -> int:
+        return len(self._rooms)
+
     def get_room(self, room_code: str) -> Optional[Room]:
         return self._rooms.get(room_code.upper())
 
     def remove_room_if_empty(self, room_code: str) -> None:
         room = self.get_room(room_code)
-        if room and not room.sockets:
-            self._rooms.pop(room_code.upper(), None)
+        if room and not room.players:
+            self._rooms.pop(room.code, None)
+            self._removed.add(room.code)
+            self._snapshots.delete(room.code)
+            self.mark_dirty(room.code)
+            print(f"Room {room.code} closed after {room.frames_sent} frames, {room.bytes_sent} bytes sent")
+
+    async def load_room(self, room_code: str) -> Room:
+        """Return the local room, restoring it from the shared store if another node saved it.
+
+        A room closed here is never restored, even while its delete is
+        still on the way to the store. Restored players have no socket yet,
+        so the restore handler gets the room to start their grace periods.
+        """
+
+        room_code = room_code.upper()
+        room = self._rooms.get(room_code)
+        if room is not None:
+            return room
+        state = None
+        if room_code not in self._removed:
+            try:
+                state = await self.backend.load_room(room_code)
+            except Exception as exc:  # pragma: no cover - best effort logging
+                print(f"Failed to load state for room {room_code}: {exc}")
+        # Another join may have created the room while the store was queried
+        room = self._rooms.get(room_code)
+        if room is None:
+            room = Room.from_state(state) if state and room_code not in self._removed else Room(code=room_code)
+            self._rooms[room_code] = room
+            self._removed.discard(room_code)
+            if room.players and self._restore_handler is not None:
+                self._restore_handler(room)
+        return room
+
+    def set_restore_handler(self, handler: Callable[[Room], None]) -> None:
+        """Called with each room :meth:`load_room` rebuilds from the shared store."""
+
+        self._restore_handler = handler
+
+    # ------------------------------------------------------------------
+    # Shared state
+    # ------------------------------------------------------------------
+    def mark_dirty(self, room_code: str) -> None:
+        """Note that a room changed; changed rooms are written to the backend in batches."""
+
+        self._dirty.add(room_code.upper())
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def flush_state(self) -> None:
+        dirty, self._dirty = self._dirty, set()
+        for room_code in dirty:
+            room = self._rooms.get(room_code)
+            try:
+                if room is None:
+                    self._snapshots.delete(room_code)
+                    await self.backend.delete_room(room_code)
+                    self._removed.discard(room_code)
+                else:
+                    state = room.to_state()
+                    self._snapshots.save(room_code, state)
+                    await self.backend.save_room(room_code, state)
+            except Exception as exc:  # pragma: no cover - best effort logging
+                print(f"Failed to save state for room {room_code}: {exc}")
+
+    async def _flush_loop(self) -> None:
+        while self._dirty:
+            await asyncio.sleep(self._state_flush_interval)
+            await self.flush_state()
+
+    async def restore_rooms(self, max_age: Optional[float] = None) -> List[Room]:
+        """Load rooms snapshotted by a previous process; their players rejoin by id."""
+
+        states = await asyncio.to_thread(self._snapshots.load_all, max_age)
+        restored: List[Room] = []
+        for room_code, state in states.items():
+            if room_code in self._rooms or not self.backend.owns(room_code):
+                continue
+            room = self._rooms[room_code] = Room.from_state(state)
+            restored.append(room)
+        return restored
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush_state()
+        await asyncio.to_thread(self._snapshots.close)
 
     # ------------------------------------------------------------------
     # Player helpers
     # ------------------------------------------------------------------
-    def add_player(self, room_code: str, player_id: str, name: str, ws: WebSocket) -> Player:
+    def add_player(self, room_code: str, player_id: str, name: str, ws: WebSocket, codec: Codec = JSON) -> Player:
         room = self.ensure_room(room_code)
         player = Player(id=player_id, name=name)
-        room.players.append(player)
-        room.sockets.append(ws)
-        self._socket_index[ws] = {"roomCode": room.code, "playerId": player_id}
+        room.players[player_id] = player
+        room.leaderboard.add(player_id, player.score)
+        self._attach(room, player_id, ws, codec)
         if room.host_id is None:
             room.host_id = player_id
+        self.mark_dirty(room.code)
         return player
 
+    def authenticate(self, room_code: str, player_id: str, token: str) -> Optional[Player]:
+        player = self.get_player(room_code, player_id)
+        if player is None or not token or not hmac.compare_digest(player.token, token):
+            return None
+        return player
+
+    def reattach_player(
+        self, room_code: str, player_id: str, ws: WebSocket, codec: Codec = JSON
+    ) -> Optional[Player]:
+        """Bind a new socket to an existing player, replacing any socket they still had."""
+
+        room = self.get_room(room_code)
+        player = room.players.get(player_id) if room else None
+        if player is None:
+            return None
+        previous = room.sockets.get(player_id)
+        if previous is not None and previous is not ws:
+            self._detach_socket(previous)
+            self._close_in_background(previous)
+        self._attach(room, player_id, ws, codec)
+        return player
+
+    def detach_connection(self, ws: WebSocket) -> Optional[Dict[str, str]]:
+        """Forget a socket but keep its player so they can resume."""
+
+        meta = self._detach_socket(ws)
+        if meta:
+            room = self.get_room(meta["roomCode"])
+            if room and room.sockets.get(meta["playerId"]) is ws:
+                del room.sockets[meta["playerId"]]
+        return meta
+
+    def _attach(self, room: Room, player_id: str, ws: WebSocket, codec: Codec = JSON) -> None:
+        room.sockets[player_id] = ws
+        self._socket_index[ws] = {"roomCode": room.code, "playerId": player_id}
+        writer = ConnectionWriter(
+            ws,
+            self._evict,
+            max_size=self._queue_size,
+            policy=self._queue_policy,
+            send_timeout=self.SEND_TIMEOUT,
+            codec=codec,
+        )
+        self._writers[ws] = writer
+        writer.start()
+
+    def _detach_socket(self, ws: WebSocket) -> Optional[Dict[str, str]]:
+        writer = self._writers.pop(ws, None)
+        if writer:
+            writer.close()
+        return self._socket_index.pop(ws, None)
+
     def remove_connection(self, ws: WebSocket) -> Optional[Dict[str, Any]]:
-        meta = self._socket_index.pop(ws, None)
+        meta = self.detach_connection(ws)
         if not meta:
             return None
+        return self.remove_player(meta["roomCode"], meta["playerId"])
 
-        room_code = meta["roomCode"]
-        player_id = meta["playerId"]
+    def remove_player(self, room_code: str, player_id: str) -> Optional[Dict[str, Any]]:
         room = self.get_room(room_code)
-        if not room:
+        if not room or player_id not in room.players:
             return None
 
-        room.sockets = [s for s in room.sockets if s is not ws]
-        room.players = [p for p in room.players if p.id != player_id]
+        ws = room.sockets.pop(player_id, None)
+        if ws is not None:
+            self._detach_socket(ws)
+        del room.players[player_id]
+        room.leaderboard.remove(player_id)
 
         host_changed = False
         if room.host_id == player_id:
-            room.host_id = room.players[0].id if room.players else None
+            # Prefer someone who is connected right now
+            room.host_id = next(
+                (pid for pid in room.players if pid in room.sockets),
+                next(iter(room.players), None),
+            )
             host_changed = True
 
+        self.mark_dirty(room_code)
         self.remove_room_if_empty(room_code)
         return {
             "roomCode": room_code,
@@ -103,10 +373,7 @@ class RoomManager:
         room = self.get_room(room_code)
         if not room:
             return None
-        for player in room.players:
-            if player.id == player_id:
-                return player
-        return None
+        return room.players.get(player_id)
 
     # ------------------------------------------------------------------
     # Socket helpers
@@ -114,24 +381,23 @@ class RoomManager:
     def get_socket_meta(self, ws: WebSocket) -> Optional[Dict[str, str]]:
         return self._socket_index.get(ws)
 
+    def codec_for(self, ws: WebSocket) -> Codec:
+        writer = self._writers.get(ws)
+        return writer.codec if writer else JSON
+
     def get_socket_for_player(self, room_code: str, player_id: str) -> Optional[WebSocket]:
         room = self.get_room(room_code)
         if not room:
             return None
-        for ws in room.sockets:
-            meta = self._socket_index.get(ws)
-            if meta and meta.get("playerId") == player_id:
-                return ws
-        return None
+        return room.sockets.get(player_id)
 
     def iter_sockets(self, room_code: str, *, exclude_players: Optional[Iterable[str]] = None) -> Iterable[WebSocket]:
         room = self.get_room(room_code)
         if not room:
             return []
         exclude = set(exclude_players or [])
-        for ws in list(room.sockets):
-            meta = self._socket_index.get(ws)
-            if meta and meta.get("playerId") in exclude:
+        for player_id, ws in list(room.sockets.items()):
+            if player_id in exclude:
                 continue
             yield ws
 
@@ -139,33 +405,127 @@ class RoomManager:
         room = self.get_room(room_code)
         if not room:
             return
-        dead: List[WebSocket] = []
-        for ws in self.iter_sockets(room_code, exclude_players=exclude_players):
-            try:
-                await ws.send_text(json.dumps(message))
-            except Exception:
-                dead.append(ws)
-        for ws in dead:
-            self.remove_connection(ws)
+        exclude = frozenset(exclude_players or ())
+        frame = self._record(room, message, exclude=exclude)
+        for ws in self.iter_sockets(room_code, exclude_players=exclude):
+            self._enqueue(ws, frame)
 
     async def send_to_player(self, room_code: str, player_id: str, message: Dict[str, Any]) -> None:
-        ws = self.get_socket_for_player(room_code, player_id)
-        if not ws:
+        """Send a room event to one player; it is logged so a resuming player still gets it."""
+
+        room = self.get_room(room_code)
+        if not room or player_id not in room.players:
             return
+        frame = self._record(room, message, only=player_id)
+        ws = room.sockets.get(player_id)
+        if ws:
+            self._enqueue(ws, frame)
+
+    def _record(
+        self,
+        room: Room,
+        message: Dict[str, Any],
+        *,
+        exclude: FrozenSet[str] = frozenset(),
+        only: Optional[str] = None,
+    ) -> OutboundFrame:
+        room.seq += 1
+        frame = OutboundFrame({**message, "seq": room.seq})
+        room.events.append(RoomEvent(room.seq, frame, exclude, only))
+        return frame
+
+    def covers(self, room_code: str, last_seq: int) -> bool:
+        """Whether the event log still holds everything after ``last_seq``."""
+
+        room = self.get_room(room_code)
+        if not room or last_seq < 0 or last_seq > room.seq:
+            return False
+        return last_seq == room.seq or (bool(room.events) and room.events[0].seq <= last_seq + 1)
+
+    def replay(self, room_code: str, player_id: str, ws: WebSocket, last_seq: int) -> int:
+        """Re-send the logged events ``player_id`` missed after ``last_seq``; check :meth:`covers` first."""
+
+        room = self.get_room(room_code)
+        if not room:
+            return 0
+        replayed = 0
+        for event in room.events:
+            if event.seq > last_seq and event.visible_to(player_id):
+                self._enqueue(ws, event.frame)
+                replayed += 1
+        return replayed
+
+    async def send_to_socket(self, ws: WebSocket, message: Dict[str, Any]) -> None:
+        """Queue a message for one registered socket, preserving send order."""
+
+        self._enqueue(ws, OutboundFrame(message))
+
+    def _enqueue(self, ws: WebSocket, frame: OutboundFrame) -> None:
+        writer = self._writers.get(ws)
+        if writer:
+            writer.enqueue(frame)
+            meta = self._socket_index.get(ws)
+            room = self._rooms.get(meta["roomCode"]) if meta else None
+            if room:
+                room.frames_sent += 1
+                room.bytes_sent += frame.size(writer.codec)
+
+    def traffic(self, room_code: str) -> Dict[str, int]:
+        """Frames and bytes queued to the room's sockets since it was created."""
+
+        room = self.get_room(room_code)
+        if not room:
+            return {"frames": 0, "bytes": 0}
+        return {"frames": room.frames_sent, "bytes": room.bytes_sent}
+
+    def queue_depths(self, room_code: str) -> Dict[str, Dict[str, int]]:
+        """Outbound backlog per player, for spotting slow consumers."""
+
+        room = self.get_room(room_code)
+        if not room:
+            return {}
+        depths: Dict[str, Dict[str, int]] = {}
+        for player_id, ws in room.sockets.items():
+            writer = self._writers.get(ws)
+            if writer:
+                depths[player_id] = {"depth": writer.depth, "dropped": writer.dropped}
+        return depths
+
+    def _evict(self, ws: WebSocket) -> None:
+        """Drop a socket that failed or stalled, closing it in the background."""
+
+        # The session's own disconnect handling decides whether the player stays
+        if self.detach_connection(ws) is None:
+            return
+        self._close_in_background(ws)
+
+    def _close_in_background(self, ws: WebSocket) -> None:
+        task = asyncio.create_task(self._close_quietly(ws))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close_quietly(self, ws: WebSocket) -> None:
         try:
-            await ws.send_text(json.dumps(message))
+            await asyncio.wait_for(ws.close(code=1011), self.SEND_TIMEOUT)
         except Exception:
-            self.remove_connection(ws)
+            pass
 
     # ------------------------------------------------------------------
     # Derived data
     # ------------------------------------------------------------------
     def build_room_state_payload(self, room_code: str) -> Dict[str, Any]:
+        """Full snapshot for a client that is new or lost track of the room.
+
+        ``version`` is the sequence number of the last room event it
+        reflects; later ``player_joined``/``player_left``/``host_changed``
+        deltas apply on top of it.
+        """
+
         room = self.get_room(room_code)
         if not room:
             return {
                 "type": "room_state",
-                "payload": {"roomCode": room_code, "players": [], "hostId": None, "selectedMode": ""},
+                "payload": {"roomCode": room_code, "players": [], "hostId": None, "selectedMode": "", "version": 0},
             }
 
         return {
@@ -173,13 +533,42 @@ class RoomManager:
             "payload": {
                 "roomCode": room.code,
                 "hostId": room.host_id,
-                "players": [
-                    {"id": player.id, "name": player.name, "isHost": player.id == room.host_id}
-                    for player in room.players
-                ],
+                "players": [self._player_entry(room, player) for player in room.players.values()],
                 "selectedMode": room.selected_mode,
+                "version": room.seq,
             },
         }
 
+    @staticmethod
+    def _player_entry(room: Room, player: Player) -> Dict[str, Any]:
+        return {"id": player.id, "name": player.name, "isHost": player.id == room.host_id}
+
+    # ------------------------------------------------------------------
+    # Room state deltas
+    # ------------------------------------------------------------------
+    async def announce_join(self, room_code: str, player_id: str) -> None:
+        """Tell everyone else about a new player; the newcomer gets a snapshot instead."""
+
+        room = self.get_room(room_code)
+        player = room.players.get(player_id) if room else None
+        if player is None:
+            return
+        await self.broadcast(
+            room_code,
+            {"type": "player_joined", "payload": {"player": self._player_entry(room, player)}},
+            exclude_players=[player_id],
+        )
+
+    async def announce_departure(self, departure: Dict[str, Any]) -> None:
+        """Broadcast the deltas for a :meth:`remove_player` result."""
+
+        room_code = departure["roomCode"]
+        room = self.get_room(room_code)
+        if not room:
+            return
+        await self.broadcast(room_code, {"type": "player_left", "payload": {"playerId": departure["playerId"]}})
+        if departure["hostChanged"]:
+            await self.broadcast(room_code, {"type": "host_changed", "payload": {"hostId": room.host_id}})
+
 
 __all__ = ["RoomManager", "Room", "Player"]
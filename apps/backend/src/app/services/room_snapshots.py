@@ -0,0 +1,133 @@
+"""Durable room snapshots so a restart does not end every game."""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+ROOM_SNAPSHOT_PATH = os.getenv("ROOM_SNAPSHOT_PATH", ".room-snapshots.sqlite3")
+
+# Queue item: (room code, state) to upsert, or (room code, None) to delete
+_Write = Tuple[str, Optional[Dict[str, Any]]]
+_STOP = object()
+
+
+class RoomSnapshotStore:
+    """SQLite copy of every live room, written by a dedicated thread.
+
+    :meth:`save` and :meth:`delete` only enqueue, so the event loop never
+    waits on encoding or disk I/O. The writer drains whatever has queued up
+    and commits it in one transaction, keeping the latest state per room.
+    """
+
+    def __init__(self, path: str = ROOM_SNAPSHOT_PATH) -> None:
+        self._path = path
+        self._queue: "queue.Queue[object]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS room_snapshots ("
+            " code TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " saved_at REAL NOT NULL)"
+        )
+        conn.commit()
+        return conn
+
+    # ------------------------------------------------------------------
+    # Loop-facing API
+    # ------------------------------------------------------------------
+    def save(self, room_code: str, state: Dict[str, Any]) -> None:
+        self._ensure_writer()
+        self._queue.put((room_code, state))
+
+    def delete(self, room_code: str) -> None:
+        self._ensure_writer()
+        self._queue.put((room_code, None))
+
+    def load_all(self, max_age: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Every stored room, skipping snapshots older than ``max_age`` seconds. Blocking."""
+
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT code, state, saved_at FROM room_snapshots").fetchall()
+        finally:
+            conn.close()
+        cutoff = time.time() - max_age if max_age is not None else None
+        return {
+            code: json.loads(state)
+            for code, state, saved_at in rows
+            if cutoff is None or saved_at >= cutoff
+        }
+
+    def close(self) -> None:
+        """Flush queued writes and stop the writer. Blocking."""
+
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="room-snapshots", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                pending: Dict[str, Optional[Dict[str, Any]]] = {}
+                stop = False
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    else:
+                        room_code, state = item  # type: ignore[misc]
+                        pending[room_code] = state
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                self._write(conn, pending)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, pending: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        if not pending:
+            return
+        now = time.time()
+        upserts = [(code, json.dumps(state), now) for code, state in pending.items() if state is not None]
+        deletes = [(code,) for code, state in pending.items() if state is None]
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO room_snapshots (code, state, saved_at) VALUES (?, ?, ?)",
+                    upserts,
+                )
+                conn.executemany("DELETE FROM room_snapshots WHERE code = ?", deletes)
+        except sqlite3.Error as exc:  # pragma: no cover - best effort logging
+            print(f"Room snapshot write failed: {exc}")
+
+
+room_snapshots = RoomSnapshotStore()
+
+
+__all__ = ["ROOM_SNAPSHOT_PATH", "RoomSnapshotStore", "room_snapshots"]
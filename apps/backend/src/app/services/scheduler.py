@@ -0,0 +1,157 @@
+"""Single-task deadline scheduler for round timers."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+# Deadlines are keyed by (room code, round number); other per-room timers
+# use a tagged second element such as ("grace", player_id)
+DeadlineKey = Tuple[str, Hashable]
+DeadlineCallback = Callable[[], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class _Deadline:
+    when: float
+    sequence: int
+    callback: DeadlineCallback
+
+
+class RoundScheduler:
+    """Owns every room deadline on one heap, driven by a single loop task.
+
+    Scheduling a key that already has a deadline replaces it, so a round can
+    be rescheduled or cancelled without leaving a stray sleeping task behind.
+    Callbacks run in their own short-lived tasks so a slow one never delays
+    other rooms' deadlines.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, DeadlineKey]] = []
+        self._deadlines: Dict[DeadlineKey, _Deadline] = {}
+        self._rounds_by_room: Dict[str, Set[Hashable]] = {}
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._running: Set[asyncio.Task[None]] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._deadlines)
+
+    def pending_for(self, room_code: str) -> int:
+        return len(self._rounds_by_room.get(room_code, ()))
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+    def schedule(self, key: DeadlineKey, delay: float, callback: DeadlineCallback) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = _Deadline(loop.time() + delay, next(self._sequence), callback)
+        self._deadlines[key] = deadline
+        self._rounds_by_room.setdefault(key[0], set()).add(key[1])
+        heapq.heappush(self._heap, (deadline.when, deadline.sequence, key))
+        self._compact()
+        self._ensure_running()
+        self._wakeup.set()
+
+    def reschedule(self, key: DeadlineKey, delay: float) -> bool:
+        deadline = self._deadlines.get(key)
+        if deadline is None:
+            return False
+        self.schedule(key, delay, deadline.callback)
+        return True
+
+    def cancel(self, key: DeadlineKey) -> bool:
+        if self._deadlines.pop(key, None) is None:
+            return False
+        rounds = self._rounds_by_room.get(key[0])
+        if rounds is not None:
+            rounds.discard(key[1])
+            if not rounds:
+                del self._rounds_by_room[key[0]]
+        return True
+
+    def cancel_room(self, room_code: str) -> int:
+        rounds = self._rounds_by_room.pop(room_code, set())
+        for round_number in rounds:
+            self._deadlines.pop((room_code, round_number), None)
+        return len(rounds)
+
+    async def close(self) -> None:
+        self._deadlines.clear()
+        self._rounds_by_room.clear()
+        self._heap.clear()
+        for task in [self._task, *self._running]:
+            if task is not None:
+                task.cancel()
+        self._task = None
+        self._wakeup = None
+
+    # ------------------------------------------------------------------
+    # Loop
+    # ------------------------------------------------------------------
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def _compact(self) -> None:
+        # Cancelled entries stay in the heap until popped; rebuild if they pile up
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [
+                (deadline.when, deadline.sequence, key)
+                for key, deadline in self._deadlines.items()
+            ]
+            heapq.heapify(self._heap)
+
+    def _is_live(self, entry: Tuple[float, int, DeadlineKey]) -> bool:
+        deadline = self._deadlines.get(entry[2])
+        return deadline is not None and deadline.sequence == entry[1]
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            while self._heap and not self._is_live(self._heap[0]):
+                heapq.heappop(self._heap)
+
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            when, _, key = self._heap[0]
+            if when <= loop.time():
+                heapq.heappop(self._heap)
+                deadline = self._deadlines[key]
+                self.cancel(key)
+                self._fire(key, deadline.callback)
+                continue
+
+            self._wakeup.clear()
+            timer = loop.call_at(when, self._wakeup.set)
+            try:
+                await self._wakeup.wait()
+            finally:
+                timer.cancel()
+
+    def _fire(self, key: DeadlineKey, callback: DeadlineCallback) -> None:
+        task = asyncio.create_task(self._invoke(key, callback))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _invoke(self, key: DeadlineKey, callback: DeadlineCallback) -> None:
+        try:
+            await callback()
+        except Exception as exc:  # pragma: no cover - best effort logging
+            print(f"Deadline {key} failed: {exc}")
+
+
+round_scheduler = RoundScheduler()
+
+
+__all__ = ["DeadlineKey", "RoundScheduler", "round_scheduler"]
@@ -0,0 +1,140 @@
+"""Shared per-playlist song pools and per-room draw cursors."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from ..catalog_replica import CatalogReplica, catalog_replica
+from ..database import AsyncDatabase
+
+
+@dataclass(frozen=True)
+class SongPool:
+    """Immutable snapshot of the songs linked to one playlist."""
+
+    playlist_id: Any
+    songs: Tuple[Dict[str, Any], ...]
+    loaded_at: float
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+
+class SongCursor:
+    """Shuffled draw-without-replacement over a :class:`SongPool`.
+
+    The permutation is built once per pool, so each draw is O(1) and needs no
+    I/O. When the shared pool is refreshed the cursor is rebased onto it,
+    keeping the set of songs the room has already heard.
+    """
+
+    def __init__(
+        self,
+        pool: SongPool,
+        played: Optional[Iterable[int]] = None,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self._rng = rng or random.Random()
+        self.played: set[int] = {int(song_id) for song_id in played or ()}
+        self.pool = pool
+        self._order: List[int] = []
+        self._position = 0
+        self._shuffle()
+
+    @classmethod
+    def resume(cls, playlist_id: Any, played: Iterable[int]) -> "SongCursor":
+        """Rebuild a cursor from saved state; it rebases onto the pool at the next draw."""
+
+        return cls(SongPool(playlist_id=playlist_id, songs=(), loaded_at=0.0), played)
+
+    @property
+    def playlist_id(self) -> Any:
+        return self.pool.playlist_id
+
+    @property
+    def remaining(self) -> int:
+        return len(self._order) - self._position
+
+    def _shuffle(self) -> None:
+        self._order = [
+            index
+            for index, song in enumerate(self.pool.songs)
+            if int(song["id"]) not in self.played
+        ]
+        self._rng.shuffle(self._order)
+        self._position = 0
+
+    def rebase(self, pool: SongPool) -> None:
+        """Switch to a refreshed pool without replaying songs already drawn."""
+
+        if pool is self.pool:
+            return
+        self.pool = pool
+        self._shuffle()
+
+    def draw(self) -> Optional[Dict[str, Any]]:
+        while self._position < len(self._order):
+            song = self.pool.songs[self._order[self._position]]
+            self._position += 1
+            song_id = int(song["id"])
+            if song_id in self.played:
+                continue
+            self.played.add(song_id)
+            return song
+        return None
+
+
+class SongPoolCache:
+    """Process-wide cache of playlist song pools with TTL-based refresh."""
+
+    DEFAULT_TTL = 300.0
+
+    def __init__(
+        self, database: Optional[Union[AsyncDatabase, CatalogReplica]] = None, *, ttl: float = DEFAULT_TTL
+    ) -> None:
+        self._db = database or catalog_replica
+        self._ttl = ttl
+        self._pools: Dict[Any, SongPool] = {}
+        self._locks: Dict[Any, asyncio.Lock] = {}
+
+    async def get(self, playlist_id: Any) -> Optional[SongPool]:
+        pool = self._pools.get(playlist_id)
+        if pool and time.monotonic() - pool.loaded_at < self._ttl:
+            return pool
+
+        lock = self._locks.setdefault(playlist_id, asyncio.Lock())
+        async with lock:
+            pool = self._pools.get(playlist_id)
+            if pool and time.monotonic() - pool.loaded_at < self._ttl:
+                return pool
+            try:
+                songs = await self._db.get_playlist_songs(playlist_id)
+            except Exception as exc:
+                if pool is None:
+                    raise
+                # Keep serving the stale pool rather than failing the round
+                print(f"Song pool refresh failed for playlist {playlist_id}: {exc}")
+                return pool
+            pool = SongPool(
+                playlist_id=playlist_id,
+                songs=tuple(song for song in songs if song),
+                loaded_at=time.monotonic(),
+            )
+            self._pools[playlist_id] = pool
+            return pool
+
+    def invalidate(self, playlist_id: Any = None) -> None:
+        if playlist_id is None:
+            self._pools.clear()
+        else:
+            self._pools.pop(playlist_id, None)
+
+
+song_pool_cache = SongPoolCache()
+
+
+__all__ = ["SongPool", "SongCursor", "SongPoolCache", "song_pool_cache"]
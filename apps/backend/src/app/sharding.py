@@ -0,0 +1,28 @@
+"""Room-code sharding shared by the cluster backends and the front router."""
+
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Sequence
+
+
+def shard_for(room_code: str, nodes: Sequence[str]) -> str:
+    """The node that owns ``room_code``; every process must compute the same answer."""
+
+    return nodes[zlib.crc32(room_code.upper().encode()) % len(nodes)]
+
+
+def room_code_from_join(raw: str) -> str:
+    """Room code named by a raw ``join`` or ``resume`` frame, or an empty string if there is none."""
+
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return ""
+    if not isinstance(message, dict) or not isinstance(message.get("payload"), dict):
+        return ""
+    return str(message["payload"].get("roomCode", "")).upper()
+
+
+__all__ = ["room_code_from_join", "shard_for"]
@@ -0,0 +1,22 @@
+"""Shared test setup: import the app from ``src`` without real services."""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+# Module-level clients read these at import time; nothing is contacted
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test-key")
+
+# Keep the local SQLite stores out of the working tree
+_STATE_DIR = tempfile.mkdtemp(prefix="tempotrivia-tests-")
+for name, filename in (
+    ("ROOM_SNAPSHOT_PATH", "room-snapshots.sqlite3"),
+    ("INGEST_STATE_PATH", "ingest.sqlite3"),
+    ("CATALOG_REPLICA_PATH", "catalog.sqlite3"),
+    ("ARTIST_IMAGE_CACHE_PATH", "artist-images.sqlite3"),
+):
+    os.environ.setdefault(name, os.path.join(_STATE_DIR, filename))
@@ -0,0 +1,284 @@
+import json
+import re
+import threading
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app import add_songs, database
+from app.add_songs import RateLimiter, TrackOut, _upsert_and_link, ingest_spotify_playlist
+from app.ingest_state import MISSING, IngestCheckpoints, ResolutionCache
+
+PLAYLIST = "spotify-playlist"
+TRACKS = 250  # three Spotify pages: 100, 100 and 50
+
+
+class FakeSpotify:
+    def __init__(self, tracks=TRACKS):
+        self.tracks = tracks
+        self.offsets = []
+
+    def playlist_items(self, playlist_id, *, limit, offset, additional_types, fields):
+        self.offsets.append(offset)
+        end = min(offset + limit, self.tracks)
+        items = [
+            {"track": {"type": "track", "name": f"Song {i}", "artists": [{"name": f"Artist {i}", "id": ""}]}}
+            for i in range(offset, end)
+        ]
+        return {"items": items, "next": "more" if end < self.tracks else None}
+
+
+class FakeDeezer:
+    """Every tenth song has no match; counts searches per query."""
+
+    searches = []
+
+    def search(self, query):
+        FakeDeezer.searches.append(query)
+        number = int(query.split()[1])
+        if number % 10 == 9:
+            return []
+        return [SimpleNamespace(title=f"Song {number}", artist=SimpleNamespace(name=f"Artist {number}"), id=1000 + number, preview="")]
+
+
+class FakeDatabase:
+    """Songs unique on deezer_track_id and links unique per playlist, as in Supabase."""
+
+    def __init__(self):
+        self.songs = {}
+        self.links = set()
+        self.upserts = 0
+        self.fail_on_upsert = None
+
+    def get_all_playlists(self):
+        return [{"id": 7, "name": "Normal Mode"}]
+
+    def create_playlist(self, **_):
+        raise AssertionError("the playlist exists")
+
+    def upsert_songs(self, rows):
+        self.upserts += 1
+        if self.upserts == self.fail_on_upsert:
+            raise RuntimeError("Supabase is down")
+        created = []
+        for row in rows:
+            if row["deezer_track_id"] not in self.songs:
+                song = self.songs[row["deezer_track_id"]] = {**row, "id": len(self.songs) + 1}
+                created.append(song)
+        return created
+
+    def get_songs_by_deezer_ids(self, ids):
+        return [self.songs[i] for i in ids if i in self.songs]
+
+    def get_songs_by_titles(self, titles):
+        return [song for song in self.songs.values() if song["title"] in titles]
+
+    def add_songs_to_playlist(self, playlist_id, song_ids):
+        created = [(playlist_id, song_id) for song_id in song_ids if (playlist_id, song_id) not in self.links]
+        self.links.update(created)
+        return created
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    db = FakeDatabase()
+    FakeDeezer.searches = []
+    monkeypatch.setattr(add_songs, "Database", db)
+    monkeypatch.setattr(add_songs.deezer, "Client", FakeDeezer)
+    monkeypatch.setattr(add_songs, "deezer_limiter", RateLimiter(0))
+    monkeypatch.setattr(add_songs, "spotify_limiter", RateLimiter(0))
+    monkeypatch.setattr(add_songs, "resolution_cache", ResolutionCache(str(tmp_path / "ingest.sqlite3")))
+    monkeypatch.setattr(add_songs, "ingest_checkpoints", IngestCheckpoints(str(tmp_path / "ingest.sqlite3")))
+    return db
+
+
+def _ingest(spotify, **kwargs):
+    return ingest_spotify_playlist(PLAYLIST, "Normal Mode", spotify=spotify, workers=4, batch_size=10, **kwargs)
+
+
+def test_failed_import_resumes_from_its_checkpoint(db):
+    db.fail_on_upsert = 12
+    with pytest.raises(RuntimeError, match="Supabase is down"):
+        _ingest(FakeSpotify())
+
+    offset, counts = add_songs.ingest_checkpoints.load(PLAYLIST, 7)
+    # Only whole pages count as done, and the failing batch was in the second one
+    assert offset in (0, 100)
+    assert counts["total_seen"] == offset
+    assert counts["unmatched"] == offset // 10
+    searched = len(FakeDeezer.searches)
+
+    spotify = FakeSpotify()
+    summary = _ingest(spotify)
+
+    assert spotify.offsets[0] == offset
+    assert summary == {
+        "target_playlist_id": 7,
+        "spotify_playlist_id": PLAYLIST,
+        "total_seen": TRACKS,
+        "added_new_songs": 225,
+        "linked_to_playlist": 225,
+        "unmatched_on_deezer": 25,
+    }
+    assert len(db.songs) == len(db.links) == 225
+    # Matches and misses from the first run came from the resolution cache
+    assert len(FakeDeezer.searches) == len(set(FakeDeezer.searches)) == TRACKS
+    assert searched > 0
+    assert add_songs.ingest_checkpoints.load(PLAYLIST, 7) == (0, {})
+
+
+def test_rerun_of_a_finished_import_searches_nothing(db):
+    _ingest(FakeSpotify())
+    searched = len(FakeDeezer.searches)
+
+    summary = _ingest(FakeSpotify())
+
+    assert len(FakeDeezer.searches) == searched == TRACKS
+    assert summary["added_new_songs"] == 0
+    assert summary["linked_to_playlist"] == 0
+    assert summary["unmatched_on_deezer"] == 25
+
+
+def test_negative_resolutions_expire(tmp_path):
+    cache = ResolutionCache(str(tmp_path / "ingest.sqlite3"), negative_ttl=60)
+    cache.put("Song", "Artist", None)
+    assert cache.get("song", " ARTIST ") is None
+
+    expired = ResolutionCache(str(tmp_path / "ingest.sqlite3"), negative_ttl=0)
+    assert expired.get("Song", "Artist") is MISSING
+
+
+def test_resolvers_run_in_parallel_and_the_writer_drains_the_last_batch(db, monkeypatch):
+    barrier = threading.Barrier(4, timeout=5)
+    searched = []
+    search = FakeDeezer.search
+
+    def search_together(self, query):
+        searched.append(query)
+        # The first four searches only get past here if they run at once
+        if len(searched) <= 4:
+            barrier.wait()
+        return search(self, query)
+
+    writers, sizes = set(), []
+    upsert = db.upsert_songs
+
+    def record_upsert(rows):
+        writers.add(threading.current_thread().name)
+        sizes.append(len(rows))
+        return upsert(rows)
+
+    monkeypatch.setattr(FakeDeezer, "search", search_together)
+    monkeypatch.setattr(db, "upsert_songs", record_upsert)
+    summary = ingest_spotify_playlist(PLAYLIST, "Normal Mode", spotify=FakeSpotify(), workers=4, batch_size=100)
+
+    assert summary["added_new_songs"] == 225
+    assert writers == {"ingest-writer"}
+    # The final 25 songs fill no batch and are stored once the Spotify pages run out
+    assert sorted(sizes) == [25, 100, 100]
+
+
+def test_resolver_error_stops_the_import(db, monkeypatch):
+    search = FakeDeezer.search
+
+    def failing_search(self, query):
+        if query.startswith("Song 42 "):
+            raise RuntimeError("Deezer is down")
+        return search(self, query)
+
+    monkeypatch.setattr(FakeDeezer, "search", failing_search)
+    with pytest.raises(RuntimeError, match="Deezer is down"):
+        _ingest(FakeSpotify())
+
+    # Song 42 never finished, so its page is not done
+    assert add_songs.ingest_checkpoints.load(PLAYLIST, 7)[0] == 0
+
+
+def test_store_failure_does_not_stall_the_resolvers(db):
+    db.fail_on_upsert = 1
+    errors = []
+
+    def run():
+        try:
+            ingest_spotify_playlist(PLAYLIST, "Normal Mode", spotify=FakeSpotify(), workers=4, batch_size=2)
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    # The resolved queue holds four tracks; without draining it the resolvers would block forever
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+
+    assert not thread.is_alive()
+    assert [str(exc) for exc in errors] == ["Supabase is down"]
+    assert db.upserts == 1
+
+
+class PostgREST:
+    """Enough of PostgREST for the bulk song helpers, with the documented constraints."""
+
+    UNIQUE = {"songs": {"deezer_track_id"}, "playlist_songs": {"playlist_id,song_id"}}
+
+    def __init__(self, songs=()):
+        self.tables = {"songs": [dict(song) for song in songs], "playlist_songs": []}
+
+    @staticmethod
+    def _in(value):
+        return [quoted or plain for quoted, plain in re.findall(r'"((?:[^"\\]|\\.)*)"|([^,]+)', value[4:-1])]
+
+    def handle(self, request):
+        table = request.url.path.rsplit("/", 1)[-1]
+        params = dict(request.url.params)
+        rows = self.tables[table]
+        if request.method == "GET":
+            filters = {column: self._in(value) for column, value in params.items() if value.startswith("in.(")}
+            found = [row for row in rows if all(str(row[column]) in values for column, values in filters.items())]
+            return httpx.Response(200, json=found)
+        conflict = params.get("on_conflict")
+        if conflict not in self.UNIQUE[table]:
+            return httpx.Response(400, json={"code": "42P10", "message": "there is no unique or exclusion constraint matching the ON CONFLICT specification"})
+        assert "resolution=ignore-duplicates" in request.headers["prefer"]
+        columns = conflict.split(",")
+        taken = {tuple(row[column] for column in columns) for row in rows}
+        created = []
+        for row in json.loads(request.content):
+            key = tuple(row[column] for column in columns)
+            if key not in taken:
+                taken.add(key)
+                created.append({**row, "id": len(rows) + 1})
+                rows.append(created[-1])
+        return httpx.Response(201, json=created)
+
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    server = PostgREST(songs=[{"id": 1, "title": "Song 1", "artist": "ARTIST 1", "deezer_track_id": None}])
+    session = httpx.Client(base_url=database.supabase.postgrest.session.base_url, transport=httpx.MockTransport(server.handle))
+    monkeypatch.setattr(database.supabase.postgrest, "session", session)
+    return server
+
+
+def test_upsert_and_link_stores_each_song_once(postgrest):
+    tracks = [TrackOut(f"Song {i}", f"Artist {i}", str(1000 + i), "", {"title": [f"song {i}"]}) for i in range(1, 6)]
+    # A repeat within the batch and a title that needs quoting in the in.() filter
+    tracks += [tracks[0], TrackOut("Hello (Live, 2009)", "Adele", "2000", "")]
+
+    assert _upsert_and_link(tracks, 7) == (5, 6)
+    assert _upsert_and_link(tracks, 7) == (0, 0)
+    assert _upsert_and_link(tracks, 8) == (0, 6)
+
+    songs = postgrest.tables["songs"]
+    # The row stored before deezer_track_id was filled in is linked, not copied
+    assert len(songs) == 6
+    assert [song["deezer_track_id"] for song in songs if song["title"] == "Song 1"] == [None]
+    assert {(link["playlist_id"], link["song_id"]) for link in postgrest.tables["playlist_songs"]} == {
+        (playlist, song["id"]) for playlist in (7, 8) for song in songs
+    }
+
+
+def test_upsert_without_the_unique_constraint_fails(postgrest, monkeypatch):
+    monkeypatch.setattr(PostgREST, "UNIQUE", {"songs": set(), "playlist_songs": set()})
+
+    with pytest.raises(Exception, match="ON CONFLICT"):
+        _upsert_and_link([TrackOut("Song 9", "Artist 9", "1009", "")], 7)
@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+from app.services.answer_batcher import AnswerBatcher, PendingAnswer
+from app.services.cluster import InProcessBackend
+from app.services.game_service import GameService
+from app.services.message_handlers import HANDLERS, MessageContext
+from app.services.room_manager import RoomManager
+from app.services.room_snapshots import RoomSnapshotStore
+from app.services.scheduler import RoundScheduler
+
+ROOM = "ROOM01"
+WINDOW = 0.1
+
+
+def _answer(player_id, round_number=1):
+    return PendingAnswer(player_id=player_id, artist="a", title="t", received_at=0.0, round_number=round_number)
+
+
+def _batcher():
+    flushed = []
+
+    async def flush(room_code, answers):
+        flushed.append((room_code, [answer.player_id for answer in answers]))
+
+    return AnswerBatcher(WINDOW, flush), flushed
+
+
+def test_a_burst_is_flushed_once_when_the_window_closes():
+    async def main():
+        batcher, flushed = _batcher()
+        batcher.submit(ROOM, _answer("p1"))
+        await asyncio.sleep(WINDOW / 2)
+        batcher.submit(ROOM, _answer("p2"))
+        assert flushed == []
+
+        # The window opened with p1, so p2 does not push the flush back
+        await asyncio.sleep(WINDOW / 2 + 0.02)
+        assert flushed == [(ROOM, ["p1", "p2"])]
+
+        batcher.submit(ROOM, _answer("p3"))
+        await asyncio.sleep(WINDOW + 0.02)
+        assert flushed == [(ROOM, ["p1", "p2"]), (ROOM, ["p3"])]
+
+    asyncio.run(main())
+
+
+def test_rooms_have_their_own_windows():
+    async def main():
+        batcher, flushed = _batcher()
+        batcher.submit("ROOM01", _answer("p1"))
+        batcher.submit("ROOM02", _answer("p2"))
+        await asyncio.sleep(WINDOW + 0.02)
+
+        assert sorted(flushed) == [("ROOM01", ["p1"]), ("ROOM02", ["p2"])]
+
+    asyncio.run(main())
+
+
+def test_discard_drops_pending_answers():
+    async def main():
+        batcher, flushed = _batcher()
+        batcher.submit(ROOM, _answer("p1"))
+        batcher.discard(ROOM)
+        await asyncio.sleep(WINDOW + 0.02)
+        assert flushed == []
+
+        # A later submission opens a fresh window
+        batcher.submit(ROOM, _answer("p2"))
+        await asyncio.sleep(WINDOW + 0.02)
+        assert flushed == [(ROOM, ["p2"])]
+
+    asyncio.run(main())
+
+
+def test_a_failing_flush_does_not_stop_later_batches():
+    async def main():
+        flushed = []
+
+        async def flush(room_code, answers):
+            if not flushed:
+                flushed.append(None)
+                raise RuntimeError("boom")
+            flushed.append([answer.player_id for answer in answers])
+
+        batcher = AnswerBatcher(WINDOW, flush)
+        batcher.submit(ROOM, _answer("p1"))
+        await asyncio.sleep(WINDOW + 0.02)
+        batcher.submit(ROOM, _answer("p2"))
+        await asyncio.sleep(WINDOW + 0.02)
+
+        assert flushed == [None, ["p2"]]
+
+    asyncio.run(main())
+
+
+class RecordingSocket:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(json.loads(data))
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def test_batched_answer_without_a_round_gets_no_active_round(tmp_path):
+    async def main():
+        manager = RoomManager(backend=InProcessBackend(), snapshots=RoomSnapshotStore(str(tmp_path / "snapshots.sqlite3")))
+        service = GameService(manager, scheduler=RoundScheduler(), answer_batch_window=WINDOW)
+        ws = RecordingSocket()
+        manager.add_player(ROOM, "p1", "p1", ws)
+        submit = HANDLERS["submit_answer"]
+
+        # In the lobby, then for a room that has since closed
+        await submit(MessageContext(ws, "p1", ROOM, manager, service), {"artist": "a", "title": "t"})
+        await submit(MessageContext(ws, "p1", "GONE00", manager, service), {"artist": "a", "title": "t"})
+        await asyncio.sleep(WINDOW + 0.02)
+
+        errors = [message["payload"]["code"] for message in ws.sent if message["type"] == "error"]
+        assert errors == ["NO_ACTIVE_ROUND", "NO_ACTIVE_ROUND"]
+        await manager.close()
+
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import asyncio
+
+import httpx
+
+from app.catalog_replica import CatalogReplica
+from app.database import AsyncDatabase
+
+
+def _tables():
+    return {
+        "playlists": [{"id": 1, "name": "Normal Mode"}, {"id": 2, "name": "Rock"}],
+        "songs": [{"id": i, "title": f"Song {i}"} for i in range(1, 7)],
+        "playlist_songs": [
+            {"playlist_id": 1 + i % 2, "song_id": i, "created_at": f"2026-01-01T00:00:0{i}+00:00"}
+            for i in range(1, 7)
+        ],
+    }
+
+
+def _postgrest(tables, requests):
+    def handler(request: httpx.Request) -> httpx.Response:
+        table = request.url.path.rsplit("/", 1)[1]
+        params = dict(request.url.params)
+        requests.append((table, params))
+        rows = list(tables[table])
+        for column, condition in params.items():
+            if column in ("select", "order", "limit", "offset"):
+                continue
+            op, value = condition.split(".", 1)
+            if op == "gt":
+                rows = [row for row in rows if str(row[column]) > value]
+            elif op == "in":
+                wanted = value.strip("()").split(",")
+                rows = [row for row in rows if str(row[column]) in wanted]
+        offset = int(params.get("offset", 0))
+        rows = rows[offset:offset + int(params.get("limit", len(rows)))]
+        if params.get("select", "*") != "*":
+            rows = [{column: row.get(column) for column in params["select"].split(",")} for row in rows]
+        return httpx.Response(200, json=rows)
+
+    return httpx.MockTransport(handler)
+
+
+def test_incremental_sync_fetches_only_new_songs(tmp_path):
+    tables = _tables()
+    requests = []
+
+    async def main():
+        db = AsyncDatabase("http://postgrest.test", "key", transport=_postgrest(tables, requests))
+        replica = CatalogReplica(db, str(tmp_path / "catalog.sqlite3"))
+        try:
+            first = await replica.sync()
+            assert first.full
+            assert [song["id"] for song in await replica.get_playlist_songs(2)] == [1, 3, 5]
+
+            tables["songs"].append({"id": 7, "title": "Song 7"})
+            tables["playlist_songs"].append(
+                {"playlist_id": 2, "song_id": 7, "created_at": "2026-01-02T00:00:00+00:00"}
+            )
+            requests.clear()
+            changes = await replica.sync()
+            assert not changes.full
+            assert changes.playlist_ids == frozenset({2})
+            assert [params for table, params in requests if table == "songs"] == [{"select": "*", "id": "in.(7)"}]
+            assert sorted(song["id"] for song in await replica.get_playlist_songs(2)) == [1, 3, 5, 7]
+        finally:
+            await replica.close()
+            await db.aclose()
+
+    asyncio.run(main())
+
+
+def test_missing_song_ids_only_looks_up_candidates(tmp_path):
+    replica = CatalogReplica(path=str(tmp_path / "catalog.sqlite3"))
+    conn = replica._connection()
+    conn.executemany("INSERT INTO songs (id, row) VALUES (?, '{}')", [(str(i),) for i in range(2000)])
+    conn.commit()
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    candidates = {str(i) for i in range(1500, 2700)}
+    assert replica._missing_song_ids(candidates) == sorted(str(i) for i in range(2000, 2700))
+    assert statements and all("WHERE id IN" in sql for sql in statements)
+    replica._close()
@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.database import AsyncDatabase, DatabaseError
+
+ROWS = [{"id": i, "title": f"Song {i}"} for i in range(1, 6)]
+
+
+def _postgrest(requests):
+    """A PostgREST stand-in serving ``ROWS`` with limit/offset and ``in`` filters."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        params = request.url.params
+        if request.url.path.endswith("/broken"):
+            return httpx.Response(500, text="boom")
+        rows = ROWS
+        if "id" in params:
+            wanted = params["id"].removeprefix("in.(").removesuffix(")").split(",")
+            rows = [row for row in rows if str(row["id"]) in wanted]
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", len(rows)))
+        return httpx.Response(200, json=rows[offset:offset + limit])
+
+    return httpx.MockTransport(handler)
+
+
+def _run(coro_factory):
+    async def main():
+        requests = []
+        db = AsyncDatabase("http://postgrest.test", "key", transport=_postgrest(requests))
+        try:
+            return await coro_factory(db), requests
+        finally:
+            await db.aclose()
+
+    return asyncio.run(main())
+
+
+def test_select_all_pages_until_a_short_page():
+    rows, requests = _run(lambda db: db.select_all("songs", {"select": "*", "order": "id.asc"}, page_size=2))
+
+    assert rows == ROWS
+    assert [r.url.params["offset"] for r in requests] == ["0", "2", "4"]
+    assert all(r.url.params["limit"] == "2" for r in requests)
+    assert all(r.headers["apikey"] == "key" for r in requests)
+
+
+def test_select_all_stops_after_an_exact_last_page():
+    rows, requests = _run(lambda db: db.select_all("songs", {"select": "*", "order": "id.asc"}, page_size=5))
+
+    assert rows == ROWS
+    assert [r.url.params["offset"] for r in requests] == ["0", "5"]
+
+
+def test_select_in_chunks_the_values():
+    rows, requests = _run(lambda db: db.select_in("songs", "id", [1, 2, 3, 5, 9], chunk_size=2))
+
+    assert [row["id"] for row in rows] == [1, 2, 3, 5]
+    assert [r.url.params["id"] for r in requests] == ["in.(1,2)", "in.(3,5)", "in.(9)"]
+
+
+def test_select_in_without_values_makes_no_request():
+    rows, requests = _run(lambda db: db.select_in("songs", "id", []))
+
+    assert rows == [] and requests == []
+
+
+def test_errors_map_to_database_error():
+    with pytest.raises(DatabaseError) as info:
+        _run(lambda db: db.select_all("broken", {"select": "*", "order": "id.asc"}))
+
+    assert info.value.status_code == 500
+    assert info.value.detail == "boom"
+
+
+def _answer(coro_factory, body):
+    """Run one AsyncDatabase call against a stand-in that always answers ``body``."""
+
+    async def main():
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json=body)
+
+        db = AsyncDatabase("http://postgrest.test", "key", transport=httpx.MockTransport(handler))
+        try:
+            result = await coro_factory(db)
+        finally:
+            await db.aclose()
+        assert len(requests) == 1
+        return result, requests[0]
+
+    return asyncio.run(main())
+
+
+def test_get_playlist_id_matches_the_exact_name():
+    playlist_id, request = _answer(lambda db: db.get_playlist_id("Rock & Roll"), [{"id": 4}])
+
+    assert playlist_id == 4
+    assert request.method == "GET"
+    assert request.url.path == "/rest/v1/playlists"
+    assert dict(request.url.params) == {"select": "id", "name": "eq.Rock & Roll", "limit": "1"}
+
+
+def test_get_playlist_id_of_an_unknown_name_is_none():
+    playlist_id, _ = _answer(lambda db: db.get_playlist_id("Nope"), [])
+
+    assert playlist_id is None
+
+
+def test_random_song_excludes_played_ids():
+    song = {"id": 3, "title": "Song 3"}
+    result, request = _answer(lambda db: db.get_random_song_exclude_ids(7, [1, "2"]), [{"songs": song}])
+
+    assert result == song
+    assert request.url.path == "/rest/v1/playlist_songs"
+    assert dict(request.url.params) == {"select": "songs(*)", "playlist_id": "eq.7", "song_id": "not.in.(1,2)"}
+
+
+def test_random_song_without_exclusions_sends_no_song_filter():
+    result, request = _answer(lambda db: db.get_random_song_exclude_ids(7, []), [])
+
+    assert result is None
+    assert dict(request.url.params) == {"select": "songs(*)", "playlist_id": "eq.7"}
+
+
+def test_search_songs_quotes_the_pattern():
+    _, request = _answer(lambda db: db.search_songs('Hello, "World" (Live)\\'), [])
+
+    pattern = '"*Hello, \\"World\\" (Live)\\\\*"'
+    assert request.url.path == "/rest/v1/songs"
+    assert dict(request.url.params) == {"select": "*", "or": f"(title.ilike.{pattern},artist.ilike.{pattern})"}
+
+
+@pytest.mark.parametrize(
+    "call, table, body",
+    [
+        (lambda db: db.create_user("ana", "sp1"), "users", {"username": "ana", "spotify_id": "sp1"}),
+        (
+            lambda db: db.create_playlist("Mix", creator_id=2, description="d"),
+            "playlists",
+            {"name": "Mix", "creator_id": 2, "is_default": False, "description": "d"},
+        ),
+        (
+            lambda db: db.create_song("Halo", "Beyoncé", "http://p", "42"),
+            "songs",
+            {"title": "Halo", "artist": "Beyoncé", "preview_url": "http://p", "deezer_track_id": "42"},
+        ),
+        (
+            lambda db: db.create_song("Halo", "Beyoncé", "", "42", aliases={"title": ["halo"]}),
+            "songs",
+            {"title": "Halo", "artist": "Beyoncé", "preview_url": "", "deezer_track_id": "42", "aliases": {"title": ["halo"]}},
+        ),
+        (lambda db: db.add_song_to_playlist(7, 3), "playlist_songs", {"playlist_id": 7, "song_id": 3}),
+    ],
+)
+def test_create_calls_insert_one_row_and_return_it(call, table, body):
+    created, request = _answer(call, [{"id": 1, **body}])
+
+    assert created == [{"id": 1, **body}]
+    assert request.method == "POST"
+    assert request.url.path == f"/rest/v1/{table}"
+    assert not request.url.params
+    assert request.headers["prefer"] == "return=representation"
+    assert json.loads(request.content) == body
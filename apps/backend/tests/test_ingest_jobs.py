@@ -0,0 +1,41 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import ingest_jobs
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(ingest_jobs.router)
+    return TestClient(app)
+
+
+def test_api_is_closed_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(ingest_jobs, "INGEST_API_TOKEN", "")
+
+    assert client.post("/ingest/jobs", json={"spotify_playlist_id": "abc"}).status_code == 503
+    assert client.get("/ingest/jobs", headers={"Authorization": "Bearer "}).status_code == 503
+
+
+def test_requests_need_the_bearer_token(client, monkeypatch):
+    monkeypatch.setattr(ingest_jobs, "INGEST_API_TOKEN", "s3cret")
+
+    assert client.get("/ingest/jobs").status_code == 401
+    assert client.get("/ingest/jobs", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/ingest/jobs", headers={"Authorization": "Basic s3cret"}).status_code == 401
+
+
+def test_submit_and_cancel_with_the_token(client, monkeypatch):
+    monkeypatch.setattr(ingest_jobs, "INGEST_API_TOKEN", "s3cret")
+    headers = {"Authorization": "Bearer s3cret"}
+
+    submitted = client.post("/ingest/jobs", json={"spotify_playlist_id": "abc"}, headers=headers)
+    assert submitted.status_code == 202
+    job = submitted.json()
+    assert job["status"] == "queued"
+
+    cancelled = client.delete(f"/ingest/jobs/{job['id']}", headers=headers).json()
+    assert cancelled["status"] == "cancelled"
+    assert client.get("/ingest/jobs/missing", headers=headers).status_code == 404
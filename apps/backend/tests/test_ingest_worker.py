@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from app import ingest_worker
+from app.add_songs import IngestCancelled, IngestProgress, RateLimiter
+from app.ingest_state import CANCELLED, DONE, FAILED, QUEUED, RUNNING, IngestJobs, RateSlots
+from app.ingest_worker import IngestWorker
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return IngestJobs(str(tmp_path / "ingest.sqlite3"))
+
+
+@pytest.fixture
+def imports(monkeypatch):
+    """Stands in for ``ingest_spotify_playlist``; ``block`` holds imports until cancelled."""
+
+    state = {"calls": [], "block": False, "error": None}
+
+    def fake_ingest(spotify_playlist_id, target_playlist, *, on_progress, spotify, cancel):
+        state["calls"].append(spotify_playlist_id)
+        on_progress(IngestProgress(total_seen=3, resolved=2, unmatched=1))
+        if state["error"] is not None:
+            raise state["error"]
+        if state["block"]:
+            cancel.wait()
+            raise IngestCancelled(spotify_playlist_id)
+        return {"spotify_playlist_id": spotify_playlist_id, "total_seen": 3}
+
+    monkeypatch.setattr(ingest_worker, "ingest_spotify_playlist", fake_ingest)
+    monkeypatch.setattr(ingest_worker, "get_server_spotify_client", lambda: None)
+    return state
+
+
+def _start(jobs, **kwargs):
+    worker = IngestWorker(jobs, concurrency=2, poll_interval=0.01, **kwargs)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    return worker, thread
+
+
+def _stop(worker, thread):
+    worker.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_worker_claims_and_finishes_queued_jobs(jobs, imports):
+    first = jobs.submit("pl-1", "Normal Mode")
+    second = jobs.submit("pl-2", "Normal Mode")
+    worker, thread = _start(jobs)
+    _wait_for(lambda: jobs.get(first["id"])["status"] == jobs.get(second["id"])["status"] == DONE)
+    _stop(worker, thread)
+
+    job = jobs.get(first["id"])
+    assert job["summary"] == {"spotify_playlist_id": "pl-1", "total_seen": 3}
+    assert job["progress"]["unmatched"] == 1
+    assert sorted(imports["calls"]) == ["pl-1", "pl-2"]
+
+
+def test_failed_import_records_the_error(jobs, imports):
+    imports["error"] = RuntimeError("Deezer is down")
+    job = jobs.submit("pl-1", "Normal Mode")
+    worker, thread = _start(jobs)
+    _wait_for(lambda: jobs.get(job["id"])["status"] == FAILED)
+    _stop(worker, thread)
+
+    assert jobs.get(job["id"])["error"] == "RuntimeError: Deezer is down"
+
+
+def test_shutdown_requeues_running_jobs(jobs, imports):
+    imports["block"] = True
+    job = jobs.submit("pl-1", "Normal Mode")
+    worker, thread = _start(jobs)
+    _wait_for(lambda: imports["calls"])
+    assert jobs.get(job["id"])["status"] == RUNNING
+    _stop(worker, thread)
+
+    assert jobs.get(job["id"])["status"] == QUEUED
+
+
+def test_cancel_request_is_relayed_to_the_running_import(jobs, imports):
+    imports["block"] = True
+    job = jobs.submit("pl-1", "Normal Mode")
+    worker, thread = _start(jobs)
+    _wait_for(lambda: imports["calls"])
+    jobs.cancel(job["id"])
+    _wait_for(lambda: jobs.get(job["id"])["status"] == CANCELLED)
+    _stop(worker, thread)
+
+
+def test_job_left_by_a_dead_worker_is_requeued_and_run(jobs, imports):
+    job = jobs.submit("pl-1", "Normal Mode")
+    assert jobs.claim()["id"] == job["id"]
+    time.sleep(0.1)
+    worker, thread = _start(jobs, stale_after=0.05)
+    _wait_for(lambda: jobs.get(job["id"])["status"] == DONE)
+    _stop(worker, thread)
+
+    assert imports["calls"] == ["pl-1"]
+
+
+def test_rate_limit_is_shared_between_processes(tmp_path):
+    # Two stores on one file stand in for two worker processes
+    path = str(tmp_path / "ingest.sqlite3")
+    limiters = [RateLimiter(20, name="deezer", slots=RateSlots(path)) for _ in range(2)]
+    calls = []
+
+    def call(limiter):
+        for _ in range(5):
+            limiter.wait()
+            calls.append(time.time())
+
+    threads = [threading.Thread(target=call, args=(limiter,)) for limiter in limiters]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    calls.sort()
+    # Ten calls at 20/s take at least 9 intervals, whichever process made them
+    assert calls[-1] - calls[0] >= 9 * 0.05 - 0.01
@@ -0,0 +1,65 @@
+import asyncio
+
+from app.launcher import WorkerPool
+from app.services.cluster import InProcessBackend
+from app.services.room_manager import RoomManager
+from app.services.room_snapshots import RoomSnapshotStore
+
+
+class FakeSocket:
+    async def send_text(self, data: str) -> None:
+        pass
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def _codes_by_worker(pool):
+    codes = {worker_id: [] for worker_id in pool.worker_ids}
+    for index in range(40):
+        code = f"ROOM{index:02d}"
+        codes[pool.worker_for(code)].append(code)
+    return codes
+
+
+def test_workers_restore_only_their_own_rooms(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROOM_SNAPSHOT_PATH", str(tmp_path / "rooms.sqlite3"))
+    pool = WorkerPool(2)
+    paths = {worker_id: pool.worker_env(worker_id)["ROOM_SNAPSHOT_PATH"] for worker_id in pool.worker_ids}
+    assert len(set(paths.values())) == 2
+    codes = _codes_by_worker(pool)
+    assert all(codes.values())
+
+    def manager(worker_id):
+        return RoomManager(
+            backend=InProcessBackend(),
+            snapshots=RoomSnapshotStore(paths[worker_id]),
+            state_flush_interval=60,
+        )
+
+    async def main():
+        # First run: each worker hosts the rooms the front router sends it
+        for worker_id in pool.worker_ids:
+            rooms = manager(worker_id)
+            for code in codes[worker_id]:
+                rooms.add_player(code, "alice", "alice", FakeSocket())
+            await rooms.flush_state()
+            await rooms.close()
+
+        # Restart: no worker picks up a room that belongs to the other one
+        for worker_id in pool.worker_ids:
+            rooms = manager(worker_id)
+            restored = await rooms.restore_rooms()
+            assert sorted(room.code for room in restored) == sorted(codes[worker_id])
+            await rooms.close()
+
+    asyncio.run(main())
+
+
+def test_workers_keep_separate_catalog_replicas(tmp_path, monkeypatch):
+    # A shared replica would let the first worker's sync swallow the
+    # changes, so the others would never invalidate their caches
+    monkeypatch.setenv("CATALOG_REPLICA_PATH", str(tmp_path / "catalog.sqlite3"))
+    pool = WorkerPool(3)
+    paths = [pool.worker_env(worker_id)["CATALOG_REPLICA_PATH"] for worker_id in pool.worker_ids]
+    assert paths == [str(tmp_path / f"catalog.worker-{index}.sqlite3") for index in range(3)]
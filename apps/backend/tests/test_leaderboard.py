@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+from app.services.leaderboard import Leaderboard
+
+
+def _board(*scores):
+    board = Leaderboard(random.Random(0))
+    for index, score in enumerate(scores):
+        board.add(f"p{index}", score)
+    return board
+
+
+def test_add_ranks_by_score():
+    board = _board(3, 9, 5)
+
+    assert board.top() == [("p1", 9), ("p2", 5), ("p0", 3)]
+    assert [board.rank(player) for player in ("p0", "p1", "p2")] == [3, 1, 2]
+    assert len(board) == 3 and "p1" in board
+
+
+def test_ties_keep_join_order():
+    board = _board(5, 7, 5, 5)
+
+    assert board.top() == [("p1", 7), ("p0", 5), ("p2", 5), ("p3", 5)]
+    assert [board.rank(player) for player in ("p0", "p2", "p3")] == [2, 3, 4]
+
+
+def test_update_moves_a_player_but_keeps_their_join_order():
+    board = _board(5, 5, 5)
+    board.update("p2", 8)
+    assert board.top() == [("p2", 8), ("p0", 5), ("p1", 5)]
+
+    # Dropping back to a tie puts them after earlier joiners again
+    board.update("p2", 5)
+    assert board.top() == [("p0", 5), ("p1", 5), ("p2", 5)]
+    assert board.rank("p2") == 3
+
+
+def test_add_of_a_known_player_updates_and_update_of_an_unknown_one_adds():
+    board = _board(1)
+    board.add("p0", 4)
+    board.update("new", 2)
+
+    assert board.top() == [("p0", 4), ("new", 2)]
+    assert len(board) == 2
+
+
+def test_remove_closes_the_gap():
+    board = _board(9, 8, 7)
+    board.remove("p1")
+    board.remove("missing")
+
+    assert board.top() == [("p0", 9), ("p2", 7)]
+    assert board.rank("p2") == 2
+    assert board.rank("p1") is None
+    assert "p1" not in board and len(board) == 2
+
+
+@pytest.mark.parametrize("k, expected", [(0, []), (2, [("p1", 9), ("p2", 5)]), (10, [("p1", 9), ("p2", 5), ("p0", 3)])])
+def test_top_k(k, expected):
+    assert _board(3, 9, 5).top(k) == expected
+
+
+def test_matches_a_sorted_list_through_random_changes():
+    rng = random.Random(1234)
+    board = Leaderboard(random.Random(99))
+    scores, joined, sequence = {}, {}, 0
+
+    for _ in range(3000):
+        action = rng.random()
+        if action < 0.4 or not scores:
+            player = f"p{rng.randrange(200)}"
+            if player not in scores:
+                joined[player] = sequence
+                sequence += 1
+            scores[player] = rng.randrange(10)
+            board.add(player, scores[player])
+        elif action < 0.8:
+            player = rng.choice(list(scores))
+            scores[player] = rng.randrange(10)
+            board.update(player, scores[player])
+        else:
+            player = rng.choice(list(scores))
+            del scores[player]
+            board.remove(player)
+
+        expected = sorted(scores.items(), key=lambda item: (-item[1], joined[item[0]]))
+        k = rng.randrange(len(expected) + 2)
+        assert board.top(k) == expected[:k]
+        assert len(board) == len(expected)
+        for position, (player, _) in enumerate(expected, start=1):
+            if rng.random() < 0.1:
+                assert board.rank(player) == position
+
+    assert board.top() == expected
@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+from app.services.cluster import InProcessBackend
+from app.services.framing import JSON
+from app.services.game_service import GameService
+from app.services.message_handlers import MessageContext, handle_resume
+from app.services.outbound import DROP_OLDEST, ConnectionWriter, OutboundFrame
+from app.services.room_manager import RoomManager
+from app.services.room_snapshots import RoomSnapshotStore
+from app.services.scheduler import RoundScheduler
+
+ROOM = "ABCDEF"
+
+
+class StalledSocket:
+    """A peer that never finishes reading its first frame."""
+
+    def __init__(self) -> None:
+        self.closed = False
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.Event().wait()
+
+    async def send_bytes(self, data: bytes) -> None:
+        await asyncio.Event().wait()
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+
+
+class RecordingSocket(StalledSocket):
+    def __init__(self) -> None:
+        super().__init__()
+        self.sent = []
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(data)
+
+
+def test_drop_oldest_disconnects_rather_than_shed_a_snapshot():
+    async def main():
+        failed = []
+        writer = ConnectionWriter(StalledSocket(), failed.append, max_size=4, policy=DROP_OLDEST, send_timeout=60)
+        writer.start()
+        await asyncio.sleep(0)
+        for version in range(6):
+            writer.enqueue(OutboundFrame({"type": "room_state", "payload": {"version": version}}))
+        await asyncio.sleep(0)
+
+        # One frame is stuck in the send and four fill the queue; the sixth has nowhere to go
+        assert len(failed) == 1
+        assert writer.closed
+        assert writer.dropped == 0
+
+    asyncio.run(main())
+
+
+class GatedSocket(RecordingSocket):
+    """Records frames, but only once the test opens the gate."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.gate = asyncio.Event()
+
+    async def send_text(self, data: str) -> None:
+        await self.gate.wait()
+        self.sent.append(data)
+
+
+def _roster(frames):
+    """Apply frames the way the lobby page does and return the player ids it shows."""
+
+    players, version = [], 0
+    for frame in map(json.loads, frames):
+        if frame["type"] == "room_state":
+            version = frame["payload"]["version"]
+            players = [player["id"] for player in frame["payload"]["players"]]
+        elif frame["type"] == "player_joined" and frame["seq"] > version:
+            players = [*players, frame["payload"]["player"]["id"]]
+    return players
+
+
+def test_lagging_joiner_still_gets_the_full_player_list(tmp_path):
+    async def main():
+        manager = RoomManager(
+            queue_size=4,
+            backend=InProcessBackend(),
+            snapshots=RoomSnapshotStore(str(tmp_path / "snapshots.sqlite3")),
+        )
+        service = GameService(manager, scheduler=RoundScheduler())
+        manager.add_player(ROOM, "host", "host", RecordingSocket())
+        lagging = GatedSocket()
+        manager.add_player(ROOM, "late", "late", lagging)
+        await manager.announce_join(ROOM, "late")
+        await manager.send_to_socket(lagging, {"type": "joined", "payload": {"playerId": "late"}})
+        await asyncio.sleep(0)
+        await manager.send_to_socket(lagging, manager.build_room_state_payload(ROOM))
+        # joined is stuck in the send; room_state and four deltas overflow the queue by one
+        for index in range(4):
+            manager.add_player(ROOM, f"p{index}", f"p{index}", RecordingSocket())
+            await manager.announce_join(ROOM, f"p{index}")
+
+        lagging.gate.set()
+        await asyncio.sleep(0.01)
+        frames = list(lagging.sent)
+        if lagging.closed:
+            # The page never saw room_state, so it resumes asking for a snapshot
+            resumed = RecordingSocket()
+            manager.reattach_player(ROOM, "late", resumed)
+            await handle_resume(MessageContext(resumed, "late", ROOM, manager, service), {"lastSeq": -1})
+            await asyncio.sleep(0.01)
+            frames = resumed.sent
+
+        assert sorted(_roster(frames)) == sorted(manager.get_room(ROOM).players)
+        await manager.close()
+
+    asyncio.run(main())
+
+
+def test_frame_size_counts_utf8_bytes():
+    # Frames relayed from another node carry their JSON text as received
+    text = '{"type": "round_started", "payload": {"title": "Beyoncé – Halo"}}'
+    frame = OutboundFrame(msg_type="round_started", text=text)
+
+    assert frame.size(JSON) == len(text.encode("utf-8")) == len(text) + 3
+
+
+def test_room_traffic_counts_bytes_sent(tmp_path):
+    async def main():
+        manager = RoomManager(
+            backend=InProcessBackend(),
+            snapshots=RoomSnapshotStore(str(tmp_path / "snapshots.sqlite3")),
+        )
+        ws = RecordingSocket()
+        manager.add_player("ABCDEF", "p1", "Zoë", ws)
+        await manager.broadcast("ABCDEF", {"type": "mode_selected", "payload": {"mode": "Café"}})
+        await asyncio.sleep(0.01)
+
+        traffic = manager.traffic("ABCDEF")
+        assert traffic["frames"] == 1
+        assert traffic["bytes"] == sum(len(data.encode("utf-8")) for data in ws.sent)
+        await manager.close()
+
+    asyncio.run(main())
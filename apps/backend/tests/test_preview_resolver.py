@@ -0,0 +1,60 @@
+import asyncio
+
+import httpx
+
+from app.services.preview_resolver import PreviewResolver
+
+
+def test_cancelled_first_waiter_does_not_cancel_the_others():
+    async def main():
+        release = asyncio.Event()
+        calls = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            await release.wait()
+            return httpx.Response(200, json={"preview": "https://cdn.test/preview.mp3"})
+
+        resolver = PreviewResolver(transport=httpx.MockTransport(handler))
+        try:
+            first = asyncio.create_task(resolver.get_preview_url("42"))
+            second = asyncio.create_task(resolver.get_preview_url("42"))
+            await asyncio.sleep(0.01)
+
+            first.cancel()
+            await asyncio.sleep(0)
+            release.set()
+
+            assert await second == "https://cdn.test/preview.mp3"
+            assert first.cancelled()
+            assert calls == ["/track/42"]
+            # The shared fetch still filled the cache
+            assert await resolver.get_preview_url("42") == "https://cdn.test/preview.mp3"
+            assert calls == ["/track/42"]
+        finally:
+            await resolver.aclose()
+
+    asyncio.run(main())
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    async def main():
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            return httpx.Response(503)
+
+        resolver = PreviewResolver(transport=httpx.MockTransport(handler))
+        try:
+            results = await asyncio.gather(
+                resolver.get_preview_url("7"), resolver.get_preview_url("7"), return_exceptions=True
+            )
+            assert all(isinstance(result, httpx.HTTPStatusError) for result in results)
+            assert len(calls) == 1
+            await asyncio.gather(resolver.get_preview_url("7"), return_exceptions=True)
+            assert len(calls) == 2
+        finally:
+            await resolver.aclose()
+
+    asyncio.run(main())
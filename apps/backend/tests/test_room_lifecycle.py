@@ -0,0 +1,131 @@
+import asyncio
+
+from app.routers import game_ws
+from app.services.cluster import InProcessBackend
+from app.services.game_service import GameService
+from app.services.room_manager import Room, RoomManager
+from app.services.room_snapshots import RoomSnapshotStore
+from app.services.scheduler import RoundScheduler
+
+ROOM = "ROOM01"
+
+
+class FakeSocket:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def _service(tmp_path, *, flush_interval):
+    manager = RoomManager(
+        backend=InProcessBackend(),
+        snapshots=RoomSnapshotStore(str(tmp_path / "snapshots.sqlite3")),
+        state_flush_interval=flush_interval,
+    )
+    service = GameService(manager, scheduler=RoundScheduler())
+    service.DISCONNECT_GRACE = 0.3
+    return manager, service
+
+
+def _leave(manager, service, ws, player_id):
+    manager.detach_connection(ws)
+    service.schedule_departure(ROOM, player_id)
+
+
+def test_room_closed_before_its_delete_is_flushed_is_not_restored(tmp_path):
+    async def main():
+        manager, service = _service(tmp_path, flush_interval=0.05)
+        alice = FakeSocket()
+        await manager.load_room(ROOM)
+        manager.add_player(ROOM, "alice", "alice", alice)
+        await asyncio.sleep(0.1)
+        assert await manager.backend.load_room(ROOM) is not None
+
+        # Slow the flush so the delete is still pending when carol arrives
+        manager._state_flush_interval = 5.0
+        _leave(manager, service, alice, "alice")
+        await asyncio.sleep(0.4)
+        assert manager.get_room(ROOM) is None
+        assert await manager.backend.load_room(ROOM) is not None
+
+        room = await manager.load_room(ROOM)
+        manager.add_player(ROOM, "carol", "carol", FakeSocket())
+        assert list(room.players) == ["carol"]
+        assert room.host_id == "carol"
+        await manager.close()
+
+    asyncio.run(main())
+
+
+def test_players_restored_from_the_store_get_a_grace_period(tmp_path):
+    async def main():
+        manager, service = _service(tmp_path, flush_interval=0.05)
+        state = {**Room(code=ROOM).to_state(), "hostId": "alice"}
+        state["players"] = [{"id": "alice", "name": "alice", "score": 3, "token": "t"}]
+        await manager.backend.save_room(ROOM, state)
+
+        room = await manager.load_room(ROOM)
+        assert list(room.players) == ["alice"]
+        manager.add_player(ROOM, "carol", "carol", FakeSocket())
+
+        # alice never reconnects, so her seat and the host role are released
+        await asyncio.sleep(0.5)
+        assert list(room.players) == ["carol"]
+        assert room.host_id == "carol"
+        await manager.close()
+
+    asyncio.run(main())
+
+
+def test_rejoining_a_restored_room_keeps_the_seat(tmp_path):
+    async def main():
+        manager, service = _service(tmp_path, flush_interval=0.05)
+        state = {**Room(code=ROOM).to_state(), "hostId": "alice"}
+        state["players"] = [{"id": "alice", "name": "alice", "score": 3, "token": "t"}]
+        await manager.backend.save_room(ROOM, state)
+
+        await manager.load_room(ROOM)
+        assert manager.authenticate(ROOM, "alice", "t") is not None
+        manager.reattach_player(ROOM, "alice", FakeSocket())
+        service.cancel_departure(ROOM, "alice")
+
+        await asyncio.sleep(0.5)
+        assert manager.get_player(ROOM, "alice") is not None
+        await manager.close()
+
+    asyncio.run(main())
+
+
+def test_join_needs_the_session_token_to_take_a_seat(tmp_path, monkeypatch):
+    async def mode_options():
+        return [], []
+
+    async def main():
+        manager, service = _service(tmp_path, flush_interval=0.05)
+        monkeypatch.setattr(game_ws, "_room_manager", manager)
+        monkeypatch.setattr(game_ws, "_game_service", service)
+        monkeypatch.setattr(game_ws, "_get_mode_options", mode_options)
+        alice = FakeSocket()
+        await game_ws._handle_join(alice, {"roomCode": ROOM, "nickname": "alice"})
+        seat = manager.get_player(ROOM, manager.get_room(ROOM).host_id)
+
+        for token in ("", "guess"):
+            intruder = FakeSocket()
+            _, player_id = await game_ws._handle_join(
+                intruder, {"roomCode": ROOM, "nickname": "mallory", "playerId": seat.id, "sessionToken": token}
+            )
+            assert player_id != seat.id
+        assert manager.get_room(ROOM).sockets[seat.id] is alice
+
+        _, player_id = await game_ws._handle_join(
+            FakeSocket(), {"roomCode": ROOM, "nickname": "alice", "playerId": seat.id, "sessionToken": seat.token}
+        )
+        assert player_id == seat.id
+        await manager.close()
+
+    asyncio.run(main())
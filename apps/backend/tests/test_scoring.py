@@ -0,0 +1,41 @@
+import random
+import string
+
+from app.scoring import SongMatcher, _AliasIndex, _Target, artist_aliases, build_aliases, normalize
+
+
+def _mutate(rng, text):
+    chars = list(text)
+    for _ in range(rng.randint(0, 4)):
+        index = rng.randrange(len(chars) + 1)
+        if rng.random() < 0.5 and chars:
+            chars.pop(min(index, len(chars) - 1))
+        else:
+            chars.insert(index, rng.choice(string.ascii_lowercase + " "))
+    return "".join(chars)
+
+
+def test_length_window_accepts_what_a_full_scan_accepts():
+    aliases = artist_aliases(["Calvin Harris", "Rihanna", "The Weeknd", "Simon & Garfunkel", "Jay-Z"])
+    index = _AliasIndex(aliases)
+    targets = [_Target(alias) for alias in aliases]
+    rng = random.Random(0)
+    for _ in range(3000):
+        guess = normalize(_mutate(rng, rng.choice(aliases)))
+        assert index.accepts(guess) == any(target.accepts(guess) for target in targets), guess
+
+
+def test_close_guess_sharing_no_trigram_is_accepted():
+    # Matching blocks shorter than three characters still count towards ratio()
+    assert _AliasIndex(["abcdefgh"]).accepts("abxcdxefxgh")
+
+
+def test_song_matcher_accepts_aliases():
+    matcher = SongMatcher(
+        "Calvin Harris",
+        "This Is What You Came For - feat. Rihanna",
+        build_aliases("This Is What You Came For - feat. Rihanna", ["Calvin Harris", "Rihanna"]),
+    )
+    assert matcher.check("rihanna", "this is what you came for")["both_correct"]
+    assert matcher.check("calvn harris", "this is what you cam for")["both_correct"]
+    assert not matcher.check("adele", "hello")["artist_correct"]
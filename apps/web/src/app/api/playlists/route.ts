@@ -9,6 +9,9 @@ type Playlist = {
 
 const NORMALISE_REGEX = /\/$/;
 
+// Last successful response, revalidated against the backend ETag.
+let cachedPlaylists: { etag: string; playlists: Playlist[] } | null = null;
+
 function deriveBackendBase(): string | null {
   const direct =
     process.env.BACKEND_HTTP_URL ||
@@ -49,7 +52,11 @@ export async function GET() {
   const endpoint = `${baseUrl}/playlists`;
 
   try {
-    const res = await fetch(endpoint, { cache: "no-store" });
+    const headers: HeadersInit = cachedPlaylists ? { "If-None-Match": cachedPlaylists.etag } : {};
+    const res = await fetch(endpoint, { cache: "no-store", headers });
+    if (res.status === 304 && cachedPlaylists) {
+      return NextResponse.json({ playlists: cachedPlaylists.playlists });
+    }
     if (!res.ok) {
       return NextResponse.json(
         { error: `Failed to load playlists (${res.status})`, playlists: [] },
@@ -64,6 +71,9 @@ export async function GET() {
       ? data.playlists
       : [];
 
+    const etag = res.headers.get("etag");
+    cachedPlaylists = etag ? { etag, playlists } : null;
+
     return NextResponse.json({ playlists });
   } catch (error) {
     console.error("Failed to fetch playlists", error);
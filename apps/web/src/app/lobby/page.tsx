@@ -81,6 +81,10 @@ function GameClient() {
   const [players, setPlayers] = useState<Player[]>([]);
   const socketRef = useRef<WebSocket | null>(null);
   const desiredModeRef = useRef<string | null>(null);
+  // Sequence number of the last room event applied, sent back on resume
+  const lastSeqRef = useRef(0);
+  // Version of the last full room_state; player deltas apply on top of it
+  const stateVersionRef = useRef(0);
   const [songData, setSongData] = useState<{ url: string; title: string; artist: string }>({ url: "", title: "", artist: "" });
   const [timeRemaining, setTimeRemaining] = useState<number>(30);
   const [leaderboard, setLeaderboard] = useState<LeaderboardPlayer[]>([]);
@@ -106,124 +110,207 @@ function GameClient() {
     if (!rc || !alias) return;
 
     const wsUrl = `${process.env.NEXT_PUBLIC_WS_URL}/ws`;
-    const ws = new WebSocket(wsUrl);
-    socketRef.current = ws;
-
-    ws.onopen = () => {
-      ws.send(
-        JSON.stringify({
-          type: "join",
-          payload: { roomCode: rc, nickname: alias },
-        })
-      );
-    };
-
-    ws.onmessage = (evt) => {
-      console.log(" Received:", evt.data)
-      try {
-        const msg = JSON.parse(evt.data);
-        switch (msg.type) {
-          case "joined": {
-            setMyPlayerId(msg.payload?.playerId || "");
-            setHostId(msg.payload?.hostId || "");
-            console.log("Joined! I am:", msg.payload?.playerId);
-            console.log("👑 Host is:", msg.payload?.hostId);
-            break;
-          }
-          case "game_modes": {
-            console.log("Received Game_modes");
-            const names = Array.isArray(msg.payload?.name)
-              ? msg.payload.name
-              : [];
-            const descriptions = Array.isArray(msg.payload?.description)
-              ? msg.payload.description
-              : [];
-            setGameModes(names);
-            setModeDescriptions(descriptions);
-            break;
-          }
-          case "game_state_changed": {
-            console.log("Game state changed")
-            const next = msg.payload?.newState as GameState | undefined;
-            if (next) setGameState(next);
-            break;
-          }
-          case "room_state": {
-            setPlayers(msg.payload?.players ?? []);
-            setHostId(msg.payload?.hostId || "");
-            setSelectedGameMode(msg.payload?.selectedMode || "");
-            break;
-          }
-          case "round_started": {
-            const sd = msg.payload?.songData ?? { url: "", title: "", artist: "" };
-            setSongData(sd);
-            setTimeRemaining(msg.payload?.duration ?? 30);
-            setGameState("playing");
-            setReveal(null);
-            setAnswerResult(null);
-            break;
-          }
-          case "mode_selected": {
-            console.log("Received Mode Selection Update");
-            setSelectedGameMode(msg.payload?.selectedMode || "");
-            break;
-          }
-          case "round_ended": {
-            setReveal(null);
-            setAnswerResult(null);
-            setLeaderboard(msg.payload?.leaderboard ?? []);
-            setCurrentRound(msg.payload?.currentRound ?? 0);
-            setTotalRounds(msg.payload?.totalRounds ?? 10);
-            setGameState("leaderboard");
-            break;
-          }
-          case "game_ended": {
-            setLeaderboard(msg.payload?.finalLeaderboard ?? []);
-            setGameState("ended");
-            break;
-          }
-          case "audio_mode_set": {
-            const hostOnly = msg.payload?.hostOnlyAudio ?? false;
-            setHostOnlyAudio(hostOnly);
-            console.log("Audio mode set to:", hostOnly ? "host-only" : "everyone");
-            break;
-          }
-          case "answer_reveal": {
-            const p = msg.payload;
-            setReveal({ title: p.title, artist: p.artist, artistImageUrl: p.artistImageUrl });
-            break;
-          }
-          case "answer_received": {
-            const payload = msg.payload ?? {};
-            const result = payload.result ?? {};
-            setAnswerResult({
-              artistCorrect: Boolean(result.artist_correct),
-              titleCorrect: Boolean(result.title_correct),
-              bothCorrect: Boolean(result.both_correct),
-              scoreAwarded: typeof payload.scoreAwarded === "number" ? payload.scoreAwarded : 0,
-              artistGuess: payload.artist ?? "",
-              titleGuess: payload.title ?? "",
-            });
-            break;
+    const playerKey = `tempo:player:${rc.toUpperCase()}`;
+    const tokenKey = `tempo:token:${rc.toUpperCase()}`;
+    let closedByUs = false;
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+    let attempts = 0;
+    let resumeFailed = false;
+
+    const connect = () => {
+      const ws = new WebSocket(wsUrl);
+      socketRef.current = ws;
+
+      const join = () => {
+        ws.send(JSON.stringify({ type: "join", payload: { roomCode: rc, nickname: alias } }));
+      };
+
+      ws.onopen = () => {
+        attempts = 0;
+        const playerId = sessionStorage.getItem(playerKey);
+        const sessionToken = sessionStorage.getItem(tokenKey);
+        if (!playerId || !sessionToken) {
+          join();
+          return;
+        }
+        // Pick up where we left off; the server replays what we missed
+        ws.send(
+          JSON.stringify({
+            type: "resume",
+            payload: {
+              roomCode: rc,
+              playerId,
+              sessionToken,
+              lastSeq: lastSeqRef.current,
+            },
+          })
+        );
+      };
+
+      ws.onmessage = (evt) => {
+        console.log(" Received:", evt.data)
+        try {
+          const msg = JSON.parse(evt.data);
+          if (typeof msg.seq === "number") lastSeqRef.current = msg.seq;
+          switch (msg.type) {
+            case "joined": {
+              setMyPlayerId(msg.payload?.playerId || "");
+              if (msg.payload?.playerId) sessionStorage.setItem(playerKey, msg.payload.playerId);
+              if (msg.payload?.sessionToken) sessionStorage.setItem(tokenKey, msg.payload.sessionToken);
+              // No snapshot yet: a resume before room_state arrives asks for a full one
+              lastSeqRef.current = -1;
+              setHostId(msg.payload?.hostId || "");
+              console.log("Joined! I am:", msg.payload?.playerId);
+              console.log("👑 Host is:", msg.payload?.hostId);
+              break;
+            }
+            case "resumed": {
+              setMyPlayerId(msg.payload?.playerId || "");
+              setHostId(msg.payload?.hostId || "");
+              lastSeqRef.current = msg.payload?.full ? -1 : msg.payload?.seq ?? 0;
+              console.log("Resumed as:", msg.payload?.playerId, msg.payload?.full ? "(full state)" : "(replay)");
+              break;
+            }
+            case "error": {
+              if (msg.payload?.code === "RESUME_FAILED") {
+                // Our seat is gone (grace period over or room closed); join afresh
+                sessionStorage.removeItem(playerKey);
+                sessionStorage.removeItem(tokenKey);
+                lastSeqRef.current = 0;
+                resumeFailed = true;
+              }
+              break;
+            }
+            case "game_modes": {
+              console.log("Received Game_modes");
+              const names = Array.isArray(msg.payload?.name)
+                ? msg.payload.name
+                : [];
+              const descriptions = Array.isArray(msg.payload?.description)
+                ? msg.payload.description
+                : [];
+              setGameModes(names);
+              setModeDescriptions(descriptions);
+              break;
+            }
+            case "game_state_changed": {
+              console.log("Game state changed")
+              const next = msg.payload?.newState as GameState | undefined;
+              if (next) setGameState(next);
+              break;
+            }
+            case "room_state": {
+              stateVersionRef.current = msg.payload?.version ?? 0;
+              lastSeqRef.current = stateVersionRef.current;
+              setPlayers(msg.payload?.players ?? []);
+              setHostId(msg.payload?.hostId || "");
+              setSelectedGameMode(msg.payload?.selectedMode || "");
+              break;
+            }
+            case "player_joined": {
+              // Deltas at or below the snapshot's version are already in it
+              if (msg.seq <= stateVersionRef.current) break;
+              const joined = msg.payload?.player as Player | undefined;
+              if (joined) setPlayers(prev => [...prev.filter(p => p.id !== joined.id), joined]);
+              break;
+            }
+            case "player_left": {
+              if (msg.seq <= stateVersionRef.current) break;
+              const leftId = msg.payload?.playerId;
+              setPlayers(prev => prev.filter(p => p.id !== leftId));
+              break;
+            }
+            case "host_changed": {
+              if (msg.seq <= stateVersionRef.current) break;
+              const nextHost = msg.payload?.hostId || "";
+              setHostId(nextHost);
+              setPlayers(prev => prev.map(p => ({ ...p, isHost: p.id === nextHost })));
+              break;
+            }
+            case "round_started": {
+              const sd = msg.payload?.songData ?? { url: "", title: "", artist: "" };
+              setSongData(sd);
+              setTimeRemaining(msg.payload?.duration ?? 30);
+              setGameState("playing");
+              setReveal(null);
+              setAnswerResult(null);
+              break;
+            }
+            case "mode_selected": {
+              console.log("Received Mode Selection Update");
+              setSelectedGameMode(msg.payload?.selectedMode || "");
+              break;
+            }
+            case "round_ended": {
+              setReveal(null);
+              setAnswerResult(null);
+              setLeaderboard(msg.payload?.leaderboard ?? []);
+              setCurrentRound(msg.payload?.currentRound ?? 0);
+              setTotalRounds(msg.payload?.totalRounds ?? 10);
+              setGameState("leaderboard");
+              break;
+            }
+            case "game_ended": {
+              setLeaderboard(msg.payload?.finalLeaderboard ?? []);
+              setGameState("ended");
+              break;
+            }
+            case "audio_mode_set": {
+              const hostOnly = msg.payload?.hostOnlyAudio ?? false;
+              setHostOnlyAudio(hostOnly);
+              console.log("Audio mode set to:", hostOnly ? "host-only" : "everyone");
+              break;
+            }
+            case "answer_reveal": {
+              const p = msg.payload;
+              setReveal({ title: p.title, artist: p.artist, artistImageUrl: p.artistImageUrl });
+              break;
+            }
+            case "answer_received": {
+              const payload = msg.payload ?? {};
+              const result = payload.result ?? {};
+              setAnswerResult({
+                artistCorrect: Boolean(result.artist_correct),
+                titleCorrect: Boolean(result.title_correct),
+                bothCorrect: Boolean(result.both_correct),
+                scoreAwarded: typeof payload.scoreAwarded === "number" ? payload.scoreAwarded : 0,
+                artistGuess: payload.artist ?? "",
+                titleGuess: payload.title ?? "",
+              });
+              break;
+            }
+            default:
+              break;
           }
-          default:
-            break;
+        } catch (e) {
+          console.error("Failed to parse WS message", e);
         }
-      } catch (e) {
-        console.error("Failed to parse WS message", e);
-      }
-    };
-
-    ws.onerror = (e) => {
-      console.error("WS error:", e);
+      };
+
+      ws.onerror = (e) => {
+        console.error("WS error:", e);
+      };
+
+      ws.onclose = (e) => {
+        console.log("WS closed", e.code, e.reason);
+        if (resumeFailed && !closedByUs) {
+          resumeFailed = false;
+          connect();
+          return;
+        }
+        // 1012: the server restarted, 1006: the connection dropped; resume as the same player
+        if (closedByUs || (e.code !== 1012 && e.code !== 1006) || attempts >= 10) return;
+        attempts += 1;
+        reconnectTimer = setTimeout(connect, Math.min(500 * 2 ** attempts, 8000));
+      };
     };
 
-    ws.onclose = (e) => {
-      console.log("WS closed", e.code, e.reason);
-    };
+    connect();
 
     return () => {
-      ws.close();
+      closedByUs = true;
+      clearTimeout(reconnectTimer);
+      socketRef.current?.close();
     };
   }, [rc, alias]);
 